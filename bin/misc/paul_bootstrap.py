@@ -2,10 +2,9 @@
 
 # import modules
 import numpy as np
-import scipy.optimize as opt
 from time import time
-from scipy.stats import chisquare
 import matplotlib.pyplot as plt
+from nkrpy import math
 
 
 def linear(x, a, b):
@@ -44,23 +43,14 @@ samples = int(num_data / 2.)
 bootstraps = int(num_data / 5.)
 guess = (1., 1.)
 
-results = []
-errf = []
-for boot in range(bootstraps):
-    t1 = time()
-    # can only choose 1d
-    sampled_data_i = np.random.choice(list(range(data.shape[-1])), samples)
-    sampled_data = data[:, sampled_data_i]
-    popt, pcov = opt.curve_fit(linear, sampled_data[0, :],
-                               sampled_data[1, :], p0=guess)
-    x2 = chisquare(sampled_data[1, :],
-                   linear(sampled_data[0, :], *popt))[0]
-    results.append(popt)
-    errf.append(x2)
-    print(f'Finished #{boot}, with params:{popt} and fit of:{x2})')
-    print(f'Time:{time() - t1}')
-
-results = np.array(results).reshape(-1, 2)                                  
+t1 = time()
+# resamples are drawn from a seeded index matrix and fit across processes
+boot = math.bootstrap_fit(linear, data[0, :], data[1, :], p0=guess, nboot=bootstraps,
+                          nsamples=samples, seed=900)
+results = boot['params'][boot['success']]
+errf = boot['chi2'][boot['success']].tolist()
+print(f'Finished {bootstraps} bootstraps in {time() - t1}s')
+print(f'Median params:{np.median(results, axis=0)}')
 
 # --------------------------------------------------------------------------------
 # plotting
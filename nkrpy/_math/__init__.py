@@ -7,9 +7,27 @@ from . import _triangle
 from ._triangle import *
 from . import _convert
 from ._convert import *
+from . import _sampler
+from ._sampler import *
 from . import gp
 from ._fit import *
 from . import _fit
+from . import _profiles
+from ._profiles import *
+from . import _binstats
+from ._binstats import *
+from . import _convolve
+from ._convolve import *
+from . import _sliding
+from ._sliding import *
+from . import _rebin
+from ._rebin import *
+from . import _linfit
+from ._linfit import *
+from . import _fitservice
+from ._fitservice import *
+from . import _resample
+from ._resample import *
 
 
 __all__ = ['gp'] +\
@@ -17,6 +35,15 @@ __all__ = ['gp'] +\
           _vector.__all__ +\
           _triangle.__all__ +\
           _fit.__all__ +\
+          _profiles.__all__ +\
+          _sampler.__all__ +\
+          _binstats.__all__ +\
+          _convolve.__all__ +\
+          _sliding.__all__ +\
+          _rebin.__all__ +\
+          _linfit.__all__ +\
+          _fitservice.__all__ +\
+          _resample.__all__ +\
           _convert.__all__
 
 PACKAGES = __all__.copy()
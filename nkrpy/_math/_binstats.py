@@ -0,0 +1,120 @@
+"""Binned statistics."""
+# flake8: noqa
+# cython modules
+
+# internal modules
+
+# external modules
+import numpy as np
+
+# relative modules
+
+# global attributes
+__all__ = ['digitize', 'binned_statistics']
+__doc__ = """Per-bin statistics from a single digitization.
+
+Digitize once with `digitize`, then reduce any number of value arrays
+with `binned_statistics`. The bin index can be combined with other
+indices (e.g. segment * nbins + bin) to reduce several binnings in one
+call.
+"""
+__filename__ = __file__.split('/')[-1].strip('.py')
+__path__ = __file__.strip('.py').strip(__filename__)
+
+_STATISTICS = ('count', 'sum', 'mean', 'std', 'min', 'max')
+
+
+def digitize(x, edges, right: bool = True):
+    """Bin index of every point.
+
+    Parameters
+    ----------
+    x: np.ndarray
+        The coordinate of each point.
+    edges: np.ndarray
+        Monotonically increasing bin edges, nbins + 1 values.
+    right: bool
+        Bins are (edges[i], edges[i + 1]] if True, else
+        [edges[i], edges[i + 1]).
+
+    Returns
+    -------
+    np.ndarray
+        The bin of each point, -1 for points outside of the edges.
+    """
+    edges = np.asarray(edges)
+    idx = np.searchsorted(edges, x, side='left' if right else 'right') - 1
+    idx[(idx < 0) | (idx >= edges.size - 1)] = -1
+    return idx
+
+
+def _reduceat(ufunc, values, index, nbins: int, fill: float):
+    """Apply ufunc.reduceat over the points of each bin."""
+    out = np.full(nbins, fill, dtype=float)
+    if values.size == 0:
+        return out
+    order = np.argsort(index, kind='stable')
+    sidx = index[order]
+    starts = np.flatnonzero(np.r_[True, sidx[1:] != sidx[:-1]])
+    out[sidx[starts]] = ufunc.reduceat(values[order], starts)
+    return out
+
+
+def binned_statistics(values, index, nbins: int,
+                      statistics=('mean', 'std', 'count')):
+    """Compute statistics of values in each bin.
+
+    Parameters
+    ----------
+    values: np.ndarray
+        The values of each point.
+    index: np.ndarray
+        The bin of each point as returned by `digitize`. Negative indices
+        are ignored.
+    nbins: int
+        The number of bins.
+    statistics: iterable[str]
+        Any of 'count', 'sum', 'mean', 'std', 'min', 'max'. The std is the
+        population standard deviation (ddof=0).
+
+    Returns
+    -------
+    dict
+        The statistic name mapped to an array of nbins values. Empty bins
+        have a count of 0 and NaN otherwise.
+    """
+    statistics = tuple(statistics)
+    unknown = set(statistics) - set(_STATISTICS)
+    if unknown:
+        raise ValueError(f'Unknown statistics {unknown}, use {_STATISTICS}')
+    values = np.asarray(values, dtype=float).ravel()
+    index = np.asarray(index).ravel()
+    keep = index >= 0
+    if not keep.all():
+        values, index = values[keep], index[keep]
+    ret = {}
+    count = np.bincount(index, minlength=nbins)[:nbins]
+    empty = count == 0
+    if 'count' in statistics:
+        ret['count'] = count
+    if {'sum', 'mean', 'std'} & set(statistics):
+        total = np.bincount(index, weights=values, minlength=nbins)[:nbins]
+        with np.errstate(invalid='ignore', divide='ignore'):
+            mean = total / count
+        if 'sum' in statistics:
+            ret['sum'] = np.where(empty, np.nan, total)
+        if 'mean' in statistics:
+            ret['mean'] = mean
+        if 'std' in statistics:
+            resid = (values - mean[index]) ** 2
+            with np.errstate(invalid='ignore', divide='ignore'):
+                ret['std'] = np.sqrt(np.bincount(index, weights=resid, minlength=nbins)[:nbins] / count)
+    if 'min' in statistics:
+        ret['min'] = _reduceat(np.minimum, values, index, nbins, np.nan)
+    if 'max' in statistics:
+        ret['max'] = _reduceat(np.maximum, values, index, nbins, np.nan)
+    return ret
+
+# end of code
+
+# end of file
@@ -0,0 +1,116 @@
+"""FFT convolution of image stacks."""
+# flake8: noqa
+# cython modules
+
+# internal modules
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+# external modules
+import numpy as np
+from scipy import fft as sp_fft
+
+# relative modules
+from ..misc.errors import ArgumentError
+
+# global attributes
+__all__ = ['FFTConvolver']
+__doc__ = """Per-plane 2D FFT convolution with a cached kernel transform.
+
+The kernel is transformed once for a given image shape and every plane
+of a stack (e.g. each channel of a cube) is convolved with real FFTs,
+split across a thread pool and written into a preallocated output. The
+result matches scipy.signal.convolve(mode='same', method='fft') against
+a (1, ky, kx) kernel without transforming the leading axes.
+"""
+__filename__ = __file__.split('/')[-1].strip('.py')
+__path__ = __file__.strip('.py').strip(__filename__)
+
+
+class FFTConvolver(object):
+    """Convolve images of a fixed shape with a fixed 2D kernel.
+
+    Usage
+    -----
+    conv = FFTConvolver(kernel, cube.shape[-2:])
+    smoothed = conv(cube)  # any (..., ny, nx) stack
+    conv(cube, out=buffer)  # reuse an output buffer
+
+    Parameters
+    ----------
+    kernel: np.ndarray
+        The 2D kernel.
+    shape: tuple[int, int]
+        The (ny, nx) shape of the images to convolve.
+    nthreads: int
+        The number of threads, defaults to the cpu count.
+    chunk: int
+        The number of planes transformed at once by each thread, defaults
+        to splitting the planes evenly between the threads, at most 16.
+    """
+
+    def __init__(self, kernel, shape, nthreads: int = None, chunk: int = None):
+        kernel = np.asarray(kernel, dtype=float)
+        if kernel.ndim != 2:
+            raise ArgumentError(f'kernel must be 2D, got shape {kernel.shape}')
+        if len(shape) != 2:
+            raise ArgumentError(f'shape must be (ny, nx), got {shape}')
+        self.kernel = kernel
+        self.shape = tuple(int(s) for s in shape)
+        self.nthreads = nthreads or os.cpu_count() or 1
+        self.chunk = chunk
+        full = [s + k - 1 for s, k in zip(self.shape, kernel.shape)]
+        self._fshape = tuple(sp_fft.next_fast_len(f, real=True) for f in full)
+        # same mode cropping of the full convolution
+        self._slices = tuple(slice((k - 1) // 2, (k - 1) // 2 + s)
+                             for s, k in zip(self.shape, kernel.shape))
+        self._kernel_fft = sp_fft.rfft2(kernel, s=self._fshape)
+
+    def __convolve_planes(self, data, out):
+        """Convolve a (n, ny, nx) block of planes into out."""
+        spec = sp_fft.rfft2(data, s=self._fshape, axes=(-2, -1))
+        spec *= self._kernel_fft
+        full = sp_fft.irfft2(spec, s=self._fshape, axes=(-2, -1), overwrite_x=True)
+        out[...] = full[(Ellipsis, *self._slices)]
+
+    def __call__(self, data, out=None):
+        """Convolve every (ny, nx) plane of data.
+
+        Parameters
+        ----------
+        data: np.ndarray
+            Array of shape (..., ny, nx).
+        out: np.ndarray
+            Optional preallocated output of the same shape as data.
+
+        Returns
+        -------
+        np.ndarray
+            The convolved planes.
+        """
+        data = np.asarray(data)
+        if data.shape[-2:] != self.shape:
+            raise ArgumentError(f'Expected images of shape {self.shape}, got {data.shape[-2:]}')
+        if out is None:
+            out = np.empty(data.shape, dtype=np.result_type(data.dtype, float))
+        elif out.shape != data.shape or not out.flags.c_contiguous:
+            raise ArgumentError(f'out must be C contiguous of shape {data.shape}')
+        planes = data.reshape(-1, *self.shape)
+        outplanes = out.reshape(-1, *self.shape)
+        nplanes = planes.shape[0]
+        chunk = self.chunk or min(max(1, -(-nplanes // self.nthreads)), 16)
+        starts = range(0, nplanes, chunk)
+        if self.nthreads <= 1 or len(starts) <= 1:
+            for s in starts:
+                self.__convolve_planes(planes[s:s + chunk], outplanes[s:s + chunk])
+            return out
+        with ThreadPoolExecutor(max_workers=self.nthreads) as pool:
+            futures = [pool.submit(self.__convolve_planes, planes[s:s + chunk], outplanes[s:s + chunk])
+                       for s in starts]
+            for f in futures:
+                f.result()
+        return out
+
+# end of code
+
+# end of file
@@ -5,7 +5,6 @@ import types
 
 # external modules
 import numpy as np
-from scipy.special import wofz
 # import matplotlib.pyplot as plt
 from scipy.optimize import curve_fit
 # from scipy.stats import rv_continuous
@@ -13,10 +12,13 @@ from scipy.stats import norm, chisquare
 
 # relative modules
 from ._miscmath import binning
+from ._fitservice import _clip_one
+from ._linfit import polyfit, register_linear_model
+from ._profiles import gauss_into, ndgauss_into, voigt_into, emissivegaussian_into
 from ..misc import constants
 
 # global attributes
-__all__ = ['fit_conf', 'sigma_clip_fit', 'quad', 'voigt',
+__all__ = ['fit_conf', 'sigma_clip_fit', 'quad', 'voigt', 'emissivegaussian',
            'gauss', 'ndgauss', 'polynomial', 'baseline',
            'plummer_density', 'plummer_mass', 'plummer_radius',
            'linear', 'numeric_error_propagator']
@@ -25,6 +27,11 @@ __filename__ = __file__.split('/')[-1].strip('.py')
 __path__ = __file__.strip('.py').strip(__filename__)
 
 
+def _unwrap(ret):
+    """Return 0d kernel results as scalars."""
+    return ret[()] if ret.ndim == 0 else ret
+
+
 # TODO: need to add a numerical error approximator
 '''
 x = numpy.linspace(0,10,1000)
@@ -151,11 +158,17 @@ def sigma_clip_fit(xdata, ydata, func, p0,
 
     Returns
     -------
+    finmask: np.ndarray
+        The clipped points of the data.
     p0: Iterable
         The converged parameters for the above function.
     err: float
         The sigma clipped error for the data.
 
+    See Also
+    --------
+    FitService.sigma_clip to clip many datasets across processes.
+
     Usage
     -----
     '''
@@ -185,28 +198,8 @@ def sigma_clip_fit(xdata, ydata, func, p0,
     xd, yd = map(lambda x: binning(x, 3), [xdata, ydata])
     ind = np.argsort(xd)
     nx, ny = map(lambda x: x[ind], [xd, yd])
-    mask = np.full(nx.shape[0], False, dtype=bool)
-    chk_last_mask = np.full(nx.shape[0], True, dtype=bool)
-    rolling_sigma = []
-    for i in range(max_iterations):
-        if np.array_equal(chk_last_mask, mask):
-            continue
-        else:
-            chk_last_mask = np.copy(mask)
-        popt, pcov = curve_fit(func, nx[~mask], ny[~mask], p0=p0, **curve_fit_params)
-        p0 = popt
-        fn = func(nx, *p0)
-        y = ny / fn
-        y = y / np.median(y)
-        tmp_mask = np.copy(mask)
-        rolling_sigma.append(y[~(mask + tmp_mask)].std())
-        mask = ((np.abs(y - 1.) > sigma_clip * rolling_sigma[-1]) + mask + tmp_mask)  # noqa
-
-    # embed()
-    finfn = func(xdata, *p0)
-    finy = ydata / finfn
-    finmask = np.abs(finy - 1.) > rolling_sigma[-1]
-    err = (ydata[~finmask] - func(xdata[~finmask], *p0)).std()
+    finmask, p0, err = _clip_one(func, nx, ny, xdata, ydata, p0, sigma_clip,
+                                 max_iterations, curve_fit_params)
     return (finmask, p0, err)
 
 
@@ -219,10 +212,10 @@ def voigt(x, mu, alpha, gamma):
     alpha: float
     gamma: float
 
+    Evaluated by the compiled kernel, see `voigt_jac` for the
+    Jacobian.
     """
-    sigma = alpha / np.sqrt(2. * np.log(2))
-    return np.real(wofz((x - mu + 1.j * gamma) / sigma / np.sqrt(2.))) /\
-        sigma / np.sqrt(2. * np.pi)
+    return _unwrap(voigt_into(x, mu, alpha, gamma))
 
 
 def emissivegaussian(x, mu: float, fwhm: float, flux: float, skew: float = 1):
@@ -240,21 +233,15 @@ def emissivegaussian(x, mu: float, fwhm: float, flux: float, skew: float = 1):
     skew: float
         amount to skew gaussian
 
+    Evaluated by the compiled kernel, see `emissivegaussian_jac` for
+    the Jacobian.
     """
-    sigma = fwhm / 1000. / (2. * np.sqrt(2. * np.log(2)))
-    c = constants.c / 100.
-    s = mu * sigma / c
-    a = flux / np.sqrt(2. * np.pi) / s
-    dx = (x - mu) / s
-    dx[x > mu] /= skew
-    if skew > 1:
-        return 2. * a * np.exp(-0.5 * dx ** 2) / (1. + skew)
-    return a * np.exp(-0.5 * dx ** 2)
+    return _unwrap(emissivegaussian_into(x, mu, fwhm, flux, skew))
 
 
 def gauss(x, mu, sigma, a):
     """Define a single gaussian."""
-    return a * np.exp(-(x - mu) ** 2 / 2. / sigma**2)
+    return _unwrap(gauss_into(x, mu, sigma, a))
 
 
 def ndgauss(x, params):
@@ -262,13 +249,7 @@ def ndgauss(x, params):
 
     assumes params is a 2d list
     """
-    for i, dim in enumerate(params):
-        if i == 0:
-            final = gauss(x, *dim)
-        else:
-            final += gauss(x, *dim)
-
-    return final
+    return _unwrap(ndgauss_into(x, params))
 
 
 def addconst(func, c):
@@ -282,12 +263,9 @@ def polynomial(x, *params):
     assuming params is a 1d list
     constant + 1st order + 2nd order + ...
     """
-    for i, dim in enumerate(params):
-        if i == 0:
-            final = [dim for y in x]
-        else:
-            final = np.sum(dim * x ** i, final, axis=0)
-
+    final = np.zeros(np.shape(x), dtype=float)
+    for dim in params[::-1]:
+        final = final * x + dim
     return final
 
 
@@ -295,9 +273,11 @@ def baseline(x, y, order=2):
     """Fit a baseline.
 
     Input the xvals and yvals for the baseline
-    Will return the function that describes the fit
+    Will return the function that describes the fit.
+    The factorization of x is cached, so repeated baselines on the same
+    grid only cost a projection.
     """
-    fit = np.polyfit(x, y, order)
+    fit = polyfit(x, y, order)
     fit_fn = np.poly1d(fit)
     return fit_fn
 
@@ -323,10 +303,16 @@ def linear(x, a, b):
 
 
 def quad(x, a, b, c):
-    """Linear function."""
+    """Quadratic function."""
     return a * x ** 2 + b * x + c
 
 
+# solved directly instead of with curve_fit by the fitting helpers
+register_linear_model(linear, 1)
+register_linear_model(quad, 2)
+register_linear_model(polynomial, None, highest_first=False)
+
+
 # end of code
 
 # end of file
@@ -0,0 +1,288 @@
+"""Parallel bootstrap and sigma clip fitting."""
+# flake8: noqa
+# cython modules
+
+# internal modules
+import os
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+# external modules
+import numpy as np
+from scipy.optimize import curve_fit
+
+# relative modules
+from ..misc.errors import ArgumentError
+from ._linfit import linear_model_fit
+
+# global attributes
+__all__ = ['FitService', 'bootstrap_fit']
+__doc__ = """Run many independent curve_fit problems across a process pool.
+
+The data (and the bootstrap index matrix) are placed once in shared
+memory and every worker maps them read-only, so only (start, stop)
+ranges travel between processes. Work is split into fixed size chunks
+and each fit in a chunk is warm started from the previous solution of
+that chunk. The indices come from a seeded Generator and the chunking
+does not depend on the number of processes, so results are reproducible
+for a given seed regardless of num_procs.
+"""
+__filename__ = __file__.split('/')[-1].strip('.py')
+__path__ = __file__.strip('.py').strip(__filename__)
+
+# per worker state, populated by _init_worker
+_WORKER = {}
+
+
+def _to_shared(arrays: dict):
+    """Copy arrays into one shared memory block."""
+    arrays = {k: np.ascontiguousarray(v) for k, v in arrays.items()}
+    size = max(sum(a.nbytes for a in arrays.values()), 1)
+    shm = shared_memory.SharedMemory(create=True, size=size)
+    layout, offset = {}, 0
+    for k, a in arrays.items():
+        layout[k] = (offset, a.shape, a.dtype.str)
+        np.ndarray(a.shape, dtype=a.dtype, buffer=shm.buf, offset=offset)[...] = a
+        offset += a.nbytes
+    return shm, layout
+
+
+def _from_shared(shm, layout: dict):
+    """Read-only views of the arrays in a shared memory block."""
+    views = {}
+    for k, (offset, shape, dtype) in layout.items():
+        v = np.ndarray(shape, dtype=np.dtype(dtype), buffer=shm.buf, offset=offset)
+        v.flags.writeable = False
+        views[k] = v
+    return views
+
+
+def _init_worker(func, name, layout, curve_fit_params, extra):
+    shm = shared_memory.SharedMemory(name=name)
+    _WORKER.update(func=func, shm=shm, data=_from_shared(shm, layout),
+                   curve_fit_params=curve_fit_params, **extra)
+
+
+def _solve(func, x, y, p0, curve_fit_params, sigma=None, cache=True):
+    """Parameters of func, solved directly for registered linear models."""
+    if not curve_fit_params:
+        popt = linear_model_fit(func, x, y, p0=p0, sigma=sigma, cache=cache)
+        if popt is not None:
+            return popt
+    return curve_fit(func, x, y, p0=p0, sigma=sigma, **curve_fit_params)[0]
+
+
+def _fit_one(func, x, y, sigma, p0, curve_fit_params):
+    """Fit once, returning nan parameters on failure."""
+    try:
+        # every resample has its own grid, do not cache its factorization
+        popt = _solve(func, x, y, p0, curve_fit_params, sigma=sigma, cache=False)
+    except (RuntimeError, ValueError, np.linalg.LinAlgError):
+        return np.full(len(p0), np.nan), np.nan, False
+    resid = y - func(x, *popt)
+    if sigma is not None:
+        resid = resid / sigma
+    return popt, float(np.sum(resid ** 2)), True
+
+
+def _bootstrap_chunk(start: int, stop: int):
+    """Fit the bootstrap resamples start:stop, warm starting each fit."""
+    w = _WORKER
+    data = w['data']
+    x, y, sigma, idx = data['x'], data['y'], data.get('sigma'), data['idx']
+    p0 = w['p0']
+    params = np.full((stop - start, len(p0)), np.nan)
+    chi2 = np.full(stop - start, np.nan)
+    success = np.zeros(stop - start, dtype=bool)
+    guess = p0
+    for i, row in enumerate(idx[start:stop]):
+        popt, c2, ok = _fit_one(w['func'], x[row], y[row], None if sigma is None else sigma[row],
+                                guess, w['curve_fit_params'])
+        params[i], chi2[i], success[i] = popt, c2, ok
+        guess = popt if ok else p0
+    return start, params, chi2, success
+
+
+def _clip_one(func, nx, ny, xdata, ydata, p0, sigma_clip, max_iterations, curve_fit_params):
+    """Iteratively fit nx, ny and clip, then mask xdata, ydata.
+
+    Returns the clip mask of xdata, the parameters and the residual
+    scatter of the unclipped points.
+    """
+    mask = np.full(nx.shape[0], False, dtype=bool)
+    chk_last_mask = np.full(nx.shape[0], True, dtype=bool)
+    rolling_sigma = []
+    for i in range(max_iterations):
+        if np.array_equal(chk_last_mask, mask):
+            break
+        chk_last_mask = np.copy(mask)
+        p0 = _solve(func, nx[~mask], ny[~mask], p0, curve_fit_params)
+        y = ny / func(nx, *p0)
+        y = y / np.median(y)
+        rolling_sigma.append(y[~mask].std())
+        mask = (np.abs(y - 1.) > sigma_clip * rolling_sigma[-1]) | mask
+    finy = ydata / func(xdata, *p0)
+    finmask = np.abs(finy - 1.) > rolling_sigma[-1]
+    err = (ydata[~finmask] - func(xdata[~finmask], *p0)).std()
+    return finmask, p0, err
+
+
+def _clip_chunk(start: int, stop: int):
+    """Sigma clip fit the rows start:stop, warm starting each row."""
+    w = _WORKER
+    x, y = w['data']['x'], w['data']['y']
+    p0 = w['p0']
+    masks = np.zeros((stop - start, x.shape[0]), dtype=bool)
+    params = np.full((stop - start, len(p0)), np.nan)
+    err = np.full(stop - start, np.nan)
+    success = np.zeros(stop - start, dtype=bool)
+    guess = p0
+    for i, row in enumerate(y[start:stop]):
+        try:
+            masks[i], params[i], err[i] = _clip_one(w['func'], x, row, x, row, guess, w['sigma_clip'],
+                                                    w['max_iterations'], w['curve_fit_params'])
+        except (RuntimeError, ValueError, np.linalg.LinAlgError):
+            guess = p0
+            continue
+        success[i] = True
+        guess = params[i]
+    return start, masks, params, err, success
+
+
+class FitService(object):
+    """Run bootstrap and sigma clip fits of one model in parallel.
+
+    Usage
+    -----
+    service = FitService(linear, x, y, num_procs=8, seed=900)
+    res = service.bootstrap(p0=(1, 1), nboot=200, nsamples=500)
+    res['params'].std(axis=0)
+    clipped = FitService(quad, x, spectra).sigma_clip(p0=(1, 1, 1))
+
+    Parameters
+    ----------
+    func: callable
+        The model func(x, *params). Any callable works with the default
+        fork start method, otherwise it must be picklable.
+    xdata: np.ndarray
+        The 1D x values.
+    ydata: np.ndarray
+        The y values, (n,) or (m, n) for sigma clipping m datasets.
+    sigma: np.ndarray
+        Optional uncertainties of ydata used to weight the bootstrap fits.
+    num_procs: int
+        The number of worker processes, <= 1 runs in the calling process.
+    seed: int
+        Seed of the bootstrap index Generator.
+    chunk: int
+        The number of fits per task. Fits within a task are warm started
+        from each other.
+    """
+
+    def __init__(self, func, xdata, ydata, sigma=None, num_procs: int = None,
+                 seed: int = None, chunk: int = 16):
+        self.func = func
+        self.xdata = np.asarray(xdata, dtype=float)
+        self.ydata = np.asarray(ydata, dtype=float)
+        if self.ydata.shape[-1] != self.xdata.shape[0]:
+            raise ArgumentError('ydata must have the length of xdata along the last axis')
+        self.sigma = None if sigma is None else np.broadcast_to(np.asarray(sigma, dtype=float), self.ydata.shape)
+        self.num_procs = num_procs if num_procs is not None else os.cpu_count() or 1
+        self.seed = seed
+        self.chunk = max(int(chunk), 1)
+
+    def __run(self, task, ntasks: int, arrays: dict, extra: dict, curve_fit_params: dict):
+        """Run task over chunks of range(ntasks), returning the results in order."""
+        bounds = [(s, min(s + self.chunk, ntasks)) for s in range(0, ntasks, self.chunk)]
+        shm, layout = _to_shared(arrays)
+        try:
+            initargs = (self.func, shm.name, layout, curve_fit_params, extra)
+            if self.num_procs <= 1 or len(bounds) <= 1:
+                _init_worker(*initargs)
+                try:
+                    return [task(*b) for b in bounds]
+                finally:
+                    _WORKER.pop('shm').close()
+                    _WORKER.clear()
+            with ProcessPoolExecutor(max_workers=self.num_procs, initializer=_init_worker,
+                                     initargs=initargs) as pool:
+                futures = [pool.submit(task, *b) for b in bounds]
+                return [f.result() for f in futures]
+        finally:
+            shm.close()
+            shm.unlink()
+
+    def bootstrap(self, p0, nboot: int = 100, nsamples: int = None, **curve_fit_params):
+        """Fit nboot resamples drawn with replacement.
+
+        Parameters
+        ----------
+        p0: iterable
+            The starting parameters of the first fit of every chunk.
+        nboot: int
+            The number of resamples.
+        nsamples: int
+            The number of points per resample, defaults to all points.
+        curve_fit_params:
+            Passed to scipy.optimize.curve_fit.
+
+        Returns
+        -------
+        dict
+            params (nboot, nparams), chi2 (nboot,) the weighted sum of
+            squared residuals, success (nboot,) and indices
+            (nboot, nsamples) the resample index matrix.
+        """
+        if self.ydata.ndim != 1:
+            raise ArgumentError('bootstrap needs 1D ydata')
+        n = self.xdata.shape[0]
+        nsamples = n if nsamples is None else int(nsamples)
+        rng = np.random.default_rng(self.seed)
+        idx = rng.integers(0, n, size=(int(nboot), nsamples))
+        arrays = {'x': self.xdata, 'y': self.ydata, 'idx': idx}
+        if self.sigma is not None:
+            arrays['sigma'] = self.sigma
+        extra = {'p0': np.asarray(p0, dtype=float)}
+        results = self.__run(_bootstrap_chunk, int(nboot), arrays, extra, curve_fit_params)
+        return {'params': np.concatenate([r[1] for r in results]) if results else np.empty((0, len(p0))),
+                'chi2': np.concatenate([r[2] for r in results]) if results else np.empty(0),
+                'success': np.concatenate([r[3] for r in results]) if results else np.empty(0, dtype=bool),
+                'indices': idx}
+
+    def sigma_clip(self, p0, sigma_clip: float = 5, max_iterations: int = 5, **curve_fit_params):
+        """Iteratively fit and sigma clip every dataset of ydata.
+
+        Each dataset is fit, normalized by the model and points deviating
+        more than sigma_clip times the normalized scatter are masked
+        before refitting, see `sigma_clip_fit`.
+
+        Returns
+        -------
+        dict
+            mask (m, n) of the clipped points, params (m, nparams),
+            err (m,) the scatter of the unclipped residuals and
+            success (m,). The leading axis is dropped for 1D ydata.
+        """
+        ydata = np.atleast_2d(self.ydata)
+        arrays = {'x': self.xdata, 'y': ydata}
+        extra = {'p0': np.asarray(p0, dtype=float), 'sigma_clip': sigma_clip,
+                 'max_iterations': max_iterations}
+        results = self.__run(_clip_chunk, ydata.shape[0], arrays, extra, curve_fit_params)
+        ret = {'mask': np.concatenate([r[1] for r in results]),
+               'params': np.concatenate([r[2] for r in results]),
+               'err': np.concatenate([r[3] for r in results]),
+               'success': np.concatenate([r[4] for r in results])}
+        if self.ydata.ndim == 1:
+            ret = {k: v[0] for k, v in ret.items()}
+        return ret
+
+
+def bootstrap_fit(func, xdata, ydata, p0, nboot: int = 100, nsamples: int = None,
+                  sigma=None, seed: int = None, num_procs: int = None, **curve_fit_params):
+    """Bootstrap the parameters of func, see `FitService.bootstrap`."""
+    service = FitService(func, xdata, ydata, sigma=sigma, num_procs=num_procs, seed=seed)
+    return service.bootstrap(p0, nboot=nboot, nsamples=nsamples, **curve_fit_params)
+
+# end of code
+
+# end of file
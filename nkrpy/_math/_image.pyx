@@ -1,19 +1,23 @@
+# distutils: extra_compile_args = -fopenmp
+# distutils: extra_link_args = -fopenmp
 """."""
 # flake8: noqa
 # cython modules
 cimport numpy as cnp
 cimport cython
+from libc.math cimport floor
 
 # internal modules
 
 # external modules
 import numpy as np
 from cython.parallel import prange as crange
-from skimage.transform import rotate as sk__rotate
 
 # relative modules
-from .miscmath import angle_clockwise, ang_vec
-from ..misc import typecheck
+from ._miscmath import angle_clockwise, ang_vec
+from ..misc.functions import typecheck
+from ..misc.errors import ArgumentError
+from ._resample import rotate_cube
 
 # global attributes
 __all__ = ['raster_matrix', 'gen_angles', 'rotate_points',
@@ -22,63 +26,203 @@ __doc__ = """."""
 __filename__ = __file__.split('/')[-1].strip('.py')
 __path__ = __file__.strip('.py').strip(__filename__)
 
+ctypedef fused real:
+    float
+    double
 
-@cython.boundscheck(False)  # Deactivate bounds checking
-@cython.wraparound(False)   # Deactivate negative indexing.
-cpdef shift(double[:, :, :] data: np.ndarray, long[:] shifts: np.ndarray,
-            bint override: bool = True, float cval: float = np.NaN):
-    """Shift a matrix.
 
-    Shift a matrix by a certain amount. Assumed input size is 3D, those axis 
-    can be blank, just make sure the corresponding shifts are 0.
+def _taps(double s, int order):
+    """Source offsets and weights along one axis for a shift of s.
 
-    Parameters
-    ----------
-    data: np.ndarray
-        The data to shift.
-    shifts: np.ndarray
-        Array of shifts to perform, must correspond to same axis as data.
-    override: bool
-        If set to true, will override initial array.
-            Is slower but memory efficient
+    Output index i samples the input at i - s. Taps with zero weight are
+    dropped, so integer shifts are a single tap at any order.
     """
-    cdef double[:, :, :] shifted = np.roll(data, shifts,
-                                           axis=list(range(shifts.shape[0])))
-    cdef int i = 0
-    cdef int j = 0
-    cdef int k = 0
-    if not override:
-        shifted[:shifts[0], ...] = cval
-        shifted[:, :shifts[1], :] = cval
-        shifted[..., :shifts[2]] = cval
-        return np.asarray(shifted)
+    if order == 0:
+        s = np.round(s)
+    cdef double base = floor(-s)
+    cdef double f = -s - base
+    if f == 0:
+        offs, weights = [0], [1.]
+    elif order == 1:
+        offs, weights = [0, 1], [1. - f, f]
     else:
-        for i in range(shifted.shape[0]):
-            for j in range(shifted.shape[1]):
-                for k in crange(shifted.shape[2], nogil=True):
-                    if i < shifts[0] or j < shifts[1] or k < shifts[2]:
-                        data[i, j, k] = cval
-                        continue
-                    data[i, j, k] = shifted[i, j, k]
+        # cubic convolution (Keys, a = -0.5)
+        offs = [-1, 0, 1, 2]
+        weights = []
+        for t in (1. + f, f, 1. - f, 2. - f):
+            if t <= 1:
+                weights.append(1.5 * t ** 3 - 2.5 * t ** 2 + 1.)
+            else:
+                weights.append(-0.5 * t ** 3 + 2.5 * t ** 2 - 4. * t + 2.)
+    taps = [(int(base) + o, w) for o, w in zip(offs, weights) if w != 0]
+    return (np.array([t[0] for t in taps], dtype=np.intp),
+            np.array([t[1] for t in taps], dtype=float))
+
+
+@cython.boundscheck(False)
+@cython.wraparound(False)
+def _shift_stencil(const real[:, :, :] src, real[:, :, ::1] dst,
+                   const Py_ssize_t[::1] o0, const double[::1] w0,
+                   const Py_ssize_t[::1] o1, const double[::1] w1,
+                   const Py_ssize_t[::1] o2, const double[::1] w2, double cval):
+    """dst[i, j, k] = sum of the weighted taps of src around (i, j, k) - shift."""
+    cdef Py_ssize_t n0 = dst.shape[0], n1 = dst.shape[1], n2 = dst.shape[2]
+    cdef Py_ssize_t m0 = src.shape[0], m1 = src.shape[1], m2 = src.shape[2]
+    cdef Py_ssize_t t0 = o0.shape[0], t1 = o1.shape[0], t2 = o2.shape[0]
+    # the valid k of every row, where all taps along axis 2 are inside src
+    cdef Py_ssize_t klo = max(0, -o2[0]), khi = min(n2, m2 - o2[t2 - 1])
+    cdef Py_ssize_t idx, i, j, k, p, q, r, ii, jj
+    cdef double acc, wpq
+    for idx in crange(n0 * n1, nogil=True, schedule='static'):
+        i = idx // n1
+        j = idx % n1
+        if (i + o0[0] < 0 or i + o0[t0 - 1] >= m0 or
+                j + o1[0] < 0 or j + o1[t1 - 1] >= m1 or klo >= khi):
+            for k in range(n2):
+                dst[i, j, k] = <real> cval
+            continue
+        for k in range(min(klo, n2)):
+            dst[i, j, k] = <real> cval
+        for k in range(max(khi, 0), n2):
+            dst[i, j, k] = <real> cval
+        for k in range(klo, khi):
+            acc = 0.
+            for p in range(t0):
+                ii = i + o0[p]
+                for q in range(t1):
+                    jj = j + o1[q]
+                    wpq = w0[p] * w1[q]
+                    for r in range(t2):
+                        acc = acc + wpq * w2[r] * src[ii, jj, k + o2[r]]
+            dst[i, j, k] = <real> acc
+
+
+@cython.boundscheck(False)
+@cython.wraparound(False)
+cdef inline void _inplace_row(real[:, :, ::1] d, Py_ssize_t i, Py_ssize_t j,
+                              Py_ssize_t s0, Py_ssize_t s1, Py_ssize_t s2, double cval) nogil:
+    """Shift one row in place, walking k against the direction of s2."""
+    cdef Py_ssize_t n0 = d.shape[0], n1 = d.shape[1], n2 = d.shape[2]
+    cdef Py_ssize_t kk, k, si = i - s0, sj = j - s1, sk
+    cdef bint inside = 0 <= si < n0 and 0 <= sj < n1
+    for kk in range(n2):
+        k = n2 - 1 - kk if s2 > 0 else kk
+        sk = k - s2
+        if inside and 0 <= sk < n2:
+            d[i, j, k] = d[si, sj, sk]
+        else:
+            d[i, j, k] = <real> cval
+
+
+@cython.boundscheck(False)
+@cython.wraparound(False)
+def _shift_inplace(real[:, :, ::1] d, Py_ssize_t s0, Py_ssize_t s1, Py_ssize_t s2, double cval):
+    """Integer shift in place.
+
+    Elements are visited against the direction of the shift, so every
+    source is read before it is overwritten. Planes are independent when
+    s0 is 0, otherwise the rows of a plane read another plane and are.
+    """
+    cdef Py_ssize_t n0 = d.shape[0], n1 = d.shape[1]
+    cdef Py_ssize_t ii, jj, i, j
+    if s0 == 0:
+        for i in crange(n0, nogil=True, schedule='static'):
+            for jj in range(n1):
+                j = n1 - 1 - jj if s1 > 0 else jj
+                _inplace_row(d, i, j, s0, s1, s2, cval)
+        return
+    with nogil:
+        for ii in range(n0):
+            i = n0 - 1 - ii if s0 > 0 else ii
+            for j in crange(n1, schedule='static'):
+                _inplace_row(d, i, j, s0, s1, s2, cval)
+
+
+def shift(data, shifts, int order = 1, double cval = np.nan, out=None, shape=None):
+    """Shift a 2D or 3D image.
+
+    The output at index i is the input sampled at i - shifts, the
+    convention of np.roll and scipy.ndimage.shift, and samples that need
+    data outside of the input are cval. Integer shifts copy values
+    exactly; subpixel shifts interpolate with a separable linear or cubic
+    convolution kernel. The kernel releases the GIL and runs over the
+    rows of the output with OpenMP, without an intermediate copy.
 
+    Parameters
+    ----------
+    data: np.ndarray
+        The 2D or 3D image, float32 and float64 are kept, other types are
+        cast to float64.
+    shifts: iterable[float]
+        The shift along each axis, in pixels.
+    order: int
+        0 (nearest), 1 (linear) or 3 (cubic) interpolation.
+    cval: float
+        The value for samples outside of the input.
+    out: np.ndarray
+        Optional C contiguous output of the dtype of data. It may be data
+        itself for integer shifts, which are then done in place.
+    shape: tuple
+        The output shape, defaults to the shape of data. A different
+        shape extracts (and pads with cval) a window of the shifted data.
 
-def rotate(double[:, :] data: np.ndarray,
-           long angle, float cval: float = np.NaN):
+    Returns
+    -------
+    np.ndarray
+        The shifted image.
+    """
+    data = np.asarray(data)
+    if data.dtype not in (np.float32, np.float64):
+        data = data.astype(float)
+    if data.ndim not in (2, 3):
+        raise ArgumentError(f'shift expects a 2D or 3D image, got {data.ndim}D')
+    if order not in (0, 1, 3):
+        raise ArgumentError(f'order must be 0, 1 or 3, got {order}')
+    shifts = np.asarray(shifts, dtype=float).ravel()
+    if shifts.shape[0] != data.ndim:
+        raise ArgumentError(f'Expected {data.ndim} shifts, got {shifts.shape[0]}')
+    shape = data.shape if shape is None else tuple(int(n) for n in shape)
+    if len(shape) != data.ndim:
+        raise ArgumentError(f'shape must have {data.ndim} axes')
+    if out is None:
+        out = np.empty(shape, dtype=data.dtype)
+    elif out.shape != shape or out.dtype != data.dtype or not out.flags.c_contiguous:
+        raise ArgumentError(f'out must be C contiguous {data.dtype} of shape {shape}')
+    pad = (1,) * (3 - data.ndim)
+    if np.shares_memory(out, data):
+        if order != 0 and np.any(shifts != np.round(shifts)):
+            raise ArgumentError('Only integer shifts can be done in place')
+        if out.shape != data.shape or not data.flags.c_contiguous:
+            raise ArgumentError('In place shifts need out to be data')
+        s = [0] * (3 - data.ndim) + [int(v) for v in np.round(shifts)]
+        _shift_inplace(out.reshape(pad + out.shape), s[0], s[1], s[2], cval)
+        return out
+    taps = [(np.zeros(1, dtype=np.intp), np.ones(1))] * (3 - data.ndim)
+    taps += [_taps(v, order) for v in shifts]
+    _shift_stencil(data.reshape(pad + data.shape), out.reshape(pad + shape),
+                   taps[0][0], taps[0][1], taps[1][0], taps[1][1],
+                   taps[2][0], taps[2][1], cval)
+    return out
+
+
+def rotate(data: np.ndarray, angle: float, cval: float = np.NaN,
+           resize: bool = False, order: int = 1, axis: int = 0):
     """Rotate image by a certain angle around its center.
     Parameters
     ----------
-    image : ndarray
-        Input image.
+    data : ndarray
+        Input image, or cube rotated plane by plane orthogonal to axis.
     angle : float
         Rotation angle in degrees in counter-clockwise direction.
     Returns
     -------
     rotated : ndarray
         Rotated version of the input.
-    
+
+    Matches skimage.transform.rotate, but the coordinate map is cached
+    per angle and shape and applied to every plane of a cube at once.
     """
-    return sk__rotate(data, angle, resize=False, center=None, order=1,
-                      mode='constant', cval=cval)
+    return rotate_cube(data, angle, axis=axis, resize=resize, order=order, cval=cval)
 
 
 """
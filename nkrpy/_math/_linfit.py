@@ -0,0 +1,241 @@
+"""Direct least squares for models linear in their parameters."""
+# flake8: noqa
+# cython modules
+
+# internal modules
+import hashlib
+from collections import OrderedDict
+
+# external modules
+import numpy as np
+from scipy.linalg import solve_triangular
+
+# relative modules
+from ..misc.errors import ArgumentError
+
+# global attributes
+__all__ = ['PolyFitter', 'polyfit', 'polyfit_degrees',
+           'register_linear_model', 'linear_model_fit']
+__doc__ = """Polynomial least squares with a cached QR factorization.
+
+The column scaled Vandermonde matrix of an x grid (and weights) is
+factored once, A = QR, and every fit on that grid is a projection Q^T y
+and a triangular solve. The columns are ordered by increasing power, so
+the factorization of a degree d fit is the leading (d + 1) block of the
+highest degree one and a whole range of degrees is solved from a single
+factorization. Many y vectors on one grid are solved in one batch.
+
+Models that are polynomials in disguise (linear, quad, polynomial) can be
+registered with `register_linear_model` so the fitting helpers solve them
+directly instead of iterating scipy.optimize.curve_fit.
+"""
+__filename__ = __file__.split('/')[-1].strip('.py')
+__path__ = __file__.strip('.py').strip(__filename__)
+
+_CACHE = OrderedDict()
+_CACHE_SIZE = 32
+# func -> (degree, highest power first), degree None means len(p0) - 1
+_LINEAR_MODELS = {}
+
+
+class PolyFitter(object):
+    """Least squares polynomial fits on a fixed x grid.
+
+    Usage
+    -----
+    fitter = PolyFitter(wave, 15, w=1. / err)
+    coef = fitter.fit(flux)  # np.polyfit(wave, flux, 15, w=1. / err)
+    coefs = fitter.fit_degrees(flux, range(1, 16))
+    coef = fitter.fit(spectra.T, deg=3)  # many spectra at once
+
+    Parameters
+    ----------
+    x: np.ndarray
+        The 1D x grid.
+    deg: int
+        The highest degree that will be fit.
+    w: np.ndarray
+        Optional weights applied to the residuals, as in np.polyfit.
+    """
+
+    def __init__(self, x, deg: int, w=None):
+        x = np.asarray(x, dtype=float)
+        if x.ndim != 1:
+            raise ArgumentError('x must be 1D')
+        deg = int(deg)
+        if deg < 0:
+            raise ArgumentError('deg must be >= 0')
+        self.x = x
+        self.deg = deg
+        self.w = None if w is None else np.asarray(w, dtype=float)
+        lhs = np.vander(x, deg + 1, increasing=True)
+        if self.w is not None:
+            lhs *= self.w[:, None]
+        self._scale = np.sqrt((lhs * lhs).sum(axis=0))
+        self._scale[self._scale == 0] = 1
+        lhs /= self._scale
+        self._lhs = lhs
+        self._q, self._r = np.linalg.qr(lhs)
+        self._rcond = x.shape[0] * np.finfo(float).eps
+
+    def __solve(self, qty, rhs, d: int):
+        """Scaled increasing power coefficients of degree d."""
+        r = self._r[:d + 1, :d + 1]
+        diag = np.abs(np.diag(r))
+        if diag.min() <= self._rcond * diag.max():
+            # rank deficient, fall back to the svd solution of np.polyfit
+            return np.linalg.lstsq(self._lhs[:, :d + 1], rhs, rcond=self._rcond)[0]
+        return solve_triangular(r, qty[:d + 1], check_finite=False)
+
+    def __rhs(self, y):
+        y = np.asarray(y, dtype=float)
+        if y.shape[0] != self.x.shape[0]:
+            raise ArgumentError(f'y must have {self.x.shape[0]} rows, got {y.shape[0]}')
+        if self.w is not None:
+            y = y * (self.w if y.ndim == 1 else self.w[:, None])
+        return y
+
+    def fit_degrees(self, y, degrees):
+        """Fit every degree from one projection.
+
+        Parameters
+        ----------
+        y: np.ndarray
+            The values, (n,) or (n, m) for m datasets.
+        degrees: iterable[int]
+            The degrees, each <= deg.
+
+        Returns
+        -------
+        list[np.ndarray]
+            The coefficients of each degree, highest power first as in
+            np.polyfit.
+        """
+        rhs = self.__rhs(y)
+        qty = self._q.T @ rhs
+        out = []
+        for d in degrees:
+            d = int(d)
+            if not 0 <= d <= self.deg:
+                raise ArgumentError(f'degree {d} outside 0..{self.deg}')
+            scale = self._scale[:d + 1] if rhs.ndim == 1 else self._scale[:d + 1, None]
+            out.append((self.__solve(qty, rhs, d) / scale)[::-1])
+        return out
+
+    def fit(self, y, deg: int = None):
+        """Fit a polynomial of degree deg (default the fitter degree).
+
+        Returns
+        -------
+        np.ndarray
+            The coefficients, highest power first, (deg + 1,) or
+            (deg + 1, m).
+        """
+        return self.fit_degrees(y, [self.deg if deg is None else deg])[0]
+
+
+def _digest(a):
+    return None if a is None else hashlib.sha1(np.ascontiguousarray(a).view(np.uint8)).hexdigest()
+
+
+def _fitter(x, deg: int, w=None):
+    """PolyFitter of x from the cache, factoring on a miss."""
+    x = np.asarray(x, dtype=float)
+    key = (x.shape, _digest(x), int(deg), _digest(None if w is None else np.asarray(w, dtype=float)))
+    fitter = _CACHE.get(key)
+    if fitter is None:
+        fitter = PolyFitter(x, deg, w=w)
+        _CACHE[key] = fitter
+        if len(_CACHE) > _CACHE_SIZE:
+            _CACHE.popitem(last=False)
+    else:
+        _CACHE.move_to_end(key)
+    return fitter
+
+
+def polyfit(x, y, deg: int, w=None, cache: bool = True):
+    """Drop in for np.polyfit reusing the factorization of repeated grids.
+
+    Parameters
+    ----------
+    x: np.ndarray
+        The 1D x values.
+    y: np.ndarray
+        The values, (n,) or (n, m) for m datasets.
+    deg: int
+        The degree.
+    w: np.ndarray
+        Optional weights applied to the residuals.
+    cache: bool
+        Keep the factorization of (x, deg, w) for later calls.
+
+    Returns
+    -------
+    np.ndarray
+        The coefficients, highest power first.
+    """
+    fitter = _fitter(x, deg, w) if cache else PolyFitter(x, deg, w=w)
+    return fitter.fit(y)
+
+
+def polyfit_degrees(x, y, degrees, w=None, cache: bool = True):
+    """Fit several degrees from one factorization, see `PolyFitter.fit_degrees`."""
+    degrees = [int(d) for d in degrees]
+    if not degrees:
+        return []
+    fitter = _fitter(x, max(degrees), w) if cache else PolyFitter(x, max(degrees), w=w)
+    return fitter.fit_degrees(y, degrees)
+
+
+def register_linear_model(func, degree: int = None, highest_first: bool = True):
+    """Mark func(x, *params) as a polynomial in its parameters.
+
+    Parameters
+    ----------
+    func: callable
+        The model.
+    degree: int
+        The polynomial degree, None for a variable number of parameters
+        (degree len(p0) - 1).
+    highest_first: bool
+        Whether the parameters are ordered from the highest power, as in
+        np.polyval, or from the constant term.
+    """
+    _LINEAR_MODELS[func] = (degree, highest_first)
+
+
+def linear_model_fit(func, xdata, ydata, p0=None, sigma=None, cache: bool = True):
+    """Solve a registered linear model directly.
+
+    Parameters
+    ----------
+    func: callable
+        A model registered with `register_linear_model`.
+    xdata, ydata: np.ndarray
+        The 1D data.
+    p0: iterable
+        Only used for the number of parameters of variable degree models.
+    sigma: np.ndarray
+        Optional uncertainties of ydata, as in curve_fit.
+
+    Returns
+    -------
+    np.ndarray | None
+        The parameters in the order of func, None if func is not a
+        registered linear model.
+    """
+    try:
+        degree, highest_first = _LINEAR_MODELS[func]
+    except (KeyError, TypeError):
+        return None
+    if degree is None:
+        if p0 is None:
+            raise ArgumentError('p0 is needed for the number of parameters')
+        degree = len(p0) - 1
+    w = None if sigma is None else 1. / np.asarray(sigma, dtype=float)
+    coef = polyfit(xdata, ydata, degree, w=w, cache=cache)
+    return coef if highest_first else coef[::-1]
+
+# end of code
+
+# end of file
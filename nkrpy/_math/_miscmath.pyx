@@ -6,6 +6,7 @@ cimport cython  # noqa
 
 # standard modules
 from itertools import chain, islice, groupby
+from collections import deque
 from operator import itemgetter
 from copy import deepcopy
 
@@ -18,6 +19,8 @@ from mpmath import mp
 # relative modules
 from ..misc import constants as n_c
 from ..misc import functions as n_f
+from ._sliding import sliding_stat, grouped_mean
+from ._rebin import rebin
 
 pi = n_c.pi
 typecheck = n_f.typecheck
@@ -108,14 +111,11 @@ def windowrms(x, width: int = 11):
 
     width: int
         Must be odd. If even will force to odd + 1
+
+    The nan-aware std of the centered window, truncated at the edges.
     """
     width += (width + 1) % 2
-    bg = np.zeros(x.shape, dtype=float)
-    for iv, vv in enumerate(x):
-        left = 0 if iv < width // 2 else iv - width // 2
-        right = len(x) - 1 if iv > (len(x) - 1 - width // 2) else (iv + width // 2)
-        bg[iv] = np.nanstd(x[left:right])
-    return bg
+    return sliding_stat(x, width, stat='std', end='stretch')
 
 
 def normalize(x, norm_median: float = 1, norm_max: float = None, norm_min: float = None):
@@ -237,45 +237,43 @@ def pairwise(points, window_points: int = 2):
     whereas with window 4 yields
         [[1.0, 4.0], [2.0, 5.0]]
     """
-    window_points -= 1
-    if isinstance(points, list):
-        for x in window(points, window_points):
-            yield x[0], x[-1]
-
     if isinstance(points, np.ndarray):
-        for x in __window_array(points, window_points):
-            yield x[0], x[-1]
+        offset = window_points - 1
+        yield from zip(points[:points.shape[0] - offset], points[offset:])
+        return
+    for x in __window_list(points, window_points):
+        yield x[0], x[-1]
 
 
 def window(points, window_points: int = 2):
-    if isinstance(points, list):
-        return __window_list(points, window_points)
+    """Consecutive windows of window_points points.
 
+    For np.ndarray returns a read-only view of shape
+    (n - window_points + 1, window_points, ...) that shares memory with
+    points. For any other sequence returns an iterator of tuples.
+    """
     if isinstance(points, np.ndarray):
         return __window_array(points, window_points)
+    return __window_list(points, window_points)
 
 
 def __window_array(points: np.ndarray, window_points: int = 2):
-        ind = np.arange(0, points.shape[0] + 1).tolist()
-        ind = np.ravel(list(zip(ind, ind[window_points:])))
-        spl = np.split(points, ind)
-        if spl[0].shape[0] == 0:
-            spl = spl[1::2]
-        else:
-            spl = spl[::2]
-        for elem in spl:
-            yield elem
+    """Strided view of the windows along the zeroth axis, no copies."""
+    if window_points > points.shape[0]:
+        return np.empty((0, window_points, *points.shape[1:]), dtype=points.dtype)
+    view = np.lib.stride_tricks.sliding_window_view(points, window_points, axis=0)
+    return np.moveaxis(view, -1, 1)
 
 
-def __window_list(points: list, window_points: int = 2):
+def __window_list(points, window_points: int = 2):
     """Similar to pairwise, but efficiently returns window."""
     it = iter(points)
-    result = tuple(islice(it, window_points))
+    result = deque(islice(it, window_points), maxlen=window_points)
     if len(result) == window_points:
-        yield result
+        yield tuple(result)
     for elem in it:
-        result = result[1:] + (elem, )
-        yield result
+        result.append(elem)
+        yield tuple(result)
 
 
 def flatten(lol, ret: list = [], inplace: bool = True):
@@ -297,13 +295,7 @@ def binning(data, width=3):
     """
     if width == 1:
         return data[:]
-    if len(data.shape) == 1:
-        data = data[..., None]
-    binned = np.zeros((data.shape[0] // width, data.shape[-1])).astype(data.dtype)
-    for axis in range(data.shape[-1]):
-        tobin = data.ravel()[slice(axis, None, data.shape[-1])]
-        binned[:, axis] = np.nanmean(tobin[:(tobin.size // width) * width].reshape(-1, width), axis=1)
-    return np.squeeze(binned)
+    return np.squeeze(rebin(data, width, axis=0, statistic='mean').astype(data.dtype))
 
 
 def listinvert(total, msk_array):
@@ -408,23 +400,7 @@ def rolling_average_value(ilist: np.ndarray, window: float):
     else:
         original = ilist[:]
     original = original[np.argsort(original[..., 0])]
-    rolling_avg = []
-    ci = 0
-    cval = original[0, 0]
-    while ci < original.shape[0]:
-        cmask = original[:, 0] < cval
-        cmask += original[:, 0] > cval + window
-        rolling_avg.append(np.nanmean(original[~cmask, ...], axis=0))
-        l = np.ravel(np.where(~cmask))
-        if np.max(l) == ci:
-            ci += 1
-        else:
-            ci = np.max(l)
-        if ci < cmask.shape[0]:
-            cval = original[ci, 0]
-    if np.max(l) < cmask.shape[0] - 1:
-        rolling_avg.append(np.nanmean(original[np.max(l):, ...], axis=0))
-    return np.squeeze(np.array(rolling_avg))
+    return np.squeeze(grouped_mean(original[:, 0], original, window))
 
 
 def rolling_average_points(ilist: np.ndarray, window_width: int, fill_value: float = None, end: str = 'stretch'):
@@ -459,38 +435,8 @@ def rolling_average_points(ilist: np.ndarray, window_width: int, fill_value: flo
     else:
         original = ilist[:]
     original = original[np.argsort(original[..., 0])]
-    if end == 'stretch':
-        # if stretch creates an array of the same shape. The ends are less sensitive than the center
-        indices = np.arange(original.shape[0], dtype=int)
-        indices = list(window(indices, window_width))
-        for i in list(range(1, window_width - 1)):
-            if i > window_width // 2:
-                continue
-            indices = [np.arange(0, window_width - i, dtype=int)] + indices
-        for i in list(range(2, window_width))[::-1]:
-            if i <= window_width // 2:
-                continue
-            indices += [np.arange(original.shape[0] - i, original.shape[0], dtype=int)]
-        return np.squeeze(np.array([np.nanmean(original[i, ...], axis=0) for i in indices]))
-    elif end in ['cyclic', 'pad']:
-        # if cyclic will cycle back through the points to the other side of the array
-        indices = np.linspace(-window_width // 2 + 1, original.shape[0] + window_width// 2, num=original.shape[0] + window_width - 1, dtype=int)
-        indices = window(indices, window_width)
-    elif end == 'bounded':
-        # if bounded creates an array of the shape input.shape - window_width - 1, where the sumed values must be strictly increasing within the array
-        rolling_avg = np.nanmean(list(window(original, window_width)), axis=1)
-        return np.squeeze(rolling_avg)
-    rolling_avg = []
-    summed = np.full([window_width, *list(original.shape[1:])], fill_value, dtype=float)
-    for i in indices:
-        summed[:] = fill_value
-        if end == 'pad' and any(i < 0):
-            mask = i < 0
-            summed[~mask] = original[i[~mask] % 15, ...]
-        else:
-            summed[:] = original[i % 15, ...]
-        rolling_avg.append(np.nanmean(summed, axis=0))
-    return np.squeeze(np.array(rolling_avg))
+    rolling_avg = sliding_stat(original, window_width, stat='mean', end=end, fill_value=fill_value)
+    return np.squeeze(rolling_avg)
 
 
 def _1d(ite, dtype):
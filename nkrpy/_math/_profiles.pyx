@@ -0,0 +1,270 @@
+# distutils: extra_compile_args = -fopenmp -O3
+# distutils: extra_link_args = -fopenmp
+"""Compiled line profiles and their Jacobians."""
+# flake8: noqa
+# cython modules
+cimport cython
+from cython.parallel import prange as crange
+from libc.math cimport exp, sqrt, log, M_PI
+from scipy.special.cython_special cimport wofz
+
+# internal modules
+
+# external modules
+import numpy as np
+
+# relative modules
+from ..misc import constants
+from ..misc.errors import ArgumentError
+
+# global attributes
+__all__ = ['gauss_into', 'ndgauss_into', 'voigt_into', 'emissivegaussian_into',
+           'gauss_jac', 'ndgauss_jac', 'voigt_jac', 'emissivegaussian_jac']
+__doc__ = """Fused kernels for the line profiles of _fit.
+
+Every profile is evaluated point by point in a single nogil loop (split
+across OpenMP threads for long inputs) without numpy temporaries, into
+an optional caller supplied buffer. The *_jac functions return the
+analytic Jacobian with one column per parameter and have the
+func(x, *params) signature of scipy.optimize.curve_fit, e.g.
+
+    curve_fit(gauss, x, y, p0=p0, jac=gauss_jac)
+
+so the fit does not finite difference the model every iteration.
+"""
+__filename__ = __file__.split('/')[-1].strip('.py')
+__path__ = __file__.strip('.py').strip(__filename__)
+
+# below this many points the threads cost more than they save
+cdef Py_ssize_t PARALLEL_MIN = 20000
+cdef double FWHM2SIGMA = 1. / (2. * sqrt(2. * log(2.)))
+cdef double SQRT2PI = sqrt(2. * M_PI)
+# km/s fwhm over the speed of light in m/s
+cdef double EMISSIVE_SCALE = FWHM2SIGMA / 1000. / (constants.c / 100.)
+
+
+def _flat(x):
+    """Contiguous 1D float view of x and its shape."""
+    x = np.asarray(x, dtype=float)
+    return np.ascontiguousarray(x.ravel()), x.shape
+
+
+def _buffer(out, shape):
+    """Check or allocate a contiguous float output."""
+    if out is None:
+        return np.empty(shape, dtype=float)
+    if out.shape != tuple(shape) or out.dtype != np.float64 or not out.flags.c_contiguous:
+        raise ArgumentError(f'out must be a C contiguous float64 array of shape {tuple(shape)}')
+    return out
+
+
+@cython.boundscheck(False)
+@cython.wraparound(False)
+@cython.cdivision(True)
+cdef void _gauss(const double[::1] x, double mu, double sigma, double a,
+                 double[:, ::1] out, Py_ssize_t col, bint jac, bint accumulate) nogil:
+    cdef Py_ssize_t i, n = x.shape[0]
+    cdef double t, e, inv = 1. / (sigma * sigma)
+    if n >= PARALLEL_MIN:
+        for i in crange(n, schedule='static'):
+            t = x[i] - mu
+            e = exp(-0.5 * t * t * inv)
+            if jac:
+                out[i, col] = a * e * t * inv
+                out[i, col + 1] = a * e * t * t * inv / sigma
+                out[i, col + 2] = e
+            elif accumulate:
+                out[i, col] += a * e
+            else:
+                out[i, col] = a * e
+    else:
+        for i in range(n):
+            t = x[i] - mu
+            e = exp(-0.5 * t * t * inv)
+            if jac:
+                out[i, col] = a * e * t * inv
+                out[i, col + 1] = a * e * t * t * inv / sigma
+                out[i, col + 2] = e
+            elif accumulate:
+                out[i, col] += a * e
+            else:
+                out[i, col] = a * e
+
+
+@cython.boundscheck(False)
+@cython.wraparound(False)
+@cython.cdivision(True)
+cdef void _emissive_point(double xi, double mu, double fwhm, double flux, double skew,
+                          double[:, ::1] out, Py_ssize_t i, int npar, bint jac) nogil:
+    cdef double s = mu * fwhm * EMISSIVE_SCALE
+    cdef double q = skew if xi > mu else 1.
+    cdef double dx = (xi - mu) / (s * q)
+    cdef double norm = 2. / (1. + skew) if skew > 1 else 1.
+    cdef double e = norm * exp(-0.5 * dx * dx) / (SQRT2PI * s)
+    cdef double f = flux * e
+    if not jac:
+        out[i, 0] = f
+        return
+    out[i, 0] = f * (-1. / mu + dx / (s * q) + dx * dx / mu)
+    out[i, 1] = f * (dx * dx - 1.) / fwhm
+    out[i, 2] = e
+    if npar > 3:
+        out[i, 3] = f * ((-1. / (1. + skew) if skew > 1 else 0.) + (dx * dx / skew if xi > mu else 0.))
+
+
+@cython.boundscheck(False)
+@cython.wraparound(False)
+cdef void _emissive(const double[::1] x, double mu, double fwhm, double flux, double skew,
+                    double[:, ::1] out, int npar, bint jac) nogil:
+    cdef Py_ssize_t i, n = x.shape[0]
+    if n >= PARALLEL_MIN:
+        for i in crange(n, schedule='static'):
+            _emissive_point(x[i], mu, fwhm, flux, skew, out, i, npar, jac)
+    else:
+        for i in range(n):
+            _emissive_point(x[i], mu, fwhm, flux, skew, out, i, npar, jac)
+
+
+@cython.boundscheck(False)
+@cython.wraparound(False)
+@cython.cdivision(True)
+cdef void _voigt_point(double xi, double mu, double sigma, double gamma, double dsigma,
+                       double[:, ::1] out, Py_ssize_t i, bint jac) nogil:
+    cdef double scale = sigma * sqrt(2.)
+    cdef double norm = 1. / (sigma * SQRT2PI)
+    cdef double complex z = (xi - mu + 1j * gamma) / scale
+    cdef double complex w = wofz(z)
+    cdef double complex dw
+    cdef double v = w.real * norm
+    if not jac:
+        out[i, 0] = v
+        return
+    # w'(z) = 2i / sqrt(pi) - 2 z w(z)
+    dw = 2j / sqrt(M_PI) - 2. * z * w
+    out[i, 0] = -dw.real / scale * norm
+    out[i, 1] = ((-dw * z).real * norm - v) / sigma * dsigma
+    out[i, 2] = -dw.imag / scale * norm
+
+
+@cython.boundscheck(False)
+@cython.wraparound(False)
+cdef void _voigt(const double[::1] x, double mu, double sigma, double gamma, double dsigma,
+                 double[:, ::1] out, bint jac) nogil:
+    cdef Py_ssize_t i, n = x.shape[0]
+    if n >= PARALLEL_MIN:
+        for i in crange(n, schedule='static'):
+            _voigt_point(x[i], mu, sigma, gamma, dsigma, out, i, jac)
+    else:
+        for i in range(n):
+            _voigt_point(x[i], mu, sigma, gamma, dsigma, out, i, jac)
+
+
+def gauss_into(x, double mu, double sigma, double a, out=None):
+    """Evaluate a * exp(-(x - mu) ** 2 / 2 / sigma ** 2) into out."""
+    xf, shape = _flat(x)
+    out = _buffer(out, shape)
+    cdef const double[::1] xv = xf
+    cdef double[:, ::1] ov = out.reshape(-1, 1)
+    with nogil:
+        _gauss(xv, mu, sigma, a, ov, 0, False, False)
+    return out
+
+
+def gauss_jac(x, double mu, double sigma, double a, out=None):
+    """Jacobian of gauss, columns d/dmu, d/dsigma, d/da."""
+    xf, _ = _flat(x)
+    out = _buffer(out, (xf.shape[0], 3))
+    cdef const double[::1] xv = xf
+    cdef double[:, ::1] ov = out
+    with nogil:
+        _gauss(xv, mu, sigma, a, ov, 0, True, False)
+    return out
+
+
+def ndgauss_into(x, params, out=None):
+    """Evaluate the sum of gaussians, params is (ngauss, 3) or flat."""
+    xf, shape = _flat(x)
+    out = _buffer(out, shape)
+    cdef const double[::1] xv = xf
+    cdef double[:, ::1] ov = out.reshape(-1, 1)
+    cdef double[:, ::1] pv = np.ascontiguousarray(np.asarray(params, dtype=float).reshape(-1, 3))
+    cdef Py_ssize_t g
+    ov[:, 0] = 0.
+    with nogil:
+        for g in range(pv.shape[0]):
+            _gauss(xv, pv[g, 0], pv[g, 1], pv[g, 2], ov, 0, False, True)
+    return out
+
+
+def ndgauss_jac(x, params, out=None):
+    """Jacobian of ndgauss, 3 columns per gaussian in the order of params."""
+    xf, _ = _flat(x)
+    p = np.ascontiguousarray(np.asarray(params, dtype=float).reshape(-1, 3))
+    out = _buffer(out, (xf.shape[0], p.size))
+    cdef const double[::1] xv = xf
+    cdef double[:, ::1] ov = out
+    cdef double[:, ::1] pv = p
+    cdef Py_ssize_t g
+    with nogil:
+        for g in range(pv.shape[0]):
+            _gauss(xv, pv[g, 0], pv[g, 1], pv[g, 2], ov, 3 * g, True, False)
+    return out
+
+
+def emissivegaussian_into(x, double mu, double fwhm, double flux, double skew=1., out=None):
+    """Evaluate the skewed emissive gaussian of _fit into out."""
+    xf, shape = _flat(x)
+    out = _buffer(out, shape)
+    cdef const double[::1] xv = xf
+    cdef double[:, ::1] ov = out.reshape(-1, 1)
+    with nogil:
+        _emissive(xv, mu, fwhm, flux, skew, ov, 1, False)
+    return out
+
+
+def emissivegaussian_jac(x, *params, out=None):
+    """Jacobian of emissivegaussian(x, mu, fwhm, flux[, skew]).
+
+    One column per given parameter, so it matches curve_fit whether or
+    not the skew is fit.
+    """
+    if len(params) not in (3, 4):
+        raise ArgumentError('Expected mu, fwhm, flux[, skew]')
+    xf, _ = _flat(x)
+    out = _buffer(out, (xf.shape[0], len(params)))
+    cdef const double[::1] xv = xf
+    cdef double[:, ::1] ov = out
+    cdef double mu = params[0], fwhm = params[1], flux = params[2]
+    cdef double skew = params[3] if len(params) > 3 else 1.
+    cdef int npar = len(params)
+    with nogil:
+        _emissive(xv, mu, fwhm, flux, skew, ov, npar, True)
+    return out
+
+
+def voigt_into(x, double mu, double alpha, double gamma, out=None):
+    """Evaluate the voigt profile of _fit into out."""
+    xf, shape = _flat(x)
+    out = _buffer(out, shape)
+    cdef const double[::1] xv = xf
+    cdef double[:, ::1] ov = out.reshape(-1, 1)
+    cdef double dsigma = 1. / sqrt(2. * log(2.))
+    with nogil:
+        _voigt(xv, mu, alpha * dsigma, gamma, dsigma, ov, False)
+    return out
+
+
+def voigt_jac(x, double mu, double alpha, double gamma, out=None):
+    """Jacobian of voigt, columns d/dmu, d/dalpha, d/dgamma."""
+    xf, _ = _flat(x)
+    out = _buffer(out, (xf.shape[0], 3))
+    cdef const double[::1] xv = xf
+    cdef double[:, ::1] ov = out
+    cdef double dsigma = 1. / sqrt(2. * log(2.))
+    with nogil:
+        _voigt(xv, mu, alpha * dsigma, gamma, dsigma, ov, True)
+    return out
+
+# end of code
+
+# end of file
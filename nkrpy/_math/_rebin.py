@@ -0,0 +1,191 @@
+"""Block and irregular rebinning."""
+# flake8: noqa
+# cython modules
+
+# internal modules
+
+# external modules
+import numpy as np
+
+# relative modules
+from ..misc.errors import ArgumentError
+from ._binstats import digitize, binned_statistics
+from ._sliding import _prefix, _sliding_median
+
+# global attributes
+__all__ = ['rebin', 'rebin_irregular']
+__doc__ = """Rebin regularly sampled N-D arrays or irregularly sampled x, y.
+
+`rebin` reduces blocks of `factor` consecutive samples along any set of
+axes. The blocks are a strided view of the input (trailing samples that
+do not fill a block are dropped), so the input is never copied.
+
+`rebin_irregular` bins samples by their x coordinate either into fixed
+edges (located with searchsorted) or into a window of +- window around
+every sample, the latter being the behaviour of the older pv-diagram
+binning helpers.
+"""
+__filename__ = __file__.split('/')[-1].strip('.py')
+__path__ = __file__.strip('.py').strip(__filename__)
+
+STATISTICS = ('mean', 'sum', 'median')
+
+
+def _block_view(data, factors: dict):
+    """View of data with every binned axis split into (nblocks, factor)."""
+    shape, strides, block_axes = [], [], []
+    for ax, (n, s) in enumerate(zip(data.shape, data.strides)):
+        if ax in factors:
+            f = factors[ax]
+            shape += [n // f, f]
+            strides += [s * f, s]
+            block_axes.append(len(shape) - 1)
+        else:
+            shape.append(n)
+            strides.append(s)
+    view = np.lib.stride_tricks.as_strided(data, shape=shape, strides=strides, writeable=False)
+    return view, tuple(block_axes)
+
+
+def rebin(data, factor, axis=None, statistic: str = 'mean', weights=None, nan: bool = True):
+    """Reduce blocks of consecutive samples.
+
+    Parameters
+    ----------
+    data: np.ndarray
+        The N-D array.
+    factor: int | iterable[int]
+        The block size, one per axis.
+    axis: int | iterable[int]
+        The axes to bin. Defaults to axis 0 for an int factor and to the
+        leading len(factor) axes otherwise.
+    statistic: str
+        One of mean, sum, median.
+    weights: np.ndarray
+        Optional weights broadcastable to data, for the mean and sum.
+    nan: bool
+        Ignore nans in the blocks, otherwise nans propagate.
+
+    Returns
+    -------
+    np.ndarray
+        The rebinned array, each binned axis of length n // factor.
+    """
+    if statistic not in STATISTICS:
+        raise ArgumentError(f'Unknown statistic {statistic}, use {STATISTICS}')
+    data = np.asarray(data)
+    factors = np.atleast_1d(factor).astype(int).tolist()
+    if axis is None:
+        axis = tuple(range(len(factors)))
+    axes = [a % data.ndim for a in np.atleast_1d(axis).tolist()]
+    if len(factors) == 1:
+        factors = factors * len(axes)
+    if len(factors) != len(axes):
+        raise ArgumentError('factor must be an int or one value per axis')
+    if any(f < 1 for f in factors):
+        raise ArgumentError('factor must be >= 1')
+    factors = dict(zip(axes, factors))
+    view, block_axes = _block_view(data, factors)
+    if weights is None:
+        if statistic == 'median':
+            return (np.nanmedian if nan else np.median)(view, axis=block_axes)
+        if statistic == 'sum':
+            return (np.nansum if nan else np.sum)(view, axis=block_axes)
+        return (np.nanmean if nan else np.mean)(view, axis=block_axes)
+    if statistic == 'median':
+        raise ArgumentError('weights are not supported for the median')
+    weights = np.broadcast_to(np.asarray(weights, dtype=float), data.shape)
+    wview, _ = _block_view(weights, factors)
+    wx = wview * view
+    if nan:
+        valid = ~np.isnan(wx)
+        wx = np.where(valid, wx, 0)
+        wview = np.where(valid, wview, 0)
+    total = wx.sum(axis=block_axes)
+    if statistic == 'sum':
+        return total
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return total / wview.sum(axis=block_axes)
+
+
+def _binned_median(values, index, nbins: int):
+    """Median of the values in each bin, nan for empty bins."""
+    keep = (index >= 0) & ~np.isnan(values)
+    values, index = values[keep], index[keep]
+    out = np.full(nbins, np.nan)
+    if values.size == 0:
+        return out
+    order = np.lexsort((values, index))
+    values, index = values[order], index[order]
+    count = np.bincount(index, minlength=nbins)
+    starts = np.concatenate([[0], np.cumsum(count)[:-1]])
+    full = count > 0
+    lo = starts[full] + (count[full] - 1) // 2
+    hi = starts[full] + count[full] // 2
+    out[full] = 0.5 * (values[lo] + values[hi])
+    return out
+
+
+def rebin_irregular(x, y, edges=None, window: float = None, statistic: str = 'mean'):
+    """Bin irregularly sampled y(x).
+
+    Parameters
+    ----------
+    x, y: np.ndarray
+        1D coordinates and values.
+    edges: np.ndarray
+        Monotonically increasing bin edges, bins are [e_i, e_i+1).
+    window: float
+        Instead of edges, bin every sample with all samples within
+        +- window of it. Windows whose binned x repeats one already seen
+        are dropped.
+    statistic: str
+        One of mean, sum, median, applied to both x and y.
+
+    Returns
+    -------
+    tuple(np.ndarray, np.ndarray)
+        The binned x and y, sorted by x. Empty bins are dropped.
+    """
+    if statistic not in STATISTICS:
+        raise ArgumentError(f'Unknown statistic {statistic}, use {STATISTICS}')
+    if (edges is None) == (window is None):
+        raise ArgumentError('Give exactly one of edges or window')
+    x = np.asarray(x, dtype=float).ravel()
+    y = np.asarray(y, dtype=float).ravel()
+    order = np.argsort(x, kind='stable')
+    x, y = x[order], y[order]
+    if edges is not None:
+        edges = np.asarray(edges, dtype=float)
+        nbins = edges.size - 1
+        index = digitize(x, edges, right=False)
+        if statistic == 'median':
+            bx, by = _binned_median(x, index, nbins), _binned_median(y, index, nbins)
+        else:
+            bx = binned_statistics(x, index, nbins, (statistic,))[statistic]
+            by = binned_statistics(y, index, nbins, (statistic,))[statistic]
+        full = np.bincount(index[index >= 0], minlength=nbins)[:nbins] > 0
+        return bx[full], by[full]
+    # samples with |x - xi| < window
+    lo = np.searchsorted(x, x - window, side='right')
+    hi = np.searchsorted(x, x + window, side='left')
+    if statistic == 'median':
+        bx = _sliding_median(x, lo, hi, True)
+        by = _sliding_median(y, lo, hi, True)
+    else:
+        xy = np.stack([x, y], axis=-1)
+        valid = ~np.isnan(xy)
+        sums = _prefix(np.where(valid, xy, 0))
+        sums = sums[hi] - sums[lo]
+        if statistic == 'mean':
+            count = _prefix(valid)
+            with np.errstate(invalid='ignore', divide='ignore'):
+                sums = sums / (count[hi] - count[lo])
+        bx, by = sums[:, 0], sums[:, 1]
+    _, first = np.unique(bx, return_index=True)
+    first = np.sort(first)
+    return bx[first], by[first]
+
+# end of code
+
+# end of file
@@ -0,0 +1,269 @@
+# distutils: extra_compile_args = -fopenmp -O3
+# distutils: extra_link_args = -fopenmp
+"""Affine resampling of image stacks with cached coordinate maps."""
+# flake8: noqa
+# cython modules
+cimport cython
+from cython.parallel import prange as crange
+
+# internal modules
+import os
+from functools import lru_cache
+from concurrent.futures import ThreadPoolExecutor
+
+# external modules
+import numpy as np
+from scipy import ndimage
+
+# relative modules
+from ..misc.errors import ArgumentError
+
+# global attributes
+__all__ = ['AffineResampler', 'rotation', 'rotate_cube']
+__doc__ = """Resample every plane of a cube through one coordinate map.
+
+An affine map from output to input pixel coordinates is evaluated once
+for a given output grid. For nearest and bilinear sampling the map is
+reduced to flat gather indices and weights, so resampling a cube is a
+nogil gather of every plane, split across OpenMP threads. Cubic sampling
+reuses the cached coordinates with scipy.ndimage.map_coordinates plane by
+plane on a thread pool. `rotation` caches the
+resampler of a rotation angle and image shape, so rotating many cubes
+(or a cube and its mask) at one angle computes the map once.
+"""
+__filename__ = __file__.split('/')[-1].strip('.py')
+__path__ = __file__.strip('.py').strip(__filename__)
+
+# tolerance on input coordinates that fall on the image border
+_EDGE = 1e-9
+
+ctypedef fused real:
+    float
+    double
+
+
+@cython.boundscheck(False)
+@cython.wraparound(False)
+def _gather(real[:, ::1] planes, const Py_ssize_t[:, ::1] index, const double[:, ::1] weight,
+            const unsigned char[::1] valid, real[:, ::1] out, double cval):
+    """out[p, k] = sum_t weight[t, k] * planes[p, index[t, k]] for valid k."""
+    cdef Py_ssize_t p, k, t
+    cdef Py_ssize_t nplanes = planes.shape[0], nout = out.shape[1], ntaps = index.shape[0]
+    cdef double acc
+    with nogil:
+        for p in crange(nplanes, schedule='static'):
+            for k in range(nout):
+                if not valid[k]:
+                    out[p, k] = <real> cval
+                    continue
+                acc = 0.
+                for t in range(ntaps):
+                    acc = acc + weight[t, k] * planes[p, index[t, k]]
+                out[p, k] = <real> acc
+
+
+class AffineResampler(object):
+    """Sample planes at input = matrix @ output + offset.
+
+    Usage
+    -----
+    res = AffineResampler(matrix, offset, cube.shape[-2:], (ny, nx))
+    out = res(cube)  # every (ny_in, nx_in) plane of (..., ny_in, nx_in)
+
+    Parameters
+    ----------
+    matrix: np.ndarray
+        The 2x2 matrix acting on output (row, col) coordinates.
+    offset: np.ndarray
+        The (row, col) offset.
+    in_shape: tuple[int, int]
+        The (ny, nx) shape of the input planes.
+    out_shape: tuple[int, int]
+        The (ny, nx) shape of the output planes.
+    order: int
+        0 (nearest), 1 (bilinear) or 3 (cubic spline).
+    cval: float
+        The value of samples outside of the input.
+    nthreads: int
+        The number of threads of cubic sampling, defaults to the cpu
+        count.
+    """
+
+    def __init__(self, matrix, offset, in_shape, out_shape, order: int = 1,
+                 cval: float = np.nan, nthreads: int = None):
+        if order not in (0, 1, 3):
+            raise ArgumentError(f'order must be 0, 1 or 3, got {order}')
+        self.matrix = np.asarray(matrix, dtype=float).reshape(2, 2)
+        self.offset = np.asarray(offset, dtype=float).reshape(2)
+        self.in_shape = tuple(int(n) for n in in_shape)
+        self.out_shape = tuple(int(n) for n in out_shape)
+        self.order = order
+        self.cval = cval
+        self.nthreads = nthreads or os.cpu_count() or 1
+        grid = np.indices(self.out_shape, dtype=float).reshape(2, -1)
+        coords = self.matrix @ grid + self.offset[:, None]
+        # the spline needs the coordinates, the other orders only their taps
+        self.coords = coords if order == 3 else None
+        if order != 3:
+            self._index, self._weight, self._valid = self.__taps(coords)
+
+    def __taps(self, coords):
+        """Flat input indices and weights of each output pixel."""
+        ny, nx = self.in_shape
+        r, c = coords
+        valid = (r >= -_EDGE) & (r <= ny - 1 + _EDGE) & (c >= -_EDGE) & (c <= nx - 1 + _EDGE)
+        r = np.clip(r, 0, ny - 1)
+        c = np.clip(c, 0, nx - 1)
+        if self.order == 0:
+            index = (np.rint(r).astype(np.intp) * nx + np.rint(c).astype(np.intp))[None]
+            return index, np.ones(index.shape), valid.view(np.uint8)
+        r0 = np.minimum(np.floor(r), max(ny - 2, 0)).astype(np.intp)
+        c0 = np.minimum(np.floor(c), max(nx - 2, 0)).astype(np.intp)
+        fr, fc = r - r0, c - c0
+        r1 = np.minimum(r0 + 1, ny - 1)
+        c1 = np.minimum(c0 + 1, nx - 1)
+        index = np.stack([r0 * nx + c0, r0 * nx + c1, r1 * nx + c0, r1 * nx + c1])
+        weight = np.stack([(1 - fr) * (1 - fc), (1 - fr) * fc, fr * (1 - fc), fr * fc])
+        # point taps without weight at the heaviest tap, so nans next to a
+        # sample that does not use them do not leak in through 0 * nan
+        heaviest = index[np.argmax(weight, axis=0), np.arange(index.shape[1])]
+        index = np.ascontiguousarray(np.where(weight > 0, index, heaviest))
+        return index, np.ascontiguousarray(weight), valid.view(np.uint8)
+
+    def __cubic(self, planes, out):
+        """Spline resample a (n, ny, nx) block of planes into (n, nout)."""
+        for p, o in zip(planes, out):
+            o[...] = ndimage.map_coordinates(p, self.coords, order=3, mode='constant',
+                                             cval=self.cval, prefilter=True)
+
+    def __call__(self, data, out=None):
+        """Resample every plane of data.
+
+        Parameters
+        ----------
+        data: np.ndarray
+            Array of shape (..., ny_in, nx_in).
+        out: np.ndarray
+            Optional C contiguous output of shape (..., ny_out, nx_out)
+            and the dtype of data (float32 or float64).
+
+        Returns
+        -------
+        np.ndarray
+            The resampled planes.
+        """
+        data = np.asarray(data)
+        if data.shape[-2:] != self.in_shape:
+            raise ArgumentError(f'Expected planes of shape {self.in_shape}, got {data.shape[-2:]}')
+        shape = data.shape[:-2] + self.out_shape
+        dtype = np.float32 if data.dtype == np.float32 else np.float64
+        if out is None:
+            out = np.empty(shape, dtype=dtype)
+        elif out.shape != shape or out.dtype != dtype or not out.flags.c_contiguous:
+            raise ArgumentError(f'out must be a C contiguous {np.dtype(dtype)} array of shape {shape}')
+        planes = np.ascontiguousarray(data, dtype=dtype).reshape(-1, *self.in_shape)
+        outplanes = out.reshape(planes.shape[0], -1)
+        if self.order != 3:
+            _gather(planes.reshape(planes.shape[0], -1), self._index, self._weight,
+                    self._valid, outplanes, self.cval)
+            return out
+        nplanes = planes.shape[0]
+        chunk = max(1, -(-nplanes // self.nthreads))
+        starts = range(0, nplanes, chunk)
+        if self.nthreads <= 1 or len(starts) <= 1:
+            self.__cubic(planes, outplanes)
+            return out
+        with ThreadPoolExecutor(max_workers=self.nthreads) as pool:
+            futures = [pool.submit(self.__cubic, planes[s:s + chunk], outplanes[s:s + chunk])
+                       for s in starts]
+            for f in futures:
+                f.result()
+        return out
+
+
+@lru_cache(maxsize=16)
+def _rotation(angle, shape, center, resize, order, cval):
+    """Resampler of `rotation`, cached on hashable arguments.
+
+    A nan cval is passed as None, nan never compares equal to another nan.
+    """
+    cval = np.nan if cval is None else cval
+    ny, nx = shape
+    theta = np.radians(angle)
+    if center is None:
+        center = ((ny - 1) / 2., (nx - 1) / 2.)
+    center = np.asarray(center, dtype=float)
+    # (row, col) form of a counter-clockwise rotation of (x, y) = (col, row)
+    matrix = np.array([[np.cos(theta), np.sin(theta)],
+                       [-np.sin(theta), np.cos(theta)]])
+    out_shape, origin = (ny, nx), np.zeros(2)
+    if resize:
+        corners = np.array([[0, 0], [0, nx - 1], [ny - 1, 0], [ny - 1, nx - 1]], dtype=float).T
+        fwd = matrix.T @ (corners - center[:, None]) + center[:, None]
+        lo, hi = fwd.min(axis=1), fwd.max(axis=1)
+        out_shape = tuple(int(n) for n in np.around(hi - lo + 1))
+        origin = lo
+    offset = center - matrix @ center + matrix @ origin
+    return AffineResampler(matrix, offset, shape, out_shape, order=order, cval=cval)
+
+
+def rotation(angle: float, shape, center=None, resize: bool = False, order: int = 1,
+             cval: float = np.nan):
+    """Cached resampler rotating (ny, nx) planes counter-clockwise.
+
+    Parameters
+    ----------
+    angle: float
+        The rotation in degrees, counter-clockwise as in
+        skimage.transform.rotate.
+    shape: tuple[int, int]
+        The (ny, nx) shape of the planes.
+    center: tuple[float, float]
+        The (row, col) center of rotation, defaults to the image center.
+    resize: bool
+        Grow the output to hold the whole rotated image.
+    order: int
+        0, 1 or 3, see `AffineResampler`.
+    cval: float
+        The value outside of the input.
+
+    Returns
+    -------
+    AffineResampler
+        The resampler, shared between calls with the same arguments.
+    """
+    center = None if center is None else tuple(float(c) for c in center)
+    cval = None if np.isnan(cval) else float(cval)
+    return _rotation(float(angle), tuple(int(n) for n in shape), center, bool(resize), int(order), cval)
+
+
+def rotate_cube(data, angle: float, axis: int = 0, center=None, resize: bool = False,
+                order: int = 1, cval: float = np.nan):
+    """Rotate every plane of a cube orthogonal to axis.
+
+    Parameters
+    ----------
+    data: np.ndarray
+        2D image or 3D cube.
+    angle: float
+        The counter-clockwise rotation in degrees.
+    axis: int
+        The axis of a cube that is not rotated (e.g. the channel axis).
+
+    Returns
+    -------
+    np.ndarray
+        The rotated data with axis in its original position.
+    """
+    data = np.asarray(data)
+    if data.ndim == 2:
+        return rotation(angle, data.shape, center, resize, order, cval)(data)
+    if data.ndim != 3:
+        raise ArgumentError(f'Expected a 2D image or 3D cube, got {data.ndim}D')
+    cube = np.moveaxis(data, axis, 0)
+    rotated = rotation(angle, cube.shape[1:], center, resize, order, cval)(cube)
+    return np.moveaxis(rotated, 0, axis)
+
+# end of code
+
+# end of file
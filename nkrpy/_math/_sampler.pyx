@@ -5,42 +5,168 @@
 
 # external modules
 import numpy as np
+from scipy.special import log_ndtr, ndtri_exp
 
 # relative modules
 
 # global attributes
-__all__ = ['gaussian_sample', 'sampler', 'samplers']
-__doc__ = """."""
+__all__ = ['gaussian_sample', 'sampler', 'samplers',
+           'truncated_normal', 'bounded_sample']
+__doc__ = """Bounded random sampling.
+
+The truncated distributions are drawn by inverting the CDF, so every
+sample is accepted and the cost does not depend on how tight the bounds
+are. Intervals in the upper tail are mirrored into the lower tail and
+the CDF is evaluated in log space, which keeps bounds many sigma from
+the mean accurate. All samplers take a numpy Generator (or a seed) and a
+batch shape that the parameters are broadcast against. Without one they
+draw from the global np.random state, so np.random.seed still applies.
+"""
 __filename__ = __file__.split('/')[-1].strip('.py')
 __path__ = __file__.strip('.py').strip(__filename__)
-samplers = ('gaussian', 'uniform')
+samplers = ('gaussian', 'uniform', 'lognormal')
+
+
+def _generator(rng):
+    """The random source of rng, the seedable global state for None."""
+    if rng is None:
+        return np.random.mtrand._rand
+    if isinstance(rng, (np.random.Generator, np.random.RandomState)):
+        return rng
+    return np.random.default_rng(rng)
+
+
+def truncated_normal(loc=0., scale=1., lower=-np.inf, upper=np.inf, size=None, rng=None, out=None):
+    """Sample a normal distribution truncated to [lower, upper].
+
+    Parameters
+    ----------
+    loc, scale: float | np.ndarray
+        The mean and standard deviation of the untruncated normal.
+    lower, upper: float | np.ndarray
+        The bounds, infinite for an open side.
+    size: int | tuple
+        The batch shape, defaults to the broadcast shape of the parameters.
+    rng: np.random.Generator | int
+        The generator or a seed for np.random.default_rng, None draws
+        from the global np.random state (np.random.seed).
+    out: np.ndarray
+        Optional preallocated float output of shape size.
+
+    Returns
+    -------
+    np.ndarray
+        The samples. A zero scale returns loc clipped to the bounds.
+    """
+    rng = _generator(rng)
+    loc, scale, lower, upper = map(lambda v: np.asarray(v, dtype=float), (loc, scale, lower, upper))
+    shape = np.broadcast_shapes(loc.shape, scale.shape, lower.shape, upper.shape) if size is None else tuple(np.atleast_1d(size).tolist())
+    loc, scale, lower, upper = np.broadcast_arrays(*(np.broadcast_to(v, shape) for v in (loc, scale, lower, upper)))
+    if np.any(lower > upper):
+        raise ValueError('lower must be <= upper')
+    if out is None:
+        out = np.empty(shape, dtype=float)
+    elif out.shape != shape:
+        raise ValueError(f'out must have shape {shape}')
+    with np.errstate(divide='ignore', invalid='ignore'):
+        a = (lower - loc) / scale
+        b = (upper - loc) / scale
+    # mirror intervals in the upper tail into the lower tail
+    flip = a > 0
+    a, b = np.where(flip, -b, a), np.where(flip, -a, b)
+    la, lb = log_ndtr(a), log_ndtr(b)
+    r = rng.random(shape)
+    # log(Pa + r (Pb - Pa)), factored on Pb to stay in log space
+    with np.errstate(divide='ignore', invalid='ignore', over='ignore'):
+        lu = lb + np.log(r + (1. - r) * np.exp(la - lb))
+        z = np.clip(ndtri_exp(lu), a, b)
+    z = np.where(flip, -z, z)
+    np.multiply(z, scale, out=out)
+    out += loc
+    # degenerate widths and bounds
+    fixed = ~(scale > 0)
+    if fixed.any():
+        out[fixed] = np.clip(loc[fixed], lower[fixed], upper[fixed])
+    return out
+
+
+def bounded_sample(sample: str = 'gaussian', lower=-np.inf, upper=np.inf, size=None, rng=None, out=None, **params):
+    """Sample a distribution truncated to [lower, upper].
 
-def gaussian_sample(lower_bound, upper_bound, size: int=100, scale=None):
+    Parameters
+    ----------
+    sample: str
+        One of gaussian (normal), uniform or lognormal.
+    lower, upper: float | np.ndarray
+        The bounds. The uniform defaults to them when low, high are not
+        given.
+    size: int | tuple
+        The batch shape.
+    rng: np.random.Generator | int
+        The generator or a seed, None uses the global np.random state.
+    params:
+        loc, scale for gaussian; low, high for uniform; mean, sigma of
+        the underlying normal for lognormal.
+
+    Returns
+    -------
+    np.ndarray
+        The samples.
+    """
+    sample = sample.lower()
+    rng = _generator(rng)
+    if sample in ('gaussian', 'normal'):
+        return truncated_normal(params.get('loc', 0.), params.get('scale', 1.), lower, upper, size=size, rng=rng, out=out)
+    if sample == 'uniform':
+        low = np.maximum(params.get('low', lower), lower)
+        high = np.minimum(params.get('high', upper), upper)
+        if not (np.all(np.isfinite(low)) and np.all(np.isfinite(high))):
+            raise ValueError('uniform needs finite bounds')
+        ret = rng.uniform(low, high, size=size)
+    elif sample == 'lognormal':
+        with np.errstate(divide='ignore'):
+            lo = np.log(np.maximum(lower, 0))
+        ret = np.exp(truncated_normal(params.get('mean', 0.), params.get('sigma', 1.), lo, np.log(upper), size=size, rng=rng))
+    else:
+        raise ValueError(f'Unknown sample {sample}, use {samplers}')
+    if out is None:
+        return ret
+    out[...] = ret
+    return out
+
+
+def gaussian_sample(lower_bound, upper_bound, size: int=100, scale=None, rng=None):
     """Sample from a gaussian given limits."""
     if lower_bound == upper_bound:
         scale = 0
     loc = (lower_bound + upper_bound) / 2.
     if scale is None:
         scale = (upper_bound - lower_bound) / 2.
-    results = []
-    while len(results) < size:
-        samples = np.random.normal(loc=loc, scale=scale,
-                                   size=size - len(results))
-        results += [sample for sample in samples
-                    if lower_bound <= sample <= upper_bound]
-    return results
+    return truncated_normal(loc, scale, lower_bound, upper_bound, size=size, rng=rng)
+
+
+def _params(args, kwargs, sample):
+    """Name the positional arguments of the legacy samplers."""
+    if sample in ('gaussian', 'normal'):
+        names = ('lower_bound', 'upper_bound', 'size', 'scale')
+    else:
+        names = ('low', 'high', 'size')
+    params = dict(zip(names, args))
+    params.update(kwargs)
+    return params
 
 
-def _sample(*args, sample, **kwargs):
+def _sample(*args, sample, rng=None, **kwargs):
+    params = _params(args, kwargs, sample)
     if sample in ('gaussian', 'normal'):
-        ret = gaussian_sample(*args, **kwargs)
+        ret = gaussian_sample(rng=rng, **params)
     elif sample == 'uniform':
-        ret = np.random.uniform(*args, **kwargs)
+        ret = _generator(rng).uniform(**params)
     return ret
 
 
 def sampler(*args, sample: str='gaussian', resample=False,
-           lim=None, logic=None, resample_n=100, **kwargs):
+           lim=None, logic=None, resample_n=100, rng=None, **kwargs):
     """Sample a given distribution.
 
     Parameters
@@ -50,38 +176,34 @@ def sampler(*args, sample: str='gaussian', resample=False,
     resample: bool
         if resampling is allowed
     lim: float | None
-        An upper or lower limit, if outside then resamples
+        An upper or lower limit, samples are drawn only on the valid side
     logic: str [< | >]
         Determines whether lim is upper or lower lim
     resample_n: int
-        Number of resamples to try, worse case
+        Unused, kept for compatibility. The limit is applied by
+        truncating the distribution so no resampling is needed.
+    rng: np.random.Generator | int
+        The generator or a seed, None uses the global np.random state.
     """
     sample = sample.lower()
-    ret = np.array(_sample(*args, sample=sample, **kwargs))
-    dshape = ret.shape
-    fine = np.zeros(1)
-    i = 0
-    while resample and (i < resample_n):
-        gatherl = np.where(ret < lim)[0]
-        gatherg = np.where(ret > lim)[0]
-        if (('<' in logic) and (len(gatherl) < dshape[0])) or \
-           (('>' in logic) and (len(gatherg) < dshape[0])):
-            resample = True
-        else:
-            resample = False
-        if ('>' in logic):
-            gather = gatherg
-        else:
-            gather = gatherl
-        ret = ret[gather]
-        if resample:
-            if gather.shape[0] < dshape[0]:
-                new = np.array(_sample(*args, sample=sample, **kwargs))
-                ret = np.concatenate([ret, new])
-            else:
-                resample = False
-        i += 1
-    return ret[:dshape[0]]
+    if not resample:
+        return np.array(_sample(*args, sample=sample, rng=rng, **kwargs))
+    params = _params(args, kwargs, sample)
+    size = params.pop('size', 100)
+    if sample in ('gaussian', 'normal'):
+        lower, upper = params['lower_bound'], params['upper_bound']
+        scale = params.get('scale')
+        loc = (lower + upper) / 2.
+        if scale is None:
+            scale = (upper - lower) / 2.
+        params = {'loc': loc, 'scale': scale if lower != upper else 0}
+    else:
+        lower, upper = params.pop('low', 0.), params.pop('high', 1.)
+    if '>' in logic:
+        lower = max(lower, lim)
+    else:
+        upper = min(upper, lim)
+    return bounded_sample(sample, lower, upper, size=size, rng=rng, **params)
 
 # end of code
 
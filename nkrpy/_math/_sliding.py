@@ -0,0 +1,230 @@
+"""Sliding window statistics."""
+# flake8: noqa
+# cython modules
+
+# internal modules
+from bisect import bisect_left, insort
+
+# external modules
+import numpy as np
+
+# relative modules
+
+# global attributes
+__all__ = ['sliding_bounds', 'sliding_stat', 'grouped_mean']
+__doc__ = """Running statistics over fixed-width windows in O(n).
+
+The mean, std and rms are computed from prefix sums of the values (and
+their squares and valid counts), so the cost does not depend on the
+window width. The median keeps a sorted window that is updated as the
+window slides, O(n log w) comparisons. All statistics reduce along the
+zeroth axis and accept trailing dimensions.
+
+Edge modes
+----------
+stretch
+    Same length as the input, windows are truncated at the edges.
+cyclic
+    Same length as the input, windows wrap around the ends.
+pad
+    Same length as the input, the ends are padded with fill_value. A
+    fill_value of None (nan) is equivalent to stretch for nan-aware stats.
+bounded
+    Only the n - width + 1 windows fully inside the array.
+"""
+__filename__ = __file__.split('/')[-1].strip('.py')
+__path__ = __file__.strip('.py').strip(__filename__)
+
+EDGES = ('stretch', 'cyclic', 'pad', 'bounded')
+STATISTICS = ('mean', 'std', 'rms', 'median', 'sum', 'count')
+
+
+def sliding_bounds(x, width: int, end: str = 'stretch', fill_value: float = None):
+    """Resolve the edge mode to an array and half-open window bounds.
+
+    Parameters
+    ----------
+    x: np.ndarray
+        The values, windows slide along the zeroth axis.
+    width: int
+        The number of points in each window. The window of point i spans
+        [i - width // 2, i - width // 2 + width).
+    end: str
+        One of stretch, cyclic, pad, bounded.
+    fill_value: float
+        The padding value for end='pad', None pads with nan.
+
+    Returns
+    -------
+    tuple(np.ndarray, np.ndarray, np.ndarray)
+        The (possibly extended) array and the lo, hi index of each window,
+        both non-decreasing.
+    """
+    if end not in EDGES:
+        raise ValueError(f'Unknown end {end}, use {EDGES}')
+    width = int(width)
+    if width < 1:
+        raise ValueError('width must be >= 1')
+    x = np.asarray(x, dtype=float)
+    n = x.shape[0]
+    left = width // 2
+    right = width - 1 - left
+    idx = np.arange(n)
+    if end == 'stretch':
+        return x, np.clip(idx - left, 0, n), np.clip(idx + right + 1, 0, n)
+    if end == 'bounded':
+        idx = np.arange(max(n - width + 1, 0))
+        return x, idx, idx + width
+    if end == 'cyclic':
+        ext = x[np.arange(-left, n + right) % n]
+    else:
+        fill = np.nan if fill_value is None else fill_value
+        ext = np.pad(x, [(left, right)] + [(0, 0)] * (x.ndim - 1), constant_values=fill)
+    return ext, idx, idx + width
+
+
+def _prefix(a):
+    """Cumulative sum along axis 0 with a leading zero row."""
+    out = np.zeros((a.shape[0] + 1, *a.shape[1:]), dtype=float)
+    np.cumsum(a, axis=0, out=out[1:])
+    return out
+
+
+def _window_sums(a, lo, hi):
+    pre = _prefix(a)
+    return pre[hi] - pre[lo]
+
+
+def _sliding_median(ext, lo, hi, nan: bool):
+    """Median of each window by updating a sorted window buffer."""
+    flat = ext.reshape(ext.shape[0], -1)
+    out = np.full((lo.shape[0], flat.shape[1]), np.nan)
+    lo, hi = lo.tolist(), hi.tolist()
+    for c in range(flat.shape[1]):
+        col = flat[:, c].tolist()
+        buf = []
+        nnan = a = b = 0
+        for i, (l, h) in enumerate(zip(lo, hi)):
+            while b < h:
+                v = col[b]
+                if v != v:
+                    nnan += 1
+                else:
+                    insort(buf, v)
+                b += 1
+            while a < l:
+                v = col[a]
+                if v != v:
+                    nnan -= 1
+                else:
+                    del buf[bisect_left(buf, v)]
+                a += 1
+            m = len(buf)
+            if m and (nan or not nnan):
+                out[i, c] = buf[m // 2] if m % 2 else 0.5 * (buf[m // 2 - 1] + buf[m // 2])
+    return out.reshape((len(lo), *ext.shape[1:]))
+
+
+def sliding_stat(x, width: int, stat: str = 'mean', end: str = 'stretch',
+                 fill_value: float = None, nan: bool = True):
+    """Compute a statistic in a window around every point.
+
+    Parameters
+    ----------
+    x: np.ndarray
+        The values, windows slide along the zeroth axis.
+    width: int
+        The number of points in each window.
+    stat: str
+        One of mean, std, rms, median, sum, count. The std is the
+        population standard deviation (ddof=0) and the rms is
+        sqrt(mean(x ** 2)). Windows without valid values are nan, except
+        for the sum and count which are 0.
+    end: str
+        The edge mode, see the module docstring.
+    fill_value: float
+        The padding value for end='pad'.
+    nan: bool
+        Ignore nans (like np.nanmean), otherwise any nan in a window
+        makes the result nan.
+
+    Returns
+    -------
+    np.ndarray
+        The statistic of each window.
+    """
+    if stat not in STATISTICS:
+        raise ValueError(f'Unknown statistic {stat}, use {STATISTICS}')
+    ext, lo, hi = sliding_bounds(x, width, end=end, fill_value=fill_value)
+    if stat == 'median':
+        return _sliding_median(ext, lo, hi, nan)
+    valid = ~np.isnan(ext)
+    count = _window_sums(valid, lo, hi)
+    if stat == 'count':
+        return count
+    # shift by the mean to keep the sum of squares well conditioned
+    center = np.nanmean(ext, axis=0) if valid.any() else np.zeros(ext.shape[1:])
+    center = np.where(np.isnan(center), 0, center)
+    vals = np.where(valid, ext - center, 0)
+    s1 = _window_sums(vals, lo, hi)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        if stat == 'sum':
+            res = s1 + count * center
+        elif stat == 'mean':
+            res = s1 / count + center
+        else:
+            s2 = _window_sums(vals ** 2, lo, hi)
+            if stat == 'std':
+                res = np.sqrt(np.clip(s2 / count - (s1 / count) ** 2, 0, None))
+            else:
+                res = np.sqrt((s2 + 2 * center * s1) / count + center ** 2)
+        if stat != 'sum':
+            res = np.where(count > 0, res, np.nan)
+    if not nan:
+        full = (hi - lo).reshape(-1, *([1] * (ext.ndim - 1)))
+        res = np.where(count < full, np.nan, res)
+    return res
+
+
+def grouped_mean(keys, values, width: float):
+    """Average the values whose keys fall within width of a group start.
+
+    Groups start at the smallest key and span [key, key + width]. The next
+    group starts at the last member of the previous group (or the next
+    point if the group had a single member), so consecutive groups share
+    their boundary point.
+
+    Parameters
+    ----------
+    keys: np.ndarray
+        Sorted 1D keys.
+    values: np.ndarray
+        Values with the same zeroth axis length as keys.
+    width: float
+        The group width in the units of keys.
+
+    Returns
+    -------
+    np.ndarray
+        The nan-aware mean of each group.
+    """
+    keys = np.asarray(keys, dtype=float)
+    values = np.asarray(values, dtype=float)
+    valid = ~np.isnan(values)
+    csum = _prefix(np.where(valid, values, 0))
+    ccount = _prefix(valid)
+    starts = np.searchsorted(keys, keys, side='left')
+    stops = np.searchsorted(keys, keys + width, side='right')
+    lo, hi = [], []
+    ci = 0
+    while ci < keys.shape[0]:
+        lo.append(starts[ci])
+        hi.append(stops[ci])
+        last = stops[ci] - 1
+        ci = ci + 1 if last == ci else last
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return (csum[hi] - csum[lo]) / (ccount[hi] - ccount[lo])
+
+# end of code
+
+# end of file
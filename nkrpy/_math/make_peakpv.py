@@ -2,23 +2,21 @@ import numpy as np
 import matplotlib.pyplot as plt
 from nkrpy.io import fits
 import pickle
-from nkrpy import constants
+from nkrpy import math
 from nkrpy.astro import WCS
 from scipy.optimize import curve_fit
 
 
 
 def skewgaussian(x, mu, fwhm, flux, c=0, skew = 1):
+    # c was shadowed by the speed of light in the original profile, so it
+    # has never had an effect; this is the compiled emissivegaussian
+    return math.emissivegaussian(x, mu, fwhm, flux, skew)
 
-    sigma = fwhm / 1000. / (2. * np.sqrt(2. * np.log(2)))
-    c = constants.c / 100.
-    s = mu * sigma / c
-    a = flux / np.sqrt(2. * np.pi) / s
-    dx = (x - mu) / s
-    dx[x > mu] /= skew
-    if skew > 1:
-        return 2. * a * np.exp(-0.5 * dx ** 2) / (1. + skew)
-    return a * np.exp(-0.5 * dx ** 2)
+
+def skewgaussian_jac(x, mu, fwhm, flux, c=0, skew = 1):
+    jac = math.emissivegaussian_jac(x, mu, fwhm, flux, skew)
+    return np.insert(jac, 3, 0., axis=1)
 
 
 parent = (lambda x: '/net/lovell/myhome3/reynolds/ALMA/ALMAc6-BHR7.2019.1.00463.S/originals/2019.1.00463.S/' + x)
@@ -44,7 +42,7 @@ def load(file, name):
     fitserror = []
     for channel in range(pv.shape[0]):
         flux = pv[channel, :]
-        popt, pcov = curve_fit(skewgaussian, offsets, flux, p0=[0, 0.2, flux.max(), med + std, 0])
+        popt, pcov = curve_fit(skewgaussian, offsets, flux, p0=[0, 0.2, flux.max(), med + std, 0], jac=skewgaussian_jac)
         perr = np.sqrt(np.diag(pcov))
         peakflux_offset = offsets[np.argmax(flux)]
         fits.append([channel, popt[0], popt[1], peakflux_offset])
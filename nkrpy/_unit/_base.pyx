@@ -31,8 +31,9 @@ class BaseVals(UnitClass):
         if isinstance(vals, self.__class__):
             vals = vals.vals
         self.__inplace = inplace
-        if not inplace:
-            vals = deepcopy(vals)
+        if not inplace and typecheck(vals):
+            # scalars are immutable, arrays only need a flat copy
+            vals = vals.copy() if isinstance(vals, np.ndarray) else deepcopy(vals)
         self.vals = vals
 
     def tolist(self):
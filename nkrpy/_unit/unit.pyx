@@ -36,6 +36,68 @@ c = n_c.c * 1E8  # A/s
 kb = n_c.kb * 1E-7  # SI
 
 
+# every unit name and alias mapped to its unit key. Unit keys take
+# precedence over aliases, then the first unit listing an alias wins.
+_aliases = dict((k, k) for k in units)
+for _k, _u in units.items():
+    for _alias in _u['vals']:
+        _aliases.setdefault(_alias, _k)
+# (base type, base fac, final type, final fac) -> (kind, factor)
+_factors = {}
+# (base unit, final unit) as passed to Unit.convert_array -> (kind, factor)
+_pairs = {}
+
+
+def _conversion_factor(baseunit: dict, finalunit: dict):
+    """Return the cached (kind, factor) converting baseunit to finalunit.
+
+    kind is 'scale' (y = factor * x) or 'reciprocal' (y = factor / x).
+    """
+    key = (baseunit['type'], baseunit['fac'],
+           finalunit['type'], finalunit['fac'])
+    try:
+        return _factors[key]
+    except KeyError:
+        pass
+    ctype, ftype = baseunit['type'], finalunit['type']
+    bfac, ffac = baseunit['fac'], finalunit['fac']
+    kind = 'scale'
+    # converting between freq, wavelength, energy
+    if ctype == ftype:
+        fac = bfac
+    # converting from angle to wavelength
+    elif (ctype == 'angle') and (ftype == 'wave'):
+        fac = bfac * (constants.pc / constants.au)
+    elif (ctype == 'wave') and (ftype == 'angle'):
+        fac = bfac / (constants.pc / constants.au)
+    # converting from freq to wavelength
+    elif ((ctype == 'freq') and (ftype == 'wave') or
+          (ctype == 'wave') and (ftype == 'freq')):
+        kind, fac = 'reciprocal', c / bfac
+    elif (ctype == 'energy') and (ftype == 'freq'):
+        fac = bfac / n_c.h
+    elif (ctype == 'freq') and (ftype == 'energy'):
+        fac = bfac * n_c.h
+    elif ((ctype == 'energy') and (ftype == 'wave') or
+          (ctype == 'wave') and (ftype == 'energy')):
+        kind, fac = 'reciprocal', n_c.h * c / bfac
+    else:
+        fac = 1.
+    _factors[key] = (kind, fac / ffac)
+    return _factors[key]
+
+
+def _apply_factor(vals, kind: str, fac: float, out=None):
+    """Apply a conversion factor with numpy ufuncs, without copying vals."""
+    if isinstance(vals, ndarray):
+        if kind == 'reciprocal':
+            return np.divide(fac, vals, out=out)
+        return np.multiply(vals, fac, out=out)
+    if typecheck(vals):
+        return type(vals)(_apply_factor(v, kind, fac) for v in vals)
+    return fac / vals if kind == 'reciprocal' else vals * fac
+
+
 def checknum(num):
     try:
         _ = float(num)
@@ -344,14 +406,51 @@ class Unit(UnitClass):
     @classmethod
     def resolve_unit(cls, unresolved_unit: str):
         """Resolve the name of the unit from known types."""
-        unresolved_unit = str(unresolved_unit).lower()
-        if unresolved_unit not in cls.get_units():
-            for i in cls.get_units():
-                if unresolved_unit in cls.__units[i]['vals']:
-                    return cls.__units[i]
-            return None
-        else:
-            return cls.__units[unresolved_unit]
+        key = _aliases.get(str(unresolved_unit).lower(), None)
+        return None if key is None else cls.__units[key]
+
+    @classmethod
+    def convert_array(cls, arr, baseunit: str, convunit: str, out=None):
+        """Convert values without building a Unit.
+
+        The fast path for hot loops (e.g. curve_fit callbacks): the units
+        are resolved through the alias table, the conversion factor is
+        cached and applied with a single numpy ufunc.
+
+        Parameters
+        ----------
+        arr: float | numpy.ndarray
+            The values, not copied.
+        baseunit: str
+            The unit to convert from.
+        convunit: str
+            The unit to convert to.
+        out: numpy.ndarray
+            Optional output array, may be arr itself to convert in place.
+
+        Returns
+        -------
+        float | numpy.ndarray
+            The converted values.
+        """
+        try:
+            kind, fac = _pairs[(baseunit, convunit)]
+        except KeyError:
+            base = cls.resolve_unit(baseunit)
+            final = cls.resolve_unit(convunit)
+            if base is None or final is None:
+                raise UnitNotFound(f'Cannot convert {baseunit} to {convunit}')
+            if base['type'] in ('coords', 'astro'):
+                kind = 'func'
+                fac = getattr(nkrpy__convert, f"{base['name']}2{final['name']}")
+            else:
+                kind, fac = _conversion_factor(base, final)
+            _pairs[(baseunit, convunit)] = (kind, fac)
+        if kind == 'func':
+            return fac(arr)
+        if out is None and not isinstance(arr, ndarray):
+            return _apply_factor(arr, kind, fac)
+        return _apply_factor(np.asarray(arr), kind, fac, out=out)
 
     def __conversion(self, baseunit: dict=None,
                      finalunit: dict=None, vals=None):
@@ -373,16 +472,13 @@ class Unit(UnitClass):
             finalunit = self.__final_unit
         if vals is None:
             vals = self.__current_vals
-        if not isinstance(vals, UnitClass):
-            vals = BaseVals(vals, False)
         return self.__calc(vals, baseunit=baseunit, finalunit=finalunit)
 
     def __calc(self, v, baseunit: dict=None,
                finalunit: dict=None):
-        vals = BaseVals(v, inplace=False)
         if baseunit is None or finalunit is None:
-            return vals
-        ctype, ftype = baseunit['type'], finalunit['type']
+            return BaseVals(v, inplace=False)
+        ctype = baseunit['type']
         # handle coordinate and astronomial transformations
         if ctype in ('coords', 'astro'):
             if ctype == 'coords':
@@ -393,32 +489,12 @@ class Unit(UnitClass):
                 func = getattr(nkrpy__convert,
                                f"{baseunit['name']}2" +
                                f"{finalunit['name']}")
-            return func(vals)
-        # converting between freq, wavelength, energy
-        if ctype == ftype:
-            vals *= baseunit['fac']
-        # converting from angle to wavelength
-        elif (ctype == 'angle') and (ftype == 'wave'):
-            vals *= baseunit['fac'] * (constants.pc / constants.au)
-        elif (ctype == 'wave') and (ftype == 'angle'):
-            vals *= baseunit['fac'] / (constants.pc / constants.au)
-        # converting from freq to wavelength
-        elif ((ctype == 'freq') and (ftype == 'wave') or
-              (ctype == 'wave') and (ftype == 'freq')):
-            vals *= baseunit['fac']
-            vals = 1 / vals
-            vals *= c
-        elif (ctype == 'energy') and (ftype == 'freq'):
-            vals *= baseunit['fac'] / n_c.h
-        elif (ctype == 'freq') and (ftype == 'energy'):
-            vals *= baseunit['fac'] * n_c.h
-        elif ((ctype == 'energy') and (ftype == 'wave') or
-              (ctype == 'wave') and (ftype == 'energy')):
-            vals *= baseunit['fac']
-            vals = 1 / vals
-            vals *= n_c.h * c
-        vals /= finalunit['fac']
-        return vals
+            return func(BaseVals(v, inplace=False))
+        # the input is only read, the ufuncs allocate the result
+        if isinstance(v, BaseVals):
+            v = v.vals
+        kind, fac = _conversion_factor(baseunit, finalunit)
+        return _apply_factor(v, kind, fac)
 
     def __generate_vals(self, unit=None, vals=None, sort: bool=False):
         """Convert the values appropriately.
@@ -9,11 +9,14 @@ from ._wcs import WCS
 #from . import models
 from ._functions import *
 from . import _functions
+from ._moments import *
+from . import _moments
 from ._pvdiagram import *
 from . import _pvdiagram
 __all__ = ['WCS', 'tools', 'models'] +\
            _atomiclines.__all__ +\
            _functions.__all__ +\
+           _moments.__all__ +\
            _pvdiagram.__all__
 
 PACKAGES = __all__.copy()
@@ -6,7 +6,7 @@
 
 # external modules
 import numpy as np
-from scipy.ndimage.interpolation import rotate, shift
+from scipy.ndimage.interpolation import rotate
 from scipy.integrate import quad
 
 # relative modules
@@ -17,6 +17,8 @@ from ..misc import constants as n_constants
 from .._unit import Unit as nc__unit  # noqa
 from ..io import fits as nkrpy_fits
 from ..misc.decorators import validate
+from .._math._rebin import rebin_irregular
+from .._math._image import shift
 
 
 # global attributes
@@ -134,25 +136,23 @@ def remove_padding3d(data):
 
 
 def binning(x, y, windowsize=0.1):
-    newx, newy = [], []
-    for xi in x:
-        mask = np.abs(x - xi) < windowsize
-        xmed = np.median(x[mask])
-        if xmed in newx:
-            continue
-        newx.append(xmed)
-        newy.append(np.median(y[mask]))
-    return np.array(newx), np.array(newy)
-
-
-def center_image(image, ra, dec, wcs, **kwargs):
+    """Median of x and y within +- windowsize of every sample.
+
+    Windows with a repeated median x are dropped, the result is sorted
+    by x.
+    """
+    return rebin_irregular(x, y, window=windowsize, statistic='median')
+
+
+def center_image(image, ra, dec, wcs, cval: float = 0., inplace: bool = False):
     xcen = wcs(ra, return_type='pix', axis=wcs.axis1['type'])
     ycen = wcs(dec, return_type='pix', axis=wcs.axis2['type'])
     imcen = list(map(lambda x: x / 2, image.shape[1:]))
     center_shift = list(map(int, [imcen[0] - ycen, imcen[1] - xcen]))
     shifting = [0]
     shifting.extend(center_shift)
-    shifted_image = shift(input=image, shift=shifting, **kwargs)
+    # integer pixel shift, inplace reuses the cube instead of copying it
+    shifted_image = shift(image, shifting, cval=cval, out=image if inplace else None)
     return shifted_image
 
 
@@ -0,0 +1,411 @@
+"""Chunked moment maps of spectral cubes."""
+# flake8: noqa
+# cython modules
+
+# internal modules
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+# external modules
+import numpy as np
+
+# relative modules
+from ..misc.errors import ArgumentError
+
+# global attributes
+__all__ = ['moments', 'momentmap', 'estimate_rms']
+__doc__ = """Moment maps (0, 1, 2, 8 and 9) of spectral cubes.
+
+The cube is streamed in tiles so it never has to be held in memory,
+which makes this usable on memory-mapped cubes (np.memmap or
+nkrpy.io.fits.LazyCube) larger than RAM. Tiles are either slabs of
+channels ('spectral') or blocks along the first spatial axis with all
+channels ('spatial'); they are processed across a thread pool with at
+most one tile in flight per thread. The tile size is chosen so that the
+working set of all threads stays within `max_memory` bytes.
+
+Moments
+-------
+0: integrated intensity, sum(I dv)
+1: intensity weighted velocity, sum(I v dv) / sum(I dv)
+2: intensity weighted dispersion about moment 1
+8: peak intensity
+9: velocity of the peak intensity
+"""
+__filename__ = __file__.split('/')[-1].strip('.py')
+__path__ = __file__.strip('.py').strip(__filename__)
+
+_MOMENTS = (0, 1, 2, 8, 9)
+# float64 copies of a tile held while it is reduced
+_WORK_FACTOR = 6
+# float64 planes held per accumulator (s0, s1, s2, peak, vpeak, count)
+_ACC_FACTOR = 6
+
+
+def _channel_weights(nchan: int, freq_axis, rule: str):
+    """Per channel integration weights so that sum(w * I) == the integral."""
+    if rule == 'sum':
+        return np.ones(nchan, dtype=float)
+    if rule != 'trapz':
+        raise ArgumentError(f'Unknown integration rule: {rule}')
+    if nchan == 1:
+        return np.ones(1, dtype=float)
+    dx = np.diff(freq_axis)
+    weights = np.zeros(nchan, dtype=float)
+    weights[:-1] += dx / 2.
+    weights[1:] += dx / 2.
+    return weights
+
+
+class _Accumulator(object):
+    """Running sums of a set of spatial pixels."""
+
+    def __init__(self, shape):
+        self.s0 = np.zeros(shape, dtype=float)
+        self.s1 = np.zeros(shape, dtype=float)
+        self.s2 = np.zeros(shape, dtype=float)
+        self.peak = np.full(shape, -np.inf, dtype=float)
+        self.vpeak = np.full(shape, np.nan, dtype=float)
+        self.count = np.zeros(shape, dtype=np.int64)
+
+    def add(self, data, valid, weights, velocities, need):
+        """Reduce a (nchan, ...) block of data along its first axis."""
+        bshape = (-1,) + (1,) * (data.ndim - 1)
+        weights = weights.reshape(bshape)
+        velocities = velocities.reshape(bshape)
+        self.count += valid.sum(axis=0)
+        if need & {8, 9}:
+            peaked = np.where(valid, data, -np.inf)
+            idx = np.argmax(peaked, axis=0)
+            peak = np.take_along_axis(peaked, idx[None, ...], axis=0)[0]
+            better = peak > self.peak
+            self.peak[better] = peak[better]
+            if 9 in need:
+                self.vpeak[better] = velocities.ravel()[idx[better]]
+            del peaked
+        if need & {0, 1, 2}:
+            wdata = np.where(valid, data, 0.)
+            wdata *= weights
+            self.s0 += wdata.sum(axis=0)
+            if need & {1, 2}:
+                wdata *= velocities
+                self.s1 += wdata.sum(axis=0)
+                if 2 in need:
+                    wdata *= velocities
+                    self.s2 += wdata.sum(axis=0)
+
+    def merge(self, other):
+        """Fold the sums of another accumulator of the same pixels in."""
+        self.s0 += other.s0
+        self.s1 += other.s1
+        self.s2 += other.s2
+        self.count += other.count
+        better = other.peak > self.peak
+        self.peak[better] = other.peak[better]
+        self.vpeak[better] = other.vpeak[better]
+
+    def finalize(self, need, v0, counts=False):
+        """Convert the sums into moment maps."""
+        ret = {}
+        with np.errstate(invalid='ignore', divide='ignore'):
+            if 0 in need:
+                ret[0] = self.s0.copy()
+            if need & {1, 2}:
+                m1 = self.s1 / self.s0
+                if 1 in need:
+                    ret[1] = m1 + v0
+                if 2 in need:
+                    var = self.s2 / self.s0 - m1 ** 2
+                    ret[2] = np.sqrt(np.clip(var, 0, None))
+            if 8 in need:
+                peak = self.peak.copy()
+                peak[~np.isfinite(peak)] = np.nan
+                ret[8] = peak
+            if 9 in need:
+                ret[9] = self.vpeak + v0
+        nodata = self.count == 0
+        for m in ret:
+            ret[m][nodata] = np.nan
+        if counts:
+            ret['count'] = self.count.copy()
+        return ret
+
+
+def _run_tiles(func, tiles, nthreads: int):
+    """Run func on each tile with at most nthreads tiles in flight."""
+    tiles = iter(tiles)
+    if nthreads <= 1:
+        for tile in tiles:
+            func(tile)
+        return
+    with ThreadPoolExecutor(max_workers=nthreads) as pool:
+        pending = set()
+        for tile in tiles:
+            if len(pending) >= nthreads:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for f in done:
+                    f.result()
+            pending.add(pool.submit(func, tile))
+        for f in pending:
+            f.result()
+
+
+def _block(cube, axis: int, chans: slice, rows: slice, row_axis: int):
+    """Read a tile of the cube as float64 with the spectral axis first."""
+    key = [slice(None)] * cube.ndim
+    key[axis] = chans
+    key[row_axis] = rows
+    data = np.asarray(cube[tuple(key)], dtype=float)
+    return np.moveaxis(data, axis, 0)
+
+
+def _valid(data, maskblock, threshold):
+    valid = np.isfinite(data)
+    if maskblock is not None:
+        valid &= maskblock.astype(bool)
+    if threshold is not None:
+        valid &= data >= threshold
+    return valid
+
+
+def _tile_size(budget: int, perunit: int, fixed: int, nthreads: int):
+    """Units (channels or rows) per tile fitting nthreads tiles in budget."""
+    avail = (budget - fixed) // max(nthreads, 1)
+    return int(max(1, avail // max(perunit, 1)))
+
+
+def _prepare(cube, axis, mask, freq_axis):
+    if axis is None:
+        axis = getattr(cube, 'spectral_axis', None)
+        if axis is None:
+            axis = 0
+    axis = axis % cube.ndim
+    nchan = cube.shape[axis]
+    if freq_axis is None:
+        freq_axis = np.arange(nchan, dtype=float)
+    freq_axis = np.asarray(freq_axis, dtype=float)
+    if freq_axis.shape != (nchan,):
+        raise ArgumentError(f'freq_axis must have {nchan} values, '
+                            f'got {freq_axis.shape}')
+    if mask is not None and mask.ndim == cube.ndim - 1:
+        mask = np.expand_dims(np.asarray(mask), axis)
+    if mask is not None and any(m not in (1, c) for m, c
+                                in zip(mask.shape, cube.shape)):
+        raise ArgumentError(f'mask shape {mask.shape} does not broadcast '
+                            f'to the cube {cube.shape}')
+    return axis, nchan, freq_axis, mask
+
+
+def _mask_block(mask, axis, chans, rows, row_axis):
+    if mask is None:
+        return None
+    key = [slice(None)] * mask.ndim
+    if mask.shape[axis] != 1:
+        key[axis] = chans
+    if mask.shape[row_axis] != 1:
+        key[row_axis] = rows
+    return np.moveaxis(np.asarray(mask[tuple(key)]), axis, 0)
+
+
+def estimate_rms(cube, axis: int = None, mask=None, sigma: float = 3.,
+                 niter: int = 3, max_memory: int = 2 ** 28,
+                 nthreads: int = None):
+    """Estimate the noise of a cube by iterative sigma clipping.
+
+    Each iteration streams the cube once in channel slabs, so memory use
+    is bounded by max_memory regardless of the cube size.
+
+    Parameters
+    ----------
+    cube: np.ndarray | np.memmap | nkrpy.io.fits.LazyCube
+    axis: int
+        The spectral axis, defaults to the cube's spectral axis or 0.
+    mask: np.ndarray
+        Only pixels where the mask is truthy are used.
+    sigma: float
+        Clip pixels further than sigma * rms from the mean.
+    niter: int
+        Number of clipping iterations.
+
+    Returns
+    -------
+    float
+        The clipped standard deviation.
+    """
+    axis, nchan, _, mask = _prepare(cube, axis, mask, None)
+    nthreads = nthreads or os.cpu_count() or 1
+    plane = int(np.prod(cube.shape)) // nchan
+    step = _tile_size(max_memory, plane * 8 * _WORK_FACTOR, 0, nthreads)
+    row_axis = 1 if axis == 0 else 0
+    mean, rms = 0., np.inf
+    for _ in range(max(niter, 1)):
+        sums = np.zeros(3, dtype=float)
+        lock = threading.Lock()
+
+        def work(chans):
+            data = _block(cube, axis, chans, slice(None), row_axis)
+            valid = _valid(data, _mask_block(mask, axis, chans, slice(None),
+                                             row_axis), None)
+            valid &= np.abs(data - mean) <= sigma * rms
+            sel = data[valid]
+            part = (sel.size, sel.sum(), (sel ** 2).sum())
+            with lock:
+                sums[:] += part
+        _run_tiles(work, (slice(c, min(c + step, nchan))
+                          for c in range(0, nchan, step)), nthreads)
+        if sums[0] == 0:
+            return np.nan
+        newmean = sums[1] / sums[0]
+        newrms = np.sqrt(max(sums[2] / sums[0] - newmean ** 2, 0.))
+        converged = newrms == rms
+        mean, rms = newmean, newrms
+        if converged:
+            break
+    return rms
+
+
+def moments(cube, moments=(0,), freq_axis=None, axis: int = None,
+            mask=None, clip: float = None, sigma: float = None,
+            rms: float = None, rule: str = 'trapz', tile: str = 'auto',
+            max_memory: int = 2 ** 28, nthreads: int = None,
+            counts: bool = False):
+    """Compute moment maps of a cube in bounded memory.
+
+    Parameters
+    ----------
+    cube: np.ndarray | np.memmap | nkrpy.io.fits.LazyCube
+        The cube, only ever read tile by tile.
+    moments: iterable[int]
+        Any of 0, 1, 2, 8, 9.
+    freq_axis: np.ndarray
+        The spectral coordinate of each channel, defaults to the channel
+        index.
+    axis: int
+        The spectral axis, defaults to the cube's spectral axis (for a
+        LazyCube) or 0.
+    mask: np.ndarray | LazyCube
+        Only voxels where the mask is truthy contribute. Either the shape
+        of the cube or of a single channel.
+    clip: float
+        Voxels below this value are excluded.
+    sigma: float
+        Voxels below sigma * rms are excluded. rms is estimated with
+        `estimate_rms` if not given. Takes precedence over clip.
+    rms: float
+        The noise of the cube, used with sigma.
+    rule: str
+        'trapz' integrates over freq_axis with the trapezoidal rule,
+        'sum' is a plain sum over channels.
+    tile: str
+        'spectral', 'spatial' or 'auto'. 'auto' picks 'spectral' when the
+        spectral axis is the slowest varying one so tiles are contiguous
+        on disk, else 'spatial'.
+    max_memory: int
+        Bytes the working set of all threads may use. The output maps are
+        not counted.
+    nthreads: int
+        Number of threads, defaults to the cpu count.
+    counts: bool
+        Also return the number of contributing channels per pixel under
+        the key 'count'.
+
+    Returns
+    -------
+    dict
+        The moment number mapped to its map. Maps have the shape of the
+        cube without the spectral axis, and are NaN where no voxel
+        contributed.
+    """
+    need = set(int(m) for m in moments)
+    if not need or need - set(_MOMENTS):
+        raise ArgumentError(f'Moments must be in {_MOMENTS}, got {moments}')
+    if cube.ndim < 2:
+        raise ArgumentError('The cube needs a spectral and a spatial axis.')
+    axis, nchan, freq_axis, mask = _prepare(cube, axis, mask, freq_axis)
+    nthreads = nthreads or os.cpu_count() or 1
+    threshold = clip
+    if sigma is not None:
+        if rms is None:
+            rms = estimate_rms(cube, axis=axis, mask=mask,
+                               max_memory=max_memory, nthreads=nthreads)
+        threshold = sigma * rms
+    weights = _channel_weights(nchan, freq_axis, rule)
+    v0 = freq_axis.mean()
+    velocities = freq_axis - v0
+    spatial = tuple(s for i, s in enumerate(cube.shape) if i != axis)
+    row_axis = 1 if axis == 0 else 0
+    nrows = cube.shape[row_axis]
+    plane = int(np.prod(spatial))
+    if tile == 'auto':
+        tile = 'spectral' if axis == 0 else 'spatial'
+
+    if tile == 'spectral':
+        accbytes = plane * 8 * _ACC_FACTOR
+        step = _tile_size(max_memory, plane * 8 * _WORK_FACTOR + accbytes,
+                          accbytes, nthreads)
+        total = _Accumulator(spatial)
+        lock = threading.Lock()
+
+        def work(chans):
+            data = _block(cube, axis, chans, slice(None), row_axis)
+            valid = _valid(data, _mask_block(mask, axis, chans,
+                                             slice(None), row_axis),
+                           threshold)
+            part = _Accumulator(spatial)
+            part.add(data, valid, weights[chans], velocities[chans], need)
+            del data, valid
+            with lock:
+                total.merge(part)
+        _run_tiles(work, (slice(c, min(c + step, nchan))
+                          for c in range(0, nchan, step)), nthreads)
+        return total.finalize(need, v0, counts)
+    if tile != 'spatial':
+        raise ArgumentError(f'Unknown tiling: {tile}')
+
+    out = {m: np.empty(spatial, dtype=float) for m in need}
+    if counts:
+        out['count'] = np.empty(spatial, dtype=np.int64)
+    rowplane = plane // nrows
+    step = _tile_size(max_memory,
+                      rowplane * 8 * (nchan * _WORK_FACTOR + _ACC_FACTOR),
+                      0, nthreads)
+    # position of the row axis once the spectral axis is removed
+    orow = row_axis - (1 if axis < row_axis else 0)
+
+    def work(rows):
+        data = _block(cube, axis, slice(None), rows, row_axis)
+        valid = _valid(data, _mask_block(mask, axis, slice(None), rows,
+                                         row_axis), threshold)
+        part = _Accumulator(data.shape[1:])
+        part.add(data, valid, weights, velocities, need)
+        del data, valid
+        key = [slice(None)] * len(spatial)
+        key[orow] = rows
+        for m, mmap in part.finalize(need, v0, counts).items():
+            out[m][tuple(key)] = mmap
+    _run_tiles(work, (slice(r, min(r + step, nrows))
+                      for r in range(0, nrows, step)), nthreads)
+    return out
+
+
+def momentmap(cube, freq_axis=None, moment: int = 0, axis: int = -1,
+              **kwargs):
+    """Compute a single moment map.
+
+    A thin wrapper around `moments`, see it for the keywords.
+
+    Returns
+    -------
+    np.ndarray
+        The moment map.
+    np.ndarray
+        The number of channels that contributed to each pixel.
+    """
+    ret = moments(cube, moments=(moment, ), freq_axis=freq_axis, axis=axis,
+                  counts=True, **kwargs)
+    return ret[moment], ret['count']
+
+# end of code
+
+# end of file
@@ -1,4 +1,68 @@
+"""Interactive position angle and center refinement of a cube."""
+# flake8: noqa
+# cython modules
+
+# internal modules
+
+# external modules
+import numpy as np
+import matplotlib.pyplot as plt
+
+# relative modules
+from ...misc import constants
+from .._moments import momentmap
+from ..._math._image import shift
+from ._image import rotate_image
+
+# global attributes
+__all__ = ['refine_center']
+__doc__ = """Step the position angle and the RA/Dec center of a cube.
+
+The cube is rotated to the position angle and shifted in pixels. The
+moment 0 map of each trial is shown, so the user can accept an offset
+(config fixpa / fixcen) or the trials can be saved under testpv/ (test).
+"""
+__filename__ = __file__.split('/')[-1].strip('.py')
+__path__ = __file__.strip('.py').strip(__filename__)
+
+
+def refine_center(image, pa, wcs, config, vel_array, vel_array_mask, rf, test: bool = False,
+                  timer=None):
+    """Rotate a cube to its position angle, refining the angle and center.
+
+    Parameters
+    ----------
+    image: np.ndarray
+        The (nchan, ny, nx) masked cube.
+    pa: float
+        The position angle in degrees.
+    wcs: nkrpy.astro.WCS
+        The WCS of the cube, shifted in place when a center is accepted.
+    config: dict
+        Needs fixpa, fixcen, ra and dec, optionally interactive. The
+            accepted pa, ra and dec are written back.
+    vel_array: np.ndarray
+        The velocity (km/s) of each channel.
+    vel_array_mask: np.ndarray
+        The masked out channels.
+    rf: float
+        The rest frequency in Hz.
+    test: bool
+        Save the trials under testpv/.
+    timer:
+        Optional timer, logged once the cube is set up.
+
+    Returns
+    -------
+    np.ndarray
+        The rotated (and shifted) cube.
+    float
+        The position angle.
+    dict
+        The updated config.
+    """
     if test:
+        testfig, testax = plt.subplots()
         print('Imageshape (post mask; should be smaller): ', image.shape)
         for i in range(int(image.shape[0] / 4), int(image.shape[0] / 1.5), 3):
             testax.imshow(image[i, :, :], origin='lower', cmap='cividis', interpolation='nearest')
@@ -6,16 +70,20 @@
             testax.set_aspect(1./testax.get_data_ratio())
             testfig.savefig(f'testpv/test_cut-{i}.pdf', bbox_inches='tight')
             testax.cla()
-    timer.log()
-    embed() if config['interactive'] else None
+    if timer is not None:
+        timer.log()
+    if config.get('interactive'):
+        from IPython import embed
+        embed()
     # fix rotation
     offsets = [0] if not config['fixpa'] else range(-5, 5, 1)
+    rotf = None
     if config['fixcen'] or config['fixpa'] or test:
         new_freqcoord = vel_array[~vel_array_mask] * 1000. * 100. / constants.c* rf + rf
         rotf, rota = plt.subplots()
     for offset in offsets:
         offset /= 2.
-        rotated_image = rotate_image(np.nan_to_num(image), axis=-1, deg=pa + offset, use_skimage=True)
+        rotated_image = rotate_image(np.nan_to_num(image), pa + offset, axis=-1)
         if test or config['fixpa']:
             print(f'Trying PA: {pa + offset}')
             title = '' if offset != 0 else '(default)'
@@ -47,7 +115,7 @@
         pixoffset = int(offset / 3600. / wcs.get('ra---sin')['del'])
         if test or config['fixcen']:
             print(f'Trying center dec shift: {offset}" or {pixoffset} pixels')
-            shift_rotated_image = shift(rotated_image, shift=[0, 0, pixoffset])
+            shift_rotated_image = shift(rotated_image, [0, 0, pixoffset])
             rot_mm, _ = momentmap(shift_rotated_image.T, freq_axis=new_freqcoord, moment=0)
             rota.cla()
             title = '' if pixoffset != 0 else '(default)'
@@ -76,7 +144,7 @@
         pixoffset = int(offset / 3600. / wcs.get('ra---sin')['del'])
         if test or config['fixcen']:
             print(f'Trying center ra shift: {offset}" or {pixoffset} pixels')
-            shift_rotated_image = shift(rotated_image, shift=[0, pixoffset, 0])
+            shift_rotated_image = shift(rotated_image, [0, pixoffset, 0])
             rot_mm, _ = momentmap(shift_rotated_image.T, freq_axis=new_freqcoord, moment=0)
             rota.cla()
             title = '' if offset != 0 else '(default)'
@@ -97,7 +165,12 @@
         elif test:
             rotf.savefig(f'testpv/rest_dec_center-{pa + offset}.pdf', bbox_inches='tight')
     else:
-        rotf.clf()
+        if rotf is not None:
+            rotf.clf()
         print('No replacement found, using config value.')
     if config['fixcen'] or config['fixpa']:
-        rotf.clf()
\ No newline at end of file
+        rotf.clf()
+    return rotated_image, pa, config
+# end of code
+
+# end of file
@@ -5,8 +5,12 @@
 # internal modules
 
 # external modules
+import numpy as np
 
 # relative modules
+from ..._math._rebin import rebin_irregular
+from ..._math._image import shift as image_shift
+from ..._math._resample import rotate_cube
 
 # global attributes
 __all__ = ('test', 'main')
@@ -17,15 +21,12 @@ __version__ = 0.1
 
 
 def binning(x, y, windowsize=0.1):
-    newx, newy = [], []
-    for xi in x:
-        mask = np.abs(x - xi) < windowsize
-        xmed = np.median(x[mask])
-        if xmed in newx:
-            continue
-        newx.append(xmed)
-        newy.append(np.median(y[mask]))
-    return np.array(newx), np.array(newy)
+    """Median of x and y within +- windowsize of every sample.
+
+    Windows with a repeated median x are dropped, the result is sorted
+    by x.
+    """
+    return rebin_irregular(x, y, window=windowsize, statistic='median')
 
 
 def center_image(image, ra, dec, wcs):
@@ -36,13 +37,17 @@ def center_image(image, ra, dec, wcs):
     center_shift = list(map(int, [imcen[0] - ycen, imcen[1] - xcen]))
     shift = [0]
     shift.extend(center_shift)
-    shifted_image = inter.shift(image, shift)
+    shifted_image = image_shift(image, shift, cval=0.)
     return shifted_image
 
 
-def rotate_image(image, deg):
-    rotated_image = inter.rotate(image, deg)
-    return rotated_image
+def rotate_image(image, angle, axis=0, resize=False, cval=np.nan, order=1):
+    """Rotate every plane of image orthogonal to axis counter-clockwise.
+
+    The coordinate map is computed once per angle and shape and shared
+    by all channels, see `nkrpy.math.rotate_cube`.
+    """
+    return rotate_cube(image, angle, axis=axis, resize=resize, order=order, cval=cval)
 
 
 def sum_image(image, width: int):
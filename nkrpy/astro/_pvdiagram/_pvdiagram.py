@@ -13,8 +13,7 @@ from scipy import optimize
 from scipy.optimize import curve_fit
 from IPython import embed
 from scipy.signal import savgol_filter
-from scipy.ndimage.interpolation import shift
-from skimage.transform import rotate as skimage_rotate
+from astropy.convolution import Gaussian2DKernel
 
 # relative modules
 from ..._unit import Unit
@@ -24,6 +23,9 @@ from ...io import fits
 from .. import WCS
 from ._lasso import SelectFromCollection, plotter
 from .._functions import (binning, select_rectangle, remove_padding3d)
+from ..._math._image import shift
+from ..._math._resample import AffineResampler
+from ._image import rotate_image
 # global attributes
 __all__ = ['keplerian_vel_2_rad',
            'pvdiagram', 'default_config', 'pvslicer']
@@ -40,12 +42,35 @@ def isodd(num):
     return True if num % 2 == 1 else False
 
 
-def pvslicer(datacube3d, xcen_pix, ycen_pix, major_axis_width, minor_axis_width, channelstart=None, channelend=None, positionangle=0):
-    # takes slices of data in pixel coordinates
-    # positionangle defined east of north
-    # data needs to be [..., channel, dec, ra]
-    # returns 
-    data = np.squeeze(data)
+def pvslicer(datacube3d, xcen_pix, ycen_pix, major_axis_width, minor_axis_width, channelstart=None, channelend=None, positionangle=0, order=1):
+    """Position velocity slice of a cube along a slit.
+
+    The slit is sampled once as a (major, minor) grid of pixel
+    coordinates and every channel is gathered through that map, so any
+    position angle costs one map plus a gather per channel.
+
+    Parameters
+    ----------
+    datacube3d: np.ndarray
+        The data, [..., channel, dec, ra] in pixels.
+    xcen_pix, ycen_pix: float
+        The slit center.
+    major_axis_width, minor_axis_width: int
+        The slit length and width in pixels, rounded up to odd.
+    channelstart, channelend: int
+        The inclusive channel range, defaults to all channels.
+    positionangle: float
+        The slit position angle in degrees, east of north.
+    order: int
+        The interpolation order, see `AffineResampler`.
+
+    Returns
+    -------
+    np.ndarray
+        The (major_axis_width, nchannels) slit average, the first
+        position is the end of the slit towards the position angle.
+    """
+    data = np.squeeze(datacube3d)
     if channelstart is None:
         channelstart = 0
     if channelend is None:
@@ -53,22 +78,16 @@ def pvslicer(datacube3d, xcen_pix, ycen_pix, major_axis_width, minor_axis_width,
     minor_axis_width = odd(minor_axis_width)
     major_axis_width = odd(major_axis_width)
     channel_slice = data[channelstart:channelend + 1, ...]
-    pv = np.zeros((major_axis_width, channelend-channelstart))
-
-    mask_base = np.zeros(datacube3d.shape[1:])
-    width = int((minor_axis_width - 1) / 2)
-    for pos in range(major_axis_width):
-        # make ones at row below
-        pos = int(pos - (major_axis_width - 1) / 2)
-        mask_base[ycen_pix - pos, xcen_pix] = 1
-        mask_r = skimage_rotate(image=mask_base, center=(xcen_pix, ycen_pix), angle=positionangle)
-        mask_base[ycen_pix - pos, xcen_pix] = 0
-
-
-
-
-
-
+    # north is +dec (row) and east is -ra (column)
+    theta = np.radians(positionangle)
+    cos, sin = np.cos(theta), np.sin(theta)
+    half, width = (major_axis_width - 1) / 2., (minor_axis_width - 1) / 2.
+    matrix = [[-cos, sin], [sin, cos]]
+    offset = [ycen_pix + cos * half - sin * width, xcen_pix - sin * half - cos * width]
+    slit = AffineResampler(matrix, offset, channel_slice.shape[-2:],
+                           (major_axis_width, minor_axis_width), order=order, cval=np.nan)
+    pv = np.nanmean(slit(channel_slice), axis=-1)
+    return pv.T
 
 
 class Timer():
@@ -103,7 +122,7 @@ def keplerian_vel_2_rad(mass, velocity, dist, inc):
     mask = velocity == 0
     velocity[mask] = 1e-10
     radii = constants.g * constants.msun * mass * np.sin(inc) ** 2 / (np.abs(velocity) * 100000.) ** 2
-    radii *= (180. / constants.pi * 3600.) / (Unit(baseunit='pc', convunit='cm', vals=dist))
+    radii *= (180. / constants.pi * 3600.) / Unit.convert_array(dist, 'pc', 'cm')
     radii[velocity < 0] *= -1.
     velocity[mask] = 0
     return radii
@@ -117,7 +136,7 @@ def keplerian_rad_2_vel(mass, rad, dist, inc):
     dist in pc
     inc in radians
     """
-    radii = (rad / 3600. / 180. * constants.pi) * (Unit(baseunit='pc', convunit='cm', vals=dist))
+    radii = (rad / 3600. / 180. * constants.pi) * Unit.convert_array(dist, 'pc', 'cm')
     mask = radii <= 0
     radii[mask] = 1e-10
     velsqrd = constants.g * constants.msun * mass * np.sin(inc) ** 2 / radii
@@ -135,7 +154,7 @@ def infall_rad_2_vel(mass, rad, dist, inc, rcrit):
     inc in radians
     rc in au
     """
-    radii = (rad / 3600. / 180. * constants.pi) * (Unit(baseunit='pc', convunit='cm', vals=dist).get_vals())
+    radii = (rad / 3600. / 180. * constants.pi) * Unit.convert_array(dist, 'pc', 'cm')
     mask = radii <= 0
     radii[mask] = 1e-10
     velsqrd = constants.g * constants.msun * mass * np.sin(inc) ** 2 * rcrit * constants.au / radii ** 2
@@ -187,6 +206,11 @@ def pvdiagram(fig, ax, config, image):
     dsource in pc
     image:
         Assuming image is a 3d array with first axis the freq/vel axis.
+        Can be a nkrpy.io.fits.LazyCube, only the channels within vwidth
+        are then read from disk.
+    config['smooth']:
+        Optional (bmaj, bmin, bpa) in deg to smooth each channel with
+        before slicing.
 
     
     Blue is North, aranged along y axis
@@ -214,7 +238,9 @@ def pvdiagram(fig, ax, config, image):
     test = config['debug_mode']
     rc = config['critical_radius']
     timer = Timer(test)
-    d_source_cm = Unit(vals=d_source, baseunit='pc', convunit='cm').get_vals()
+    # conversions used inside the curve_fit callbacks, computed once
+    d_source_cm = Unit.convert_array(d_source, 'pc', 'cm')
+    rad_2_arcsec = Unit.convert_array(1., 'radians', 'arcsec')
     if test:
         for k, v in config.items():
             #print(f'{k}: {v}')
@@ -237,12 +263,12 @@ def pvdiagram(fig, ax, config, image):
         mask = v - vsys == 0
         v[mask] = 1e-10
         v = np.abs(v - vsys)
-        v = Unit(vals=v, baseunit='km', convunit='cm').get_vals()
+        v = Unit.convert_array(v, 'km', 'cm', out=v)
         a = np.sqrt(constants.g * constants.msun * mass * np.sin(inc) ** 2 * rcrit * constants.au / v ** 2)
         # a is in cm
         a *= 1. / d_source_cm
         # now in radians
-        a *= Unit(vals=1., baseunit='radians', convunit='arcsec').get_vals()
+        a *= rad_2_arcsec
         return a # now in arcsec
 
 
@@ -261,12 +287,12 @@ def pvdiagram(fig, ax, config, image):
         mask = v - vsys == 0
         v[mask] = 1e-10
         v = np.abs(v - vsys)
-        v = Unit(vals=v, baseunit='km', convunit='cm').get_vals()
+        v = Unit.convert_array(v, 'km', 'cm', out=v)
         a = constants.g * constants.msun * mass * np.sin(inc) ** 2 / v ** 2
         # a is in cm
-        a *= 1. / Unit(vals=d_source, baseunit='pc', convunit='cm').get_vals()
+        a *= 1. / d_source_cm
         # now in radians
-        a *= Unit(vals=1., baseunit='radians', convunit='arcsec').get_vals()
+        a *= rad_2_arcsec
         return a # now in arcsec
 
     """
@@ -283,7 +309,6 @@ def pvdiagram(fig, ax, config, image):
     Generate the new WCS conversions and select necessary data
     ----------------------------------------------------------
     """
-    original  = image.copy() # vel, dec, ra
     timer.log()
     minv = v_width / -2. + v_sys
     maxv = v_width / 2. + v_sys
@@ -299,10 +324,16 @@ def pvdiagram(fig, ax, config, image):
     lvel = wcs(0, 'wcs', 'freq')
     uvel = wcs(image.shape[0], 'wcs', 'freq')
     velcut_image = image[vel_array_mask, ...]
+    if config.get('smooth') is not None:
+        fwhm2sig = 1 / (2 * np.sqrt(2 * np.log(2)))
+        bma, bmi, bpa = config['smooth']
+        bma, bmi = map(lambda x: x * fwhm2sig / abs(wcs.axis1['delt']), (bma, bmi))
+        kernel = Gaussian2DKernel(x_stddev=bmi, y_stddev=bma, theta=np.radians(bpa)).array
+        velcut_image = _math.FFTConvolver(kernel, velcut_image.shape[-2:])(velcut_image)
     mask = select_rectangle(velcut_image.T.shape[:-1], ycen = ras, xcen = decs, xlen=abs(arcsec_width / 2. / 3600. / wcs.axis1['delt']) + 2, ylen=abs(width - 1) / 2. + 2, pa=pa) # returns ra. dec,vel
     masked = velcut_image * mask.T[np.newaxis, :, :]
     unpad_image = remove_padding3d(masked)[0].T # returns vel, dec, ra
-    rotated_image = rotate_image(unpad_image.T, axis=0, angle=pa + 90, resize=True, mode='constant', cval=np.nan).T # now in pos, pos, vel
+    rotated_image = rotate_image(unpad_image.T, pa + 90, axis=0, resize=True, cval=np.nan).T # now in pos, pos, vel
 
     unpad_rotated_image = remove_padding3d(rotated_image.T)[0].T
     cut_rotated_image = unpad_rotated_image[..., 2:-2, 2:-2]
@@ -385,7 +416,7 @@ def pvdiagram(fig, ax, config, image):
     posres = arcsec_width / ylen
     #from IPython import embed; embed()
     if poffsets != 0:
-        summed_image = shift(summed_image, [-poffsets, 0], cval=np.nan)
+        summed_image = shift(summed_image, [-poffsets, 0], order=3, cval=np.nan)
     summed_image[summed_image == 0] = np.nan
     summed_image = np.squeeze(remove_padding3d(summed_image[..., None])[0])
     config['ra'] += poffsets * np.sin(pa) * (posres) / 3600.
@@ -521,8 +552,8 @@ def pvdiagram(fig, ax, config, image):
             red_fit_pix = rawfig.selection('scatter raw', prompt='red side').reshape(-1,2) # pix
             rawfig.close()
             # vel, dist arrays
-            blue_fit_wcs = np.array([pvwcs(blue_fit_pix[:, 0], 'wcs', 'vel'), pvwcs(blue_fit_pix[:, 1], 'wcs', 'dist')]).T
-            red_fit_wcs = np.array([pvwcs(red_fit_pix[:, 0], 'wcs', 'vel'), pvwcs(red_fit_pix[:, 1], 'wcs', 'dist')]).T
+            blue_fit_wcs = pvwcs.pix2world(blue_fit_pix, ['vel', 'dist'])
+            red_fit_wcs = pvwcs.pix2world(red_fit_pix, ['vel', 'dist'])
             # now fit offset
             with open(f'{config["savepath"]}/bluepoints{config["targetname"]}.txt', 'w') as f:
                 np.savetxt(f, blue_fit_wcs, delimiter=';')
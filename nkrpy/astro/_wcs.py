@@ -16,6 +16,7 @@ from .._types import WCSClass
 from ..misc.decorators import argCase
 from ..misc.frozendict import FrozenDict as frozendict
 from .._unit import Unit
+from ..misc.errors import ArgumentError
 
 # global attributes
 __all__ = ['WCS',]
@@ -86,7 +87,9 @@ class _base_wcs_class(object):
         return_type = 'pix' if return_type.startswith('pix') else 'wcs'
         if val is None:
             return self.kwargs
-        delt = self.kwargs['delt'] / np.cos(declination_degrees*np.pi / 180.)
+        delt = self.kwargs['delt']
+        if not np.isscalar(declination_degrees) or declination_degrees != 0:
+            delt = delt / np.cos(declination_degrees*np.pi / 180.)
         if return_type == 'pix':
             pix = (val - self.kwargs['rval']) / delt + (self.kwargs['rpix'])
             return pix
@@ -133,6 +136,7 @@ class WCS(WCSClass):
     __ln2 = np.log(2)
     def __init__(self, wcs=None, beamtable=None, **kwargs):
         self.__axis = {}
+        self.__arrays = {}
         if wcs is not None:
             if isinstance(wcs, str):
                 h, _ = fits.read(wcs)
@@ -232,6 +236,7 @@ class WCS(WCSClass):
             del self.__header[rk]
         # delete from axis dict
         del self.__axis[axis]
+        self.__invalidate(axis)
         # delete from WCS
         delattr(self, f'axis{num}')
         # delete from header
@@ -331,8 +336,29 @@ class WCS(WCSClass):
         ----------
         size: int
             Default the size of the original axis, otherwise it is the new size, evenly separated from the start/end of the old values
+
+        Returns
+        -------
+        np.ndarray
+            The arrays are memoized until the axis is changed, so they
+            are read-only. Copy before modifying in place.
         '''
         axis = self.__get_axis(axis)
+        key = (start, stop, startstop_type, size, return_type, declination_degrees)
+        cache = self.__arrays.setdefault(axis.baseget()['dtype'], {})
+        try:
+            return cache[key]
+        except KeyError:
+            pass
+        except TypeError:
+            # unhashable (array) declinations are not memoized
+            return self.__array(axis, *key)
+        array = self.__array(axis, *key)
+        array.flags.writeable = False
+        cache[key] = array
+        return array
+
+    def __array(self, axis, start, stop, startstop_type, size, return_type, declination_degrees):
         startstop_type = 'pix' if startstop_type.startswith('pix') else 'wcs'
         if size is None:
             size = axis.baseget()['axis']
@@ -385,7 +411,77 @@ class WCS(WCSClass):
         """Refresh the header using astropy to make it writable to fits"""
         self.header = astropy__fits.header.Header(self.__header)
 
+    def __invalidate(self, axis: str = None):
+        '''Drop the memoized arrays of an axis, or all axes if None.'''
+        if axis is None:
+            self.__arrays.clear()
+        else:
+            self.__arrays.pop(axis, None)
+
+    def __axes_params(self, axes):
+        '''Stack rval, rpix, delt and whether it is an ra axis for several axes.'''
+        params = np.empty((4, len(axes)), dtype=float)
+        for i, name in enumerate(axes):
+            axis = self.__get_axis(name)
+            if axis is None:
+                raise ArgumentError(f'Axis {name} not in {list(self.__axis)}')
+            axis = axis.baseget()
+            params[:, i] = axis['rval'], axis['rpix'], axis['delt'], axis['dtype'].startswith('ra')
+        return params
+
+    def __transform(self, vals, axes, return_type: str, declination_degrees):
+        single = isinstance(axes, str)
+        if axes is None:
+            axes = [a['dtype'] for a in sorted(self.get_axes().values(), key=lambda a: a['axisnum'])]
+        elif single:
+            axes = [axes]
+        vals = np.asarray(vals, dtype=float)
+        if single:
+            vals = vals[..., np.newaxis]
+        if vals.shape[-1] != len(axes):
+            raise ArgumentError(f'The last dimension of vals ({vals.shape[-1]}) must match the axes {axes}')
+        rval, rpix, delt, isra = self.__axes_params(axes)
+        if not np.isscalar(declination_degrees) or declination_degrees != 0:
+            cosdec = np.cos(np.asarray(declination_degrees, dtype=float) * np.pi / 180.)[..., np.newaxis]
+            delt = np.where(isra.astype(bool), delt / cosdec, delt)
+        if return_type.startswith('pix'):
+            ret = (vals - rval) / delt + rpix
+        else:
+            ret = np.around((vals - rpix) * delt + rval, 10)
+        return ret[..., 0] if single else ret
+
+    def pix2world(self, pix, axes=None, declination_degrees=0):
+        '''Convert pixels of several axes to wcs in one vectorized pass.
+
+        Parameters
+        ----------
+        pix: np.ndarray
+            Pixel coordinates of shape (..., len(axes)), e.g.
+            np.moveaxis(np.indices(shape), 0, -1) for a full grid.
+            If axes is a single axis name, any shape.
+        axes: list[str] | str
+            The axis names of the last dimension of pix. Defaults to all
+            axes in axis number order.
+        declination_degrees: float | np.ndarray
+            Declination to correct the ra axes by, broadcastable to
+            pix.shape[:-1]. The other axes are not corrected.
+
+        Returns
+        -------
+        np.ndarray
+            The wcs coordinates, same shape as pix.
+        '''
+        return self.__transform(pix, axes, 'wcs', declination_degrees)
+
+    def world2pix(self, world, axes=None, declination_degrees=0):
+        '''Convert wcs of several axes to pixels in one vectorized pass.
+
+        The inverse of pix2world, see it for the parameters.
+        '''
+        return self.__transform(world, axes, 'pix', declination_degrees)
+
     def refresh_axes(self):
+        self.__invalidate()
         for k in dir(self):
             if k.startswith('axis'):
                 delattr(self, f'{k}')
@@ -459,6 +555,7 @@ class WCS(WCSClass):
         unit = unit.lower()
         axis = self.get_axis_base_object(axis)
         unit = 'pix' if unit.startswith('pix') else 'wcs'
+        self.__invalidate(axis.baseget()['dtype'])
         if unit == 'wcs':
             axis.baseget()['rval'] += val
         else:
@@ -1,6 +1,7 @@
 import numpy as np
 import warnings
 from nkrpy import math
+from nkrpy._math._sampler import _generator
 import itertools
 from nkrpy.astro import WCS
 from nkrpy.io import fits
@@ -243,21 +244,18 @@ def sample(mu, sig, numsamples=10000, lowerclip = -np.inf, upperclip=np.inf, low
 
 
 
-def pop_sampling(gr, src, NUMBER_SAMPLES=10000, **kwargs):
+def pop_sampling(gr, src, NUMBER_SAMPLES=10000, rng=None, **kwargs):
+    rng = _generator(rng)
     ret = []
     ret_error = []
     for sn, s in src.items():
         # sample ra, dec, pa, major, minor
         for mu in ['ra', 'dec', 'pa', 'major', 'minor']:
             if mu in ['major', 'minor']:
-                # resample if major or minor < 0
-                s[mu+'_sample'] = np.zeros(NUMBER_SAMPLES, dtype=float)
-                mask = np.ones(NUMBER_SAMPLES, dtype=int)
-                while mask.sum():
-                    s[mu+'_sample'][mask] = sample(mu=s[mu],sig=s[mu+'_error'], numsamples=mask.sum())
-                    mask = s[mu+'_sample'] <= 0
+                # axes must be positive, draw from the normal truncated at 0
+                s[mu+'_sample'] = math.truncated_normal(s[mu], s[mu+'_error'], lower=0, size=NUMBER_SAMPLES, rng=rng)
             else:
-                s[mu+'_sample'] = sample(mu=s[mu],sig=s[mu+'_error'], numsamples=NUMBER_SAMPLES)
+                s[mu+'_sample'] = rng.normal(loc=s[mu], scale=s[mu+'_error'], size=NUMBER_SAMPLES)
         incs = np.zeros(NUMBER_SAMPLES, dtype=float)
         mask = s['minor_sample'] > s['major_sample']
         s['minor_sample'][mask],s['major_sample'][mask] = s['major_sample'][mask],s['minor_sample'][mask]
@@ -1,6 +1,6 @@
-from ._flareddiskmodel import FlaredDiskModel
+from ._flareddiskmodel_new import FlaredDiskModel
 
 
-__all__ = ['FlaredDiskModel', 'FlaredDiskModelTest']
+__all__ = ['FlaredDiskModel']
 
 
@@ -6,7 +6,6 @@
 import time
 import cProfile
 global starttime
-import pprofile
 import matplotlib.pyplot as plt
 
 # external modules
@@ -16,7 +15,8 @@ import numpy as np
 from ...io import fits
 from ...misc import constants
 from .._wcs import WCS
-from ._flareddiskmodel import FlaredDiskModel
+from .._moments import momentmap
+from ._flareddiskmodel_new import FlaredDiskModel
 
 # global attributes
 starttime = time.time()
@@ -71,60 +71,46 @@ def FlaredDiskModelTest():
         fwhm_linewidth=0.1, # in km/s
         # system params
         mstar=1.1, peakint=5e-1, vsys=4.85, # in msun, intensity/beam, km/s, 
-        centerwcs=[123.5971809583, -34.51761577083], # center in deg coordinates
+        ra=123.5971809583, dec=-34.51761577083, # center in deg coordinates
         distance_pc=400,
         # disk params all in deg
         inclination=60, # defined 0 is faceon in degrees
         position_angle=-90, # defined east of north Blue in degrees
-        r_inner=0, # Truncates the inner of the disk
-        r_truncate=4/3600, # hard truncates the disk
-        radial_intensity_law='gaussian',
+        radial_intensity_r_inner=0, # Truncates the inner of the disk
+        radial_intensity_r_truncate=4/3600, # hard truncates the disk
+        disk_intensity_law='gaussian',
         radial_intensity_gaussian_fwhm=3 / 3600, # eqn e^r^2/2sig^2
         radial_intensity_pwrlw_pwr=0.25,
-        velocity_profile=['keplerian'], 
-        velocity_profile_rc=4/3600, # eqn vr = sqrt(2G*mstar/r - (G*mstar*rc/r**2)) and vtheta = sqrt(2G*mstar*rc/r))
+        envelope_velocity_profile='keplerian',
+        disk_to_envelope_velocity_profile_rc=4/3600, # eqn vr = sqrt(2G*mstar/r - (G*mstar*rc/r**2)) and vtheta = sqrt(2G*mstar*rc/r))
     )
-    prof = pprofile.Profile()
-    #profiletime()
-    #p.enable()
-    fdm()
-    #p.disable()
-    #profiletime()
+    # the products, beam convolution included, are built on construction
     print('Finished Setup')
-    #p.dump_stats('/tmp/fdm.prof')
-    fdm.writeFits(filename='/tmp/fdm.fits')
+    fits.write(f='/tmp/fdm.fits', data=fdm.cube, header=fdm.wcs.create_fitsheader_from_axes())
     fits.write(f='/tmp/fdm-intensity.fits', data=fdm.intensityimage, header=fdm.wcs.create_fitsheader_from_axes())
-    #p.enable()
-    with prof():
-        fdm.convolve_beam()
-    #prof.print_stats()
-    #p.disable()
-    #profiletime()
-    print('Finished convolved.')
-    #p.dump_stats('/tmp/fdm_convolve.prof')
     fdm.writeFits(filename='/tmp/fdm_convolve.fits')
     import matplotlib.pyplot as plt
     rf = wcs.get_head('restfreq')
-    channelvsys = int(round(wcs(rf - fdm.vsys * 1e3*1e2 / constants.c * rf, return_type='pix', axis=wcs.axis3['dtype']), 0))
+    channelvsys = int(round(wcs(rf - fdm.kwargs['vsys'] * 1e3*1e2 / constants.c * rf, return_type='pix', axis=wcs.axis3['dtype']), 0))
     fig, ax = plt.subplots()
-    moment0 = np.nansum(fdm.cube, axis=0)
+    moment0 = momentmap(fdm.cube, axis=0, rule='sum')[0]
     ax.imshow(moment0, origin='lower', cmap='magma')
     fig.savefig('/tmp/fdm-m0.pdf', dpi=150)
     ax.cla()
-    ax.imshow(np.nansum(fdm.cube[:channelvsys, ...], axis=0),origin='lower', cmap='magma')
+    ax.imshow(momentmap(fdm.cube[:channelvsys, ...], axis=0, rule='sum')[0],origin='lower', cmap='magma')
     fig.savefig('/tmp/fdm-bm0.pdf', dpi=150)
     ax.cla()
-    ax.imshow(np.nansum(fdm.cube[channelvsys:, ...], axis=0),origin='lower', cmap='magma')
+    ax.imshow(momentmap(fdm.cube[channelvsys:, ...], axis=0, rule='sum')[0],origin='lower', cmap='magma')
     fig.savefig('/tmp/fdm-rm0.pdf', dpi=150)
     ax.cla()
-    moment0 = np.nansum(fdm.convolved_cube, axis=0)
+    moment0 = momentmap(fdm.convolved_cube, axis=0, rule='sum')[0]
     ax.imshow(moment0, origin='lower', cmap='magma')
     fig.savefig('/tmp/fdm_convolve-m0.pdf', dpi=150)
     ax.cla()
-    ax.imshow(np.nansum(fdm.convolved_cube[:channelvsys, ...], axis=0),origin='lower', cmap='magma')
+    ax.imshow(momentmap(fdm.convolved_cube[:channelvsys, ...], axis=0, rule='sum')[0],origin='lower', cmap='magma')
     fig.savefig('/tmp/fdm_convolve-bm0.pdf', dpi=150)
     ax.cla()
-    ax.imshow(np.nansum(fdm.convolved_cube[channelvsys:, ...], axis=0),origin='lower', cmap='magma')
+    ax.imshow(momentmap(fdm.convolved_cube[channelvsys:, ...], axis=0, rule='sum')[0],origin='lower', cmap='magma')
     fig.savefig('/tmp/fdm_convolve-rm0.pdf', dpi=150)
     ax.cla()
 
@@ -178,60 +164,46 @@ def FlaredEnvelopeModelTest():
         fwhm_linewidth=0.1, # in km/s
         # system params
         mstar=1.1, peakint=5e-1, vsys=4.85, # in msun, intensity/beam, km/s, 
-        centerwcs=[123.5971809583, -34.51761577083], # center in deg coordinates
+        ra=123.5971809583, dec=-34.51761577083, # center in deg coordinates
         distance_pc=400,
         # disk params all in deg
         inclination=60, # defined 0 is faceon in degrees
         position_angle=42, # defined east of north Blue in degrees
-        r_inner=0/3600, # Truncates the inner of the disk
-        r_truncate=60/3600, # hard truncates the disk
-        radial_intensity_law='gaussian',
+        radial_intensity_r_inner=0/3600, # Truncates the inner of the disk
+        radial_intensity_r_truncate=60/3600, # hard truncates the disk
+        disk_intensity_law='gaussian',
         radial_intensity_gaussian_fwhm=20 / 3600, # eqn e^r^2/2sig^2
         radial_intensity_pwrlw_pwr=0.25,
-        velocity_profile=['infall', 'keplerian'], 
-        velocity_profile_rc=4/3600, # eqn vr 
+        envelope_velocity_profile='infall',
+        disk_to_envelope_velocity_profile_rc=4/3600, # eqn vr 
     )
-    prof = pprofile.Profile()
-    #profiletime()
-    #p.enable()
-    fdm()
-    #p.disable()
-    #profiletime()
+    # the products, beam convolution included, are built on construction
     print('Finished Setup')
-    #p.dump_stats('/tmp/fem.prof')
-    fdm.writeFits(filename='/tmp/fem.fits')
+    fits.write(f='/tmp/fem.fits', data=fdm.cube, header=fdm.wcs.create_fitsheader_from_axes())
     fits.write(f='/tmp/fem-intensity.fits', data=fdm.intensityimage, header=fdm.wcs.create_fitsheader_from_axes())
-    #p.enable()
-    with prof():
-        fdm.convolve_beam()
-    #prof.print_stats()
-    #p.disable()
-    #profiletime()
-    print('Finished convolved.')
-    #p.dump_stats('/tmp/fem_convolve.prof')
     fdm.writeFits(filename='/tmp/fem_convolve.fits')
     import matplotlib.pyplot as plt
     rf = wcs.get_head('restfreq')
-    channelvsys = int(round(wcs(rf - fdm.vsys * 1e3*1e2 / constants.c * rf, return_type='pix', axis=wcs.axis3['dtype']), 0))
+    channelvsys = int(round(wcs(rf - fdm.kwargs['vsys'] * 1e3*1e2 / constants.c * rf, return_type='pix', axis=wcs.axis3['dtype']), 0))
     fig, ax = plt.subplots()
-    moment0 = np.nansum(fdm.cube, axis=0)
+    moment0 = momentmap(fdm.cube, axis=0, rule='sum')[0]
     ax.imshow(moment0, origin='lower', cmap='magma')
     fig.savefig('/tmp/fem-m0.pdf', dpi=150)
     ax.cla()
-    ax.imshow(np.nansum(fdm.cube[:channelvsys, ...], axis=0),origin='lower', cmap='magma')
+    ax.imshow(momentmap(fdm.cube[:channelvsys, ...], axis=0, rule='sum')[0],origin='lower', cmap='magma')
     fig.savefig('/tmp/fem-bm0.pdf', dpi=150)
     ax.cla()
-    ax.imshow(np.nansum(fdm.cube[channelvsys:, ...], axis=0),origin='lower', cmap='magma')
+    ax.imshow(momentmap(fdm.cube[channelvsys:, ...], axis=0, rule='sum')[0],origin='lower', cmap='magma')
     fig.savefig('/tmp/fem-rm0.pdf', dpi=150)
     ax.cla()
-    moment0 = np.nansum(fdm.convolved_cube, axis=0)
+    moment0 = momentmap(fdm.convolved_cube, axis=0, rule='sum')[0]
     ax.imshow(moment0, origin='lower', cmap='magma')
     fig.savefig('/tmp/fem_convolve-m0.pdf', dpi=150)
     ax.cla()
-    ax.imshow(np.nansum(fdm.convolved_cube[:channelvsys, ...], axis=0),origin='lower', cmap='magma')
+    ax.imshow(momentmap(fdm.convolved_cube[:channelvsys, ...], axis=0, rule='sum')[0],origin='lower', cmap='magma')
     fig.savefig('/tmp/fem_convolve-bm0.pdf', dpi=150)
     ax.cla()
-    ax.imshow(np.nansum(fdm.convolved_cube[channelvsys:, ...], axis=0),origin='lower', cmap='magma')
+    ax.imshow(momentmap(fdm.convolved_cube[channelvsys:, ...], axis=0, rule='sum')[0],origin='lower', cmap='magma')
     fig.savefig('/tmp/fem_convolve-rm0.pdf', dpi=150)
     ax.cla()
 
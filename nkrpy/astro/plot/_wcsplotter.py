@@ -22,6 +22,7 @@ from ..._unit import Unit as unit
 from ..._math import _convert as nkrpy__convert
 from ..._math._miscmath import ellipse_distance
 from ..._math._miscmath import rms as math_rms
+from ..._math._image import shift as image_shift
 icrs2degrees, degrees2icrs = nkrpy__convert.icrs2degrees, nkrpy__convert.degrees2icrs
 from ...misc import constants
 from ...publication.cmaps import mainColorMap, mapper
@@ -169,54 +170,23 @@ class WCSImagePlot(Plot):
             data = self.__original_data
         wcs = self.__wcs
         # get limits for new wcs
-        dec_upper = wcs(wcs.axis2['axis']-1, 'wcs', wcs.axis2['dtype'])
-        dec_lower = wcs(0, 'wcs', wcs.axis2['dtype'])
-        ra_upper = wcs(wcs.axis1['axis']-1, 'wcs', wcs.axis1['dtype'], declination_degrees=np.mean([dec_upper, dec_lower]))
-        ra_lower = wcs(0, 'wcs', wcs.axis1['dtype'], declination_degrees=np.mean([dec_upper, dec_lower]))
+        axes = [wcs.axis1['dtype'], wcs.axis2['dtype']]
+        corners = np.array([[wcs.axis1['axis']-1, wcs.axis2['axis']-1], [0, 0]], dtype=float)
+        dec_upper, dec_lower = wcs.pix2world(corners[:, 1], axes[1])
+        dec_mean = np.mean([dec_upper, dec_lower])
+        corners = wcs.pix2world(corners, axes, declination_degrees=dec_mean)
         # now find these new limits within the old wcs
-        dec_upper_in_old = owcs(dec_upper, 'pix', owcs.axis2['dtype'])
-        dec_lower_in_old = owcs(dec_lower, 'pix', owcs.axis2['dtype'])
-        ra_upper_in_old = owcs(ra_upper, 'pix', owcs.axis1['dtype'], declination_degrees=np.mean([dec_upper, dec_lower]))
-        ra_lower_in_old = owcs(ra_lower, 'pix', owcs.axis1['dtype'], declination_degrees=np.mean([dec_upper, dec_lower]))
+        (ra_upper_in_old, dec_upper_in_old), (ra_lower_in_old, dec_lower_in_old) = \
+            owcs.world2pix(corners, [owcs.axis1['dtype'], owcs.axis2['dtype']], declination_degrees=dec_mean)
         # sort to be safe
         ra_upper_in_old, ra_lower_in_old = sorted([ra_upper_in_old, ra_lower_in_old])
         dec_lower_in_old, dec_upper_in_old = sorted([dec_lower_in_old, dec_upper_in_old])
-        ra_upper_in_old, ra_lower_in_old, dec_lower_in_old, dec_upper_in_old= map(lambda x: int(round(abs(x),0)), [ra_upper_in_old, ra_lower_in_old, dec_lower_in_old, dec_upper_in_old])
-        #print('bounds:',ra_upper_in_old, ra_lower_in_old, dec_lower_in_old, dec_upper_in_old, data.shape)
-        #print('wcs:', wcs.axis2['axis'], wcs.axis1['axis'])
-        # now check if padding is needed
-        if ra_upper_in_old < 0:
-           # pad left side
-           #print('pad left')
-           ra_upper_in_old = int(round(abs(ra_upper_in_old),0))
-           data = np.roll(data, shift=ra_upper_in_old, axis=1)
-           data[:, :ra_upper_in_old+1] = np.nan
-           ra_lower_in_old += ra_upper_in_old
-           ra_upper_in_old = 0
-        if dec_lower_in_old < 0:
-           # pad bottom side
-           #print('pad bottom')
-           dec_lower_in_old = int(round(abs(dec_lower_in_old),0))
-           data = np.roll(data, shift=dec_lower_in_old, axis=0)
-           data[:dec_lower_in_old+1, :] = np.nan
-           dec_upper_in_old += dec_lower_in_old
-           dec_lower_in_old = 0
-        if ra_lower_in_old >= owcs.axis1['axis']:
-           # pad right side
-           #print('pad right')
-           ra_lower_in_old = int(round(abs(ra_lower_in_old),0))
-           data = np.roll(data, shift=-ra_lower_in_old, axis=1)
-           data[:, -ra_lower_in_old:] = np.nan
-           ra_lower_in_old = owcs.axis1['axis']
-        if dec_upper_in_old >= owcs.axis2['axis']:
-           # pad up side
-           #print('pad up')
-           dec_upper_in_old = int(round(abs(dec_upper_in_old),0))
-           data = np.roll(data, shift=-dec_upper_in_old, axis=0)
-           data[-dec_upper_in_old:, :] = np.nan
-           dec_upper_in_old = owcs.axis2['axis']
-        ra_upper_in_old, ra_lower_in_old, dec_lower_in_old, dec_upper_in_old= map(lambda x: int(round(abs(x),0)), [ra_upper_in_old, ra_lower_in_old, dec_lower_in_old, dec_upper_in_old])
-        sliced_data = data[dec_lower_in_old:dec_upper_in_old + 1, ra_upper_in_old:ra_lower_in_old + 1]
+        ra_upper_in_old, ra_lower_in_old, dec_lower_in_old, dec_upper_in_old = map(lambda x: int(round(x, 0)), [ra_upper_in_old, ra_lower_in_old, dec_lower_in_old, dec_upper_in_old])
+        # cut the window out of the old image in one pass, padding the parts
+        # that fall outside of it with nan
+        window = (dec_upper_in_old - dec_lower_in_old + 1, ra_lower_in_old - ra_upper_in_old + 1, *data.shape[2:])
+        offsets = [-dec_lower_in_old, -ra_upper_in_old] + [0] * (data.ndim - 2)
+        sliced_data = image_shift(data, offsets, cval=np.nan, shape=window)
 
         if sliced_data.shape != (int(wcs.axis2['axis']), int(wcs.axis1['axis'])):
             print(f'Error in formating data: Output data {sliced_data.shape} != ({int(wcs.axis2["axis"])}, {int(wcs.axis1["axis"])})')
@@ -9,7 +9,6 @@ from argparse import ArgumentParser
 import shutil
 
 # external modules
-from astropy.io import fits
 import numpy as np
 from PIL import Image
 # from IPython import embed
@@ -17,8 +16,10 @@ import matplotlib.pyplot as plt
 from matplotlib.font_manager import FontProperties
 
 # relative modules
-from ..fits import read as nkrpy_read
-from ..fits import write as nkrpy_write
+from ....io.fits import read as nkrpy_read
+from ....io.fits import write as nkrpy_write
+from ....io._fitsindex import FitsIndex, read_primary_header
+from ....io._files import prefetch
 from ...functions import find_nearest_above
 from ...load import load_cfg, verify_param, verify_dir
 from ...decorators import timing
@@ -32,6 +33,10 @@ Must have a config file defined and tries to do basic reduction quickly.
 __filename__ = __file__.split('/')[-1].strip('.py')
 __path__ = __file__.strip('.py').strip(__filename__)
 cpu = mp.cpu_count()
+INDEX_KEYWORDS = ('EXPTIME', 'EXPOSURE', 'IMAGETYP', 'FILTER', 'NAXIS1', 'NAXIS2')
+# frames read ahead of the combination, and their memory budget
+PREFETCH = 4
+PREFETCH_BYTES = 1 << 30
 
 
 def cut(image, border=100):
@@ -62,15 +67,28 @@ def _gather_filters(files):
     return filt
 
 
+def _header(fname, index=None):
+    """Primary header keywords of fname, from the index when given."""
+    if index is not None:
+        return index.header(fname)
+    return read_primary_header(fname, INDEX_KEYWORDS)
+
+
+def _frames(files):
+    """(fname, nkrpy_read(fname)) of the frames, reading the next ones ahead."""
+    return prefetch(files, loader=nkrpy_read, ahead=PREFETCH, max_bytes=PREFETCH_BYTES)
+
+
+def _exptime(header):
+    return header.get('EXPTIME') or header.get('EXPOSURE')
+
+
 @timing
-def _gather_exp(files):
+def _gather_exp(files, index=None):
     """From list of files, return exposures found."""
     exp = {}
     for x in files:
-        with fits.open(x) as f:
-            header = f[0].header
-        exptime = header['EXPTIME'] if header['EXPTIME'] \
-            else header['EXPOSURE']
+        exptime = _exptime(_header(x, index))
         if exptime not in list(exp.keys()):
             exp[exptime] = [x, ]
         else:
@@ -126,17 +144,15 @@ def plot_image(image, title, fig, ax, color=False):
 
 
 @timing
-def flats(files, header=None, bias_image=None, darks=None):
+def flats(files, header=None, bias_image=None, darks=None, index=None):
     """Construct flat frame."""
     al_files = deepcopy(files)
     filts = _gather_filters(files)
     masterflats = {}
     for filt in filts:
         files = [x for x in al_files if filt in x]
-        with fits.open(files[0]) as f:
-            header = f[0].header
-        exptime = header['EXPTIME'] if header['EXPTIME'] \
-            else header['EXPOSURE']
+        header = _header(files[0], index)
+        exptime = _exptime(header)
         if darks is not None:
             if float(exptime) not in list(darks.keys()):
                 dark_image = scale_dark(files=darks,
@@ -145,8 +161,8 @@ def flats(files, header=None, bias_image=None, darks=None):
                 dark_image = darks[float(exptime)]
 
         fdata = np.zeros((header['NAXIS1'], header['NAXIS2'], len(files)))
-        for i, f in enumerate(files):
-            ignored, fdata[:, :, i] = list(map(lambda x: x[0], nkrpy_read(f)))
+        for i, (f, frame) in enumerate(_frames(files)):
+            ignored, fdata[:, :, i] = list(map(lambda x: x[0], frame))
             if dark_image is not None:
                 fdata[:, :, i] -= dark_image
             if bias_image is not None:
@@ -160,15 +176,14 @@ def flats(files, header=None, bias_image=None, darks=None):
 
 
 @timing
-def bias(files, header=None):
+def bias(files, header=None, index=None):
     """Construct bias frame."""
     if len(files) > 0:
         if not header:
-            with fits.open(files[0]) as f:
-                header = f[0].header
+            header = _header(files[0], index)
         bdata = np.zeros((header['NAXIS1'], header['NAXIS2'], len(files)))
-        for i, f in enumerate(files):
-            ignored, bdata[:, :, i] = list(map(lambda x: x[0], nkrpy_read(f)))
+        for i, (f, frame) in enumerate(_frames(files)):
+            ignored, bdata[:, :, i] = list(map(lambda x: x[0], frame))
         bias_comb = np.median(bdata, axis=2)
     else:
         bias_comb = None
@@ -176,18 +191,17 @@ def bias(files, header=None):
 
 
 @timing
-def darks(files, header=None, bias_image=None):
+def darks(files, header=None, bias_image=None, index=None):
     """Construct dark frame."""
     if len(files) > 0:
         if not header:
-            with fits.open(files[0]) as f:
-                header = f[0].header
+            header = _header(files[0], index)
 
         masterdark_exp = {}
         ddata = np.zeros((header['NAXIS1'], header['NAXIS2']))
 
-        for i, f in enumerate(files):
-            ignored, ddata[:, :] = list(map(lambda x: x[0], nkrpy_read(f)))
+        for i, (f, frame) in enumerate(_frames(files)):
+            ignored, ddata[:, :] = list(map(lambda x: x[0], frame))
             exptime = ignored['EXPTIME'] if ignored['EXPTIME'] \
                 else ignored['EXPOSURE']
             if bias_image is not None:
@@ -229,17 +243,16 @@ def scale_dark(files, fin_exposure):
 
 
 @timing
-def cal(cfg, science, bias_image, darks, flats):
+def cal(cfg, science, bias_image, darks, flats, index=None):
     al_science = deepcopy(science)
     filts = _gather_filters(science)
     for filt in filts:
         if filt in flats:
             files = [x for x in al_science if filt in x]
             files.sort()
-            for i, f in enumerate(files):
-                header, data = list(map(lambda x: x[0], nkrpy_read(f)))
-                exptime = header['EXPTIME'] if header['EXPTIME'] \
-                    else header['EXPOSURE']
+            for i, (f, frame) in enumerate(_frames(files)):
+                header, data = list(map(lambda x: x[0], frame))
+                exptime = _exptime(_header(f, index))
                 if darks is not None:
                     dark_image = scale_dark(files=darks,
                                             fin_exposure=exptime)
@@ -276,7 +289,7 @@ def cal(cfg, science, bias_image, darks, flats):
     pass
 
 
-def _check(cfg, dtype):
+def _check(cfg, dtype, index=None):
     master = None
     if os.path.isdir(cfg.calibration):
         if os.path.isfile(f'master{dtype}.fits'):
@@ -285,7 +298,7 @@ def _check(cfg, dtype):
             master = data
         else:
             bias_i = glob(f'{getattr(cfg, dtype)}/*.fits')
-            master = bias(bias_i)
+            master = bias(bias_i, index=index)
     return master
 
 
@@ -308,6 +321,9 @@ def main(cfgname, clear=False):
             shutil.rmtree(x)
         verify_dir(x, create=True)
 
+    # headers are read once per new or changed frame, reruns hit the index
+    index = FitsIndex(cfg._cwd, keywords=INDEX_KEYWORDS, pattern='*.fits')
+    index.update()
     bias_i = glob(f'{cfg.bias}/*.fits')
     dark_i = glob(f'{cfg.darks}/*.fits')
     flat_i = glob(f'{cfg.flats}/*.fits')
@@ -315,11 +331,12 @@ def main(cfgname, clear=False):
     # filts = _gather_filters(science_i)
 
     print('Starting Cals')
-    masterbias = bias(bias_i)
+    masterbias = bias(bias_i, index=index)
     print('Finished Bias')
-    masterdarks = darks(dark_i, bias_image=masterbias)
+    masterdarks = darks(dark_i, bias_image=masterbias, index=index)
     print('Finished Darks')
-    masterflats = flats(flat_i, bias_image=masterbias, darks=masterdarks)
+    masterflats = flats(flat_i, bias_image=masterbias, darks=masterdarks,
+                        index=index)
     print('Finished Flats')
 
     os.chdir(os.path.join(cfg._cwd, cfg.calibration))
@@ -338,7 +355,8 @@ def main(cfgname, clear=False):
 
     os.chdir(cfg._cwd)
     cal(cfg, science_i, bias_image=masterbias,
-        darks=masterdarks, flats=masterflats)
+        darks=masterdarks, flats=masterflats, index=index)
+    index.close()
     print('Finished Science')
     pass
 
@@ -3,6 +3,14 @@
 # cython modules
 
 # internal modules
+import os
+import hashlib
+import json
+from contextlib import contextmanager
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
 
 # external modules
 import numpy as np
@@ -13,23 +21,38 @@ import matplotlib.pyplot as plt
 from matplotlib.colors import LogNorm
 
 # relative modules
-from ..io import _fits as fits
-from ._wcs import WCS
+from ..io import fits
+from ._moments import momentmap
 from ..misc.errors import ArgumentError
 from ..misc import constants
+from .._math._binstats import digitize, binned_statistics
 
 # global attributes
-__all__ = ['Profiler']
+__all__ = ['Profiler','ProfileCache']
 __doc__ = """."""
 __filename__ = __file__.split('/')[-1].strip('.py')
 __path__ = __file__.strip('.py').strip(__filename__)
 
 class Profiler:
-    def __init__(self,fpath,mpath=None,cx=None,cy=None,pa=None,inc=None,**kwargs):
+    def __init__(self,fpath,mpath=None,cx=None,cy=None,pa=None,inc=None,cache=None,**kwargs):
+        '''
+        ARGUMENTS:
+            cache - Opt-in persistent cache of r/az grids, mom0 and profiles across processes.
+                    True for the default location, a directory path, or a ProfileCache. Default None.
+        '''
         #Load data as fitscube object.
-        self.cube = fitscube(fpath=fpath,mpath=mpath,**kwargs)
+        self.cube = FitsCube(fpath=fpath,mpath=mpath,**kwargs)
         #Set disk geometry.
         self.geom = DiskGeom(self.cube,cx=cx,cy=cy,pa=pa,inc=inc)
+
+        #Persistent cache, keyed on the content of the cube (and mask) files.
+        if cache is True:
+            cache = ProfileCache()
+        elif isinstance(cache,str):
+            cache = ProfileCache(path=cache)
+        self.cache = cache
+        if not cache is None:
+            self.cache_id = '_'.join([cache.file_hash(p) for p in (fpath,mpath) if not p is None])
         
         #Dictionaries for storing intermediate products.
         self.points = {}
@@ -48,13 +71,44 @@ class Profiler:
         x,y,dy = np.loadtxt(path,unpack=True)
         self.profiles[key] = (x,y,dy)
         return x,y,dy
+    def _cube_options(self):
+        '''
+        FitsCube settings (axes, channel width) that mom0 and the profiles depend on.
+        '''
+        return [self.cube.xi,self.cube.yi,self.cube.vi,self.cube.dvel]
+    def _cache_key(self,*things):
+        '''
+        Disk cache key of the cube content and options, the current geometry and things.
+        '''
+        geom = [self.geom.g[k] for k in ('cra','cdec','pa','inc')]
+        return self.cache.key(self.cache_id,*self._cube_options(),*geom,*things)
+
     def get_points(self,spat='radec',unit='arcsec'):
         k = 'spat_%s'%(spat)
         if not k in self.points.keys():
-            r,az = self.geom.get_raz_arrs(use=spat,unit=unit)
-            self.points[k] = np.c_[r.flatten(),az.flatten()]
+            ck = None if self.cache is None else self._cache_key('raz',spat,unit)
+            cached = None if ck is None else self.cache.load(ck)
+            if cached is None:
+                r,az = self.geom.get_raz_arrs(use=spat,unit=unit)
+                cached = {'r':r.flatten(),'az':az.flatten()}
+                if not ck is None:
+                    self.cache.save(ck,**cached)
+            self.points[k] = np.c_[cached['r'],cached['az']]
         return self.points[k].copy()
 
+    def _get_mom0(self,clip=None):
+        '''
+        cube.get_mom0, read from/written to the disk cache when enabled.
+        '''
+        if self.cache is None:
+            return self.cube.get_mom0(clip=clip)
+        ck = self.cache.key(self.cache_id,*self._cube_options(),'mom0',clip)
+        cached = self.cache.load(ck)
+        if cached is None:
+            cached = {'mom0':self.cube.get_mom0(clip=clip)}
+            self.cache.save(ck,**cached)
+        return cached['mom0'].copy()
+
     def make_profile_key(self,along,rlo,rhi,azlo,azhi,nbins,dx,spat,spat_unit,bunit,noise_method,channel_rms,flux_unc):
         things = [along,rlo,rhi,azlo,azhi,nbins,dx,spat,spat_unit,bunit,noise_method,channel_rms,flux_unc]
         return '_'.join([str(thing) for thing in things])
@@ -74,11 +128,19 @@ class Profiler:
         if k in self.profiles.keys():
             print("Found profile in stores!")
             return self.profiles[k]
+        ck = None if self.cache is None else self._cache_key('profile',k,clip,min_Nbeam)
         if not to_key is None:
             k = to_key
-        
+        cached = None if ck is None else self.cache.load(ck)
+        if not cached is None:
+            x,y,dy = cached['x'],cached['y'],cached['dy']
+            self.profiles[k] = (x,y,dy)
+            return x,y,dy
+
         # Make the profile!
         x,y,dy = self.make_profile(along=along,rlo=rlo,rhi=rhi,azlo=azlo,azhi=azhi,nbins=nbins,dx=dx,spat=spat,spat_unit=spat_unit,bunit=bunit,noise_method=noise_method,channel_rms=channel_rms,flux_unc=flux_unc,clip=clip,min_Nbeam=min_Nbeam)
+        if not ck is None:
+            self.cache.save(ck,x=x,y=y,dy=dy)
 
         #Store and Return
         self.profiles[k] = (x,y,dy)
@@ -112,34 +174,32 @@ class Profiler:
             xlo = azlo
             xhi = azhi
         if not dx is None:
-            nbins = Dx/dx + 1
+            nbins = int(round(Dx/dx)) + 1
         xbins = np.linspace(xlo,xhi,nbins+1)
         x = np.linspace(xlo,xhi,nbins)
 
         #Grab mom0 brightness values.
-        bpts = self.cube.get_mom0(clip=clip).flatten()
+        bpts = self._get_mom0(clip=clip).flatten()
         bpts *= self.bunit_conv[bunit]
 
-        #Mask according to non-along axis
+        #Mask according to non-along axis, then bin along axis in one pass
         mask = (azpts >= azlo) & (azpts <= azhi) & (rpts >= rlo) & (rpts <= rhi)
-        bpts = bpts[mask]
-        xpts = xpts[mask]
-
-        #Split into bins
-        bpts_binned = binary_chunkify(bpts,bins=xbins,barr=xpts)
+        idx = digitize(xpts,xbins)
+        idx[~mask] = -1
+        stats = binned_statistics(bpts,idx,nbins,statistics=('mean','std','count'))
 
         #Average
-        y = np.array([np.mean(bpts) for bpts in bpts_binned])
+        y = stats['mean']
 
         if noise_method == 'std':
-            dy = np.array([np.std(bpts) for bpts in bpts_binned])
+            dy = stats['std']
         elif noise_method == 'Nbeam':
-            Npix = np.array([len(bpts) for bpts in bpts_binned])
+            Npix = stats['count']
             Nbeam = Npix / self.cube.get_beamcorr()
             Nbeam[Nbeam < min_Nbeam] = min_Nbeam
             if channel_rms is None:
                 raise ValueError("For Nbeam noise option, channel_rms must be provided")
-            max_nchan = np.array( [np.max(nch_pts) for nch_pts in binary_chunkify(self.cube.get_nchan_map().flatten()[mask],bins=xbins,barr=xpts) ])
+            max_nchan = binned_statistics(self.cube.get_nchan_map().flatten(),idx,nbins,statistics=('max',))['max']
             linewidth = max_nchan * self.cube.find_dvel() #km/s
             rms = linewidth * channel_rms #mJy/beam km/s
             dy = rms / np.sqrt(Nbeam)
@@ -191,15 +251,40 @@ class Profiler:
         
         return img_ax,prf_ax
 
-    def get_segmented_rprofs(self,rlo=0,rhi=None,nbins=100,dr=None,azlo=0,azhi=360,nseg=8,spat='radec'):
+    def get_segmented_rprofs(self,rlo=0,rhi=None,nbins=100,dr=None,azlo=0,azhi=360,nseg=8,spat='radec',spat_unit='arcsec',bunit='mJy/beam',clip=None):
+        '''
+        Radial profiles of nseg azimuthal segments between azlo and azhi.
+
+        The radial and azimuthal digitizations are computed once and combined,
+        so all segments are reduced in a single pass over the pixels.
+
+        RETURNS:
+            rprofs - Dictionary of segment center azimuth -> mean profile, and 'R' -> radii.
+        '''
+        rpts,azpts = self.get_points(spat,unit=spat_unit).T
+        if rhi is None:
+            rhi = np.max(rpts)
         daz = (azhi-azlo)%360
         if daz == 0:
             daz = 360
+        if not dr is None:
+            nbins = int(round((rhi-rlo)/dr)) + 1
+        R = np.linspace(rlo,rhi,nbins)
+        ridx = digitize(rpts,np.linspace(rlo,rhi,nbins+1))
+        azrel = (azpts-azlo)%360
+        azidx = digitize(azrel,np.linspace(0,daz,nseg+1),right=False)
+        # the last segment is closed on both ends, as in make_profile
+        azidx[azrel == daz] = nseg-1
+        idx = azidx*nbins + ridx
+        idx[(ridx < 0) | (azidx < 0)] = -1
+
+        bpts = self._get_mom0(clip=clip).flatten()*self.bunit_conv[bunit]
+        I = binned_statistics(bpts,idx,nseg*nbins,statistics=('mean',))['mean'].reshape(nseg,nbins)
+
         bins = (np.arange(nseg+1)*daz/(nseg) + azlo)%360
         rprofs = {}
-        for azl,azh in zip(bins[:-1],bins[1:]):
-            R,I = self.get_rprofile(rlo=rlo,rhi=rhi,nbins=nbins,dr=dr,azlo=azl,azhi=azh,spat=spat)
-            rprofs[0.5*(azl+azh)] = I
+        for i,(azl,azh) in enumerate(zip(bins[:-1],bins[1:])):
+            rprofs[0.5*(azl+azh)] = I[i]
         rprofs['R'] = R
         return rprofs
 
@@ -230,9 +315,10 @@ class Profiler:
 
 
 class FitsCube:
-    def __init__(self,fpath,mpath=None,xi=None,yi=None,vi=None,dvel=None):
-        #Load image and mask
-        self.img,self.head = self.load_cube(fpath,header=True)
+    def __init__(self,fpath,mpath=None,xi=None,yi=None,vi=None,dvel=None,lazy=False):
+        #Load image and mask. If lazy, the cube stays memory-mapped on disk.
+        self.lazy = lazy
+        self.img,self.head = self.load_cube(fpath,header=True,lazy=lazy)
         #Get pixel size!
         ra_n = self.header_get_CN(look_for='RA')
         dec_n = self.header_get_CN(look_for='DEC')
@@ -242,12 +328,13 @@ class FitsCube:
         self.beam = {}
         self.load_beam(fpath)
         if not mpath is None:
-            self.mask = self.load_cube(mpath)
+            self.mask,_ = self.load_cube(mpath,lazy=lazy)
             if not np.all(self.mask.shape == self.img.shape):
                 print("Warning: Mask provided has incompatible shape! Not loading.")
                 mpath = None
         if mpath is None:
-            self.mask = np.ones_like(self.img)
+            #A lazy cube is never materialized, so None means unmasked.
+            self.mask = None if lazy else np.ones_like(self.img)
 
         self.saved_maps = {}
 
@@ -257,12 +344,14 @@ class FitsCube:
 
         self.init_wcs()
     def load_beam(self,fpath):
-        header, data = fits.open(fpath)
-        self.beam['BMIN'] = header['BMIN']
-        self.beam['BMAJ'] = header['BMAJ']
-        self.beam['BPA']  = header['BPA']
+        #Only the header is needed, don't read the data.
+        header, cube = fits.read_lazy(fpath)
+        try:
+            self.beam['BMIN'] = header['BMIN']
+            self.beam['BMAJ'] = header['BMAJ']
+            self.beam['BPA']  = header['BPA']
         finally:
-            f.close()
+            cube.close()
 
     def init_wcs(self):
         ra_n = self.header_get_CN(look_for='RA')
@@ -295,18 +384,19 @@ class FitsCube:
         return (np.pi*self.beam['BMIN']*self.beam['BMAJ']/(4*np.log(2))) / (self.dra*self.ddec)
 
 
-    def load_cube(self,path,header=False,trim=True,transpose=True):
+    def load_cube(self,path,header=False,trim=True,transpose=True,lazy=False):
         '''
         Load fits file (hopefully 3-dimensional). Optionally trim dimensions of size 1.
 
         ARGUMENTS:
             path - String path to an existing fits file.
             trim - Boolean whether or not to trim empty dimensions. Default True
+            lazy - Boolean whether to memory-map the cube instead of reading it. Default False
         RETURNS:
-            dat  - Numpy array of loaded fits file, possibly trimmed.
+            dat  - Numpy array (or nkrpy.io.fits.LazyCube) of loaded fits file, possibly trimmed.
         '''
         #Load from file
-        header, data = fits.open(path)
+        header, data = fits.read(path,lazy=lazy)
         data = data if not transpose else data.T
         data = data if not trim else np.squeeze(data)
         return data, header
@@ -327,32 +417,48 @@ class FitsCube:
         if self.vi is None:
             return self.img
 
-        nchan = self.get_nchan()
-        specarr = self.dvel*np.arange(nchan)
-        if use_mask:
-            cube = self.img*self.mask
-        else:
-            cube = self.img
-        if not clip is None:
-            cube[cube<clip] = 0
-        mom0 = np.trapz(np.moveaxis(cube,[self.xi,self.yi,self.vi],[0,1,2]),x=specarr,axis=2).T
+        mask = self.mask if use_mask else None
+        mom0, _ = momentmap(self.img,freq_axis=self.dvel*np.arange(self.get_nchan()),
+                            moment=0,axis=self.vi,mask=mask,clip=clip)
+        mom0 = np.nan_to_num(mom0)
+        mom0 = mom0 if self.yi < self.xi else mom0.T
         #Save and return
         self.saved_maps['mom0'] = mom0
         return mom0
 
+    def _get_plane(self,cube,i):
+        '''
+        Channel i of cube as a (y, x) image.
+        '''
+        if isinstance(cube,fits.LazyCube):
+            plane = cube.select(channel=i)
+        else:
+            plane = np.take(cube,i,axis=self.vi)
+        return plane if self.yi < self.xi else plane.T
+
     def get_nchan_map(self):
         if 'nchan' in self.saved_maps:
             return self.saved_maps['nchan']
-        nchan = np.sum(self.mask,axis=self.vi)
+        if self.mask is None:
+            shape = [n for i,n in enumerate(self.img.shape) if i != self.vi]
+            nchan = np.full(shape,self.get_nchan(),dtype=float)
+        elif isinstance(self.mask,fits.LazyCube):
+            nchan = sum(self._get_plane(self.mask,i) for i in range(self.get_nchan())).T
+        else:
+            nchan = np.sum(self.mask,axis=self.vi)
         #Save and return
         self.saved_maps['nchan'] = nchan
         return nchan
-    def get_channel_map(self,i):
+    def get_channel_map(self,i,save=True):
         k = 'channel%s'%(i)
         if k in self.saved_maps:
             return self.saved_maps[k]
-        chanmap = np.moveaxis(self.img,[self.xi,self.yi,self.vi],[0,1,2])[:,:,i].T
-        self.saved_maps[k] = chanmap
+        if self.lazy:
+            chanmap = self._get_plane(self.img,i)
+        else:
+            chanmap = np.moveaxis(self.img,[self.xi,self.yi,self.vi],[0,1,2])[:,:,i].T
+        if save:
+            self.saved_maps[k] = chanmap
         return chanmap
 
     def header_get_CN(self,look_for,get='first'):
@@ -759,24 +865,134 @@ class DiskGeom:
         
 
 
-def binary_chunkify(arr,bins,barr=None,final=True):
-    if len(bins) == 1:
-        split = barr<=bins[0]
-        chunks = [arr[split],arr[~split]]
-        return chunks
-    elif len(bins) == 0:
-        return [arr]
-    else:
-        chunks = []
-        i = int(len(bins)/2)
-        split = barr<=bins[i]
-        left_chunks = binary_chunkify(arr[split],bins[:i],barr=barr[split],final=False)
-        right_chunks = binary_chunkify(arr[~split],bins[i+1:],barr=barr[~split],final=False)
-        chunks.extend(left_chunks)
-        chunks.extend(right_chunks)
-        if final:
-            return chunks[1:-1]
-        return chunks 
+class ProfileCache:
+    '''
+    Persistent on-disk cache of Profiler products.
+
+    Entries are compressed .npz files named by a hash of their key, and are
+    evicted least recently used first once the cache grows past quota bytes.
+    File content hashes are remembered by (path, size, mtime) so unchanged
+    cubes are only hashed once.
+    '''
+    def __init__(self,path=None,quota=2**30):
+        '''
+        ARGUMENTS:
+            path  - Directory of the cache. Default ~/.cache/nkrpy/profiler
+            quota - Maximum size of the cache in bytes. Default 1 GiB.
+        '''
+        if path is None:
+            path = os.path.join(os.path.expanduser('~'),'.cache','nkrpy','profiler')
+        self.path = path
+        self.quota = quota
+        os.makedirs(self.path,exist_ok=True)
+        self._hash_index = os.path.join(self.path,'hashes.json')
+
+    @staticmethod
+    def key(*things):
+        '''
+        Hash any number of str()-able things into a cache key.
+        '''
+        return hashlib.sha1('_'.join([str(thing) for thing in things]).encode()).hexdigest()
+
+    @contextmanager
+    def _locked(self):
+        '''
+        Hold an exclusive lock on the hash index, where fcntl is available.
+        '''
+        with open(self._hash_index+'.lock','a') as lock:
+            if fcntl is not None:
+                fcntl.flock(lock,fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(lock,fcntl.LOCK_UN)
+
+    def _read_index(self):
+        try:
+            with open(self._hash_index,'r') as f:
+                return json.load(f)
+        except (OSError,ValueError):
+            return {}
+
+    def file_hash(self,fpath,blocksize=2**20):
+        '''
+        sha1 of the content of fpath, memoized by path, size and mtime.
+        '''
+        fpath = os.path.abspath(fpath)
+        st = os.stat(fpath)
+        stamp = '%d_%d'%(st.st_size,st.st_mtime_ns)
+        entry = self._read_index().get(fpath,{})
+        if entry.get('stamp') == stamp:
+            return entry['hash']
+        sha = hashlib.sha1()
+        with open(fpath,'rb') as f:
+            for block in iter(lambda: f.read(blocksize),b''):
+                sha.update(block)
+        #Merge into the current index so entries of other processes are kept.
+        with self._locked():
+            index = self._read_index()
+            index[fpath] = {'stamp':stamp,'hash':sha.hexdigest()}
+            tmp = self._hash_index+'.%d.tmp'%os.getpid()
+            with open(tmp,'w') as f:
+                json.dump(index,f)
+            os.replace(tmp,self._hash_index)
+        return index[fpath]['hash']
+
+    def _file(self,key):
+        return os.path.join(self.path,key+'.npz')
+
+    def load(self,key):
+        '''
+        RETURNS:
+            Dictionary of the arrays stored under key, or None on a miss.
+        '''
+        fname = self._file(key)
+        try:
+            with np.load(fname) as f:
+                ret = {k:f[k] for k in f.files}
+        except (OSError,ValueError):
+            return None
+        #Mark as recently used.
+        os.utime(fname)
+        return ret
+
+    def save(self,key,**arrays):
+        '''
+        Store arrays under key, then evict old entries beyond the quota.
+        '''
+        fname = self._file(key)
+        tmp = fname+'.%d.tmp.npz'%os.getpid()
+        np.savez_compressed(tmp,**arrays)
+        os.replace(tmp,fname)
+        self.evict()
+
+    def evict(self):
+        '''
+        Remove least recently used entries until the cache fits in the quota.
+        '''
+        entries = []
+        for f in os.scandir(self.path):
+            if f.name.endswith('.npz') and not '.tmp' in f.name:
+                st = f.stat()
+                entries.append((st.st_mtime,st.st_size,f.path))
+        total = sum([e[1] for e in entries])
+        for _,size,fname in sorted(entries):
+            if total <= self.quota:
+                break
+            try:
+                os.remove(fname)
+            except OSError:
+                continue
+            total -= size
+
+    def clear(self):
+        '''
+        Remove every entry.
+        '''
+        quota,self.quota = self.quota,-1
+        self.evict()
+        self.quota = quota
 
 
 def test():
@@ -16,6 +16,7 @@ from ._wcs import WCS
 from ._functions import (select_ellipse, select_rectangle, select_conic_section, select_circle, select_circular_annulus, select_elliptical_annulus)
 from .. import math as nkrpy_math
 from ..io import Log as Logger
+from ..io.fits import LazyCube
 from .._types import LoggerClass
 
 # global attributes
@@ -84,7 +85,8 @@ def extract_components_from_spectra(d, sampler: int = None, logger: LoggerClass
     data = data[:, lowercut:uppercut + 1]
     # make high resolution
     # resample to same resolution
-    logger.debug(f'''
+    # lazy messages, formatted only at debug verbosity
+    logger.debug(lambda: f'''
         Data: 
             shape: {data.shape}
             lower: {np.min(data[0, :])}
@@ -99,7 +101,7 @@ def extract_components_from_spectra(d, sampler: int = None, logger: LoggerClass
     # first SG smooth, pull put high freq noise
     window = fineres.shape[-1] // sampler
     window += ((window + 1) % 2)
-    logger.debug(f'''First SG Smoothing, window: {window}''')
+    logger.debug(lambda: f'''First SG Smoothing, window: {window}''')
     fineres[-1, :] = savgol_filter(fineres, axis=1, window_length=window, polyorder=2)[1, :]
     #from IPython import embed; embed()
     # Initial Non aggressive Filter data using 2 sigma
@@ -133,20 +135,22 @@ def extract_components_from_spectra(d, sampler: int = None, logger: LoggerClass
     fitregion = normed[~nans] < mx
     ps = []
     rmslast = -np.inf
-    for i in range(max([minpolyfit, 0]), maxpolyfit + 1):
-        coef = np.polyfit(wave[~nans][fitregion], continuum_flux[~nans][fitregion], w= 1. / weights[~nans][fitregion], deg=i)
+    degrees = range(max([minpolyfit, 0]), maxpolyfit + 1)
+    # every degree is solved from one factorization of the fit region
+    coefs = nkrpy_math.polyfit_degrees(wave[~nans][fitregion], continuum_flux[~nans][fitregion], degrees, w=1. / weights[~nans][fitregion], cache=False)
+    for i, coef in zip(degrees, coefs):
         polyfunc = np.poly1d(coef)
         fitcont = polyfunc(wave)
         res = np.nanstd(fineres[1, :][~nans][fitregion] - fitcont[~nans][fitregion])
         ps.append([res * (i + 1), polyfunc])
-        logger.debug(f"""Fit {i} order poly:
+        logger.debug(lambda i=i, res=res, coef=coef: f"""Fit {i} order poly:
             res={res:0.2e}
             params={coef}""")
     if len(ps) > 0:
         ps.sort(key=lambda x: x[0])
         bestpoly = ps[0]
 
-        logger.debug(f'Continuum fit weighted error: {bestpoly[0]: 0.2e}')
+        logger.debug(lambda: f'Continuum fit weighted error: {bestpoly[0]: 0.2e}')
         rms, bestpoly = bestpoly
     else:
         bestpoly = None
@@ -159,15 +163,28 @@ def extract_spectra_from_datacube(cube: np.ndarray, racen: float, deccen: float,
     racen, deccen are in same units as axis
     axis in degrees
     PA goes E of north (counterclockwise)
+    cube may also be a nkrpy.io.fits.LazyCube, which is streamed one channel
+    at a time instead of being loaded.
     ."""
-    cube = cube.copy()
     pos = -pa * np.pi / 180.
-    data = np.squeeze(cube)
+    if isinstance(cube, LazyCube):
+        data = cube.squeeze()
+        if data.spectral_axis == 0:
+            data = data.T
+    else:
+        data = np.squeeze(cube.copy())
     racenpix = wcs(racen, 'pix', wcs.axis1['type'])
     deccenpix = wcs(deccen, 'pix', wcs.axis2['type'])
     delt = wcs.axis1['delt']
     smajpix, sminpix = np.abs(smaj/(delt * 3600)), np.abs(smin/ (delt*3600))
     mask = select_ellipse(data.shape[:-1], xcen=racenpix, ycen=deccenpix, sma=smajpix, smi=sminpix, pa=pos)
+    if isinstance(data, LazyCube):
+        internal = np.zeros(data.nchan, dtype=float)
+        external = np.zeros(data.nchan, dtype=float)
+        for i, plane in enumerate(data.iter_channels()):
+            internal[i] = np.nansum(plane[mask])
+            external[i] = np.nansum(plane[~mask])
+        return internal, external
     internal = np.nansum(data[mask], axis=0)
     external = np.nansum(data[~mask], axis=0)
     return internal, external
@@ -8,12 +8,18 @@ from . import _logger
 from ._logger import *
 from . import _sorting
 from ._sorting import *
+from . import _fitsheader
+from ._fitsheader import *
+from . import _fitsindex
+from ._fitsindex import *
 from . import template
 
 __all__ = ['template', 'fits', 'hdf5'] +\
           _config.__all__ +\
           _logger.__all__ +\
-          _sorting.__all__ 
+          _sorting.__all__ +\
+          _fitsheader.__all__ +\
+          _fitsindex.__all__
 PACKAGES = __all__.copy()
 PACKAGES.sort()
 
@@ -1,6 +1,8 @@
 """Grabbing of files."""
 
 # standard modules
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 import os
 import shutil
 
@@ -15,18 +17,136 @@ from .._types import FileClass
 
 # global attributes
 __all__ = ['copytree', 'list_files',
-           'list_files_fmt', 'freplace', 'File', 'Files']
+           'list_files_fmt', 'freplace', 'File', 'Files',
+           'Prefetcher', 'prefetch']
 __doc__ = """."""
 __filename__ = __file__.split('/')[-1].strip('.py')
 __path__ = __file__.strip('.py').strip(__filename__)
 
 
+def _loader(ext: str):
+    """The (header, data) reader of a file extension."""
+    ext = ext.lower().lstrip('.')
+    if ext in ['fits', 'fit', 'fts', 'gz']:
+        from . import fits
+        return fits.read
+    if ext in ['hdf5', 'hf5', 'h5']:
+        from . import hdf5
+        return hdf5.read
+    raise ValueError(f'No reader for <.{ext}> files')
+
+
+def _read(fname: str):
+    """Read a file with the reader of its extension."""
+    return _loader(fname.rsplit('.', 1)[-1])(fname)
+
+
+class Prefetcher(object):
+    """Iterate over files while the next ones are read on worker threads.
+
+    Up to `ahead` files are read in advance, as long as the files being
+    read or waiting in the buffer fit in `max_bytes` (sized from the files
+    on disk). At least one file is always in flight, so a file larger
+    than the budget is still read. Files are yielded in the given order and
+    an error reading a file is raised when that file is reached. Pending
+    reads are cancelled when the iteration stops early.
+
+    Usage
+    -----
+    for fname, (header, data) in prefetch(frames, ahead=8, max_bytes=2 << 30):
+        stack.append(data)  # reading the next frames overlaps this
+
+    Parameters
+    ----------
+    filenames: iterable[str]
+        The files, in the order to yield them.
+    loader: callable
+        loader(filename), default fits.read or hdf5.read by extension.
+    ahead: int
+        The most files read ahead of the consumer.
+    max_bytes: int
+        The memory budget of the read-ahead buffer, None for no limit.
+    num_threads: int
+        The reading threads, default min(ahead, 4).
+    """
+
+    def __init__(self, filenames, loader=None, ahead: int = 4, max_bytes: int = None,
+                 num_threads: int = None):
+        self.filenames = list(filenames)
+        self.loader = loader or _read
+        self.ahead = max(int(ahead), 1)
+        self.max_bytes = max_bytes
+        self.num_threads = num_threads or min(self.ahead, 4)
+        self._pool = None
+        self._queue = deque()
+        self._buffered = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def __len__(self):
+        return len(self.filenames)
+
+    @staticmethod
+    def __size(fname: str):
+        try:
+            return os.path.getsize(fname)
+        except OSError:
+            return 0
+
+    def __fill(self, todo):
+        """Submit reads while the buffer has room."""
+        while todo and len(self._queue) < self.ahead:
+            size = self.__size(todo[0])
+            if self._queue and self.max_bytes is not None and \
+               self._buffered + size > self.max_bytes:
+                break
+            fname = todo.popleft()
+            self._queue.append((fname, size, self._pool.submit(self.loader, fname)))
+            self._buffered += size
+
+    def __iter__(self):
+        todo = deque(self.filenames)
+        self._pool = ThreadPoolExecutor(max_workers=self.num_threads)
+        try:
+            self.__fill(todo)
+            while self._queue:
+                fname, size, future = self._queue.popleft()
+                result = future.result()
+                self._buffered -= size
+                self.__fill(todo)
+                yield fname, result
+        finally:
+            self.close()
+
+    def close(self):
+        """Cancel the pending reads and stop the threads."""
+        for _, _, future in self._queue:
+            future.cancel()
+        self._queue.clear()
+        self._buffered = 0
+        if self._pool is not None:
+            self._pool.shutdown(wait=True)
+            self._pool = None
+
+
+def prefetch(filenames, loader=None, ahead: int = 4, max_bytes: int = None,
+             num_threads: int = None):
+    """Yield (filename, loader(filename)) reading ahead, see `Prefetcher`."""
+    return iter(Prefetcher(filenames, loader=loader, ahead=ahead, max_bytes=max_bytes,
+                           num_threads=num_threads))
+
+
 class File(FileClass):
     SUPPORTED_EXT = ['fits', 'bin', 'hdf5', 'txt']
 
     def __init__(self, filename: str = '', ext: str = None):
         self.reset()
-        self.load(filename=filename, ext=ext)
+        if filename:
+            self.load(filename=filename, ext=ext)
         pass
 
     @staticmethod
@@ -72,13 +192,7 @@ class File(FileClass):
         else:
             path, fname, _ = fparams
         realname = os.sep.join([path, fname]) + f'.{ext}'
-        if ext == 'fits':
-            from . import _fits
-            loader = _fits.read
-        elif ext in ['hdf5', 'hf5']:
-            from . import _hdf5
-            loader = _hdf5.read
-        data = loader(realname)
+        data = _loader(ext)(realname)
         self.__file = {
             'ext': ext,
             'data': data,
@@ -107,7 +221,8 @@ class Files(FileClass):
 
     def __init__(self, filename: str = '', ext: str = None):
         self.reset()
-        self.load(filename=filename, ext=ext)
+        if filename:
+            self.load(filename=filename, ext=ext)
         pass
 
     @staticmethod
@@ -162,13 +277,7 @@ class Files(FileClass):
         realname = os.sep.join([path, fname]) + f'.{ext}'
         if realname in self.__files:
             return
-        if ext == 'fits':
-            from . import _fits
-            loader = _fits.read
-        elif ext in ['hdf5', 'hf5']:
-            from . import _hdf5
-            loader = _hdf5.read
-        data = loader(realname)
+        data = _loader(ext)(realname)
         self.__files[realname] = {
             'ext': ext,
             'data': data,
@@ -176,6 +285,16 @@ class Files(FileClass):
             'path': path,
         }
 
+    def prefetch(self, filenames=None, ahead: int = 4, max_bytes: int = None,
+                 num_threads: int = None):
+        """Yield (filename, (header, data)) reading the next files ahead.
+
+        The files are not kept, see `Prefetcher`. Default the loaded files.
+        """
+        if filenames is None:
+            filenames = list(self.listfiles())
+        return prefetch(filenames, ahead=ahead, max_bytes=max_bytes, num_threads=num_threads)
+
     def write(self, filename: str, data):
         fparams = self.__get_path_fname_ext(filename)
         if ext in [None, '']:
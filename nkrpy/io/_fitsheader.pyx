@@ -0,0 +1,388 @@
+"""Fixed-width FITS header cards without astropy."""
+# flake8: noqa
+# cython modules
+cimport cython
+
+# internal modules
+import gzip
+
+# external modules
+
+# relative modules
+from ..misc.errors import ArgumentError
+
+# global attributes
+__all__ = ['CardHeader', 'parse_header', 'read_header']
+__doc__ = """Parse and write FITS headers in one pass over the 80 byte cards.
+
+parse_header tokenizes a header image into a `CardHeader`: an ordered,
+typed mapping with O(1) case-insensitive keyword lookup that keeps the
+card comments, commentary (COMMENT, HISTORY, blank) cards, HIERARCH
+keywords and joins CONTINUE long strings. CardHeader.tobytes writes the
+cards back as a padded header image. read_header reads only the header
+blocks of an HDU, skipping the data of the HDUs before it.
+"""
+__filename__ = __file__.split('/')[-1].strip('.py')
+__path__ = __file__.strip('.py').strip(__filename__)
+
+cdef Py_ssize_t CARD = 80
+cdef Py_ssize_t BLOCK = 2880
+COMMENTARY = ('COMMENT', 'HISTORY', '')
+# value column of fixed format numbers and logicals
+cdef int VALUE_WIDTH = 20
+
+
+@cython.boundscheck(False)
+@cython.wraparound(False)
+cdef Py_ssize_t _find(const unsigned char[:] buf, unsigned char c, Py_ssize_t start, Py_ssize_t stop):
+    """Index of the first c in buf[start:stop], stop if there is none."""
+    cdef Py_ssize_t i
+    for i in range(start, stop):
+        if buf[i] == c:
+            return i
+    return stop
+
+
+@cython.boundscheck(False)
+@cython.wraparound(False)
+cdef Py_ssize_t _string_end(const unsigned char[:] buf, Py_ssize_t start, Py_ssize_t stop):
+    """Index of the quote closing the string opened at start."""
+    cdef Py_ssize_t i = start + 1
+    while i < stop:
+        if buf[i] == 39:  # '
+            if i + 1 < stop and buf[i + 1] == 39:
+                i += 2
+                continue
+            return i
+        i += 1
+    return stop
+
+
+cdef object _number(str text):
+    """Python value of a non-string value field."""
+    if text == '':
+        return None
+    if text == 'T':
+        return True
+    if text == 'F':
+        return False
+    if text[0] == '(':
+        real, imag = text[1:-1].split(',')
+        return complex(_number(real.strip()), _number(imag.strip()))
+    if '.' not in text and 'E' not in text and 'D' not in text:
+        try:
+            return int(text)
+        except ValueError:
+            return text
+    try:
+        return float(text.replace('D', 'E'))
+    except ValueError:
+        return text
+
+
+@cython.boundscheck(False)
+@cython.wraparound(False)
+cdef tuple _value(str text, const unsigned char[:] buf, Py_ssize_t start, Py_ssize_t stop):
+    """(value, comment, is_string) of the value field text[start:stop]."""
+    cdef Py_ssize_t end, slash
+    while start < stop and buf[start] == 32:
+        start += 1
+    if start < stop and buf[start] == 39:
+        end = _string_end(buf, start, stop)
+        value = text[start + 1:end].replace("''", "'").rstrip()
+        slash = _find(buf, 47, end + 1, stop)
+        return value, text[slash + 1:stop].strip(), True
+    slash = _find(buf, 47, start, stop)
+    return _number(text[start:slash].strip()), text[slash + 1:stop].strip(), False
+
+
+def parse_header(data):
+    """Parse a header image into a `CardHeader`.
+
+    Parameters
+    ----------
+    data: bytes | str
+        The cards, 80 characters each, up to an optional END card.
+
+    Returns
+    -------
+    CardHeader
+    """
+    if isinstance(data, str):
+        data = data.encode('ascii', 'replace')
+    data = bytes(data)
+    # one decode, every field is then a str slice
+    text = data.decode('latin-1')
+    cdef const unsigned char[:] buf = data
+    cdef Py_ssize_t ncards = len(data) // CARD
+    cdef Py_ssize_t i, o, eq
+    cdef bint continued = False
+    header = CardHeader()
+    for i in range(ncards):
+        o = i * CARD
+        key = text[o:o + 8].strip().upper()
+        if key == 'END' and not text[o + 3:o + CARD].strip():
+            break
+        if key == 'CONTINUE' and continued:
+            value, comment, isstr = _value(text, buf, o + 8, o + CARD)
+            if isstr:
+                header._continue(value, comment)
+                continued = value.endswith('&')
+                continue
+        continued = False
+        if key == 'HIERARCH':
+            eq = _find(buf, 61, o + 8, o + CARD)
+            if eq == o + CARD:
+                header.append(key, text[o + 8:o + CARD].rstrip(), '')
+                continue
+            key = text[o + 8:eq].strip().upper()
+            value, comment, isstr = _value(text, buf, eq + 1, o + CARD)
+        elif buf[o + 8] == 61 and buf[o + 9] == 32 and key not in COMMENTARY:
+            value, comment, isstr = _value(text, buf, o + 10, o + CARD)
+        else:
+            # commentary card, the text is free form
+            header.append(key, text[o + 8:o + CARD].rstrip(), '')
+            continue
+        header.append(key, value, comment)
+        continued = isstr and value.endswith('&')
+    return header
+
+
+class CardHeader(object):
+    """Ordered, typed FITS header with O(1) keyword lookup.
+
+    Usage
+    -----
+    header = parse_header(raw)  # or read_header('cube.fits')
+    header['NAXIS1'], header.get('cdelt3'), header.comments['CTYPE1']
+    header['OBJECT'] = ('disk', 'target name')
+    raw = header.tobytes()
+
+    Keywords are case-insensitive. Commentary keywords (COMMENT,
+    HISTORY) return the list of their lines and assigning to them adds a
+    line.
+    """
+
+    def __init__(self, cards=()):
+        # [keyword, value, comment] in header order
+        self.cards = []
+        self._index = {}
+        for card in cards:
+            self.append(*card)
+
+    def append(self, key: str, value, comment: str = ''):
+        """Add a card at the end, replacing the value of an existing key."""
+        key = key.upper()
+        if key in COMMENTARY:
+            self.cards.append([key, value, comment])
+            return
+        if key in self._index:
+            self.cards[self._index[key]][1:] = [value, comment]
+            return
+        self._index[key] = len(self.cards)
+        self.cards.append([key, value, comment])
+
+    def _continue(self, value: str, comment: str):
+        """Join a CONTINUE card to the string of the last card."""
+        card = self.cards[-1]
+        card[1] = card[1][:-1] + value
+        if comment:
+            card[2] = f'{card[2]} {comment}'.strip()
+
+    def __len__(self):
+        return len(self.cards)
+
+    def __iter__(self):
+        return iter(self.keys())
+
+    def __contains__(self, key):
+        key = key.upper()
+        return key in self._index or (key in COMMENTARY and any(c[0] == key for c in self.cards))
+
+    def __getitem__(self, key):
+        key = key.upper()
+        if key in COMMENTARY:
+            return [c[1] for c in self.cards if c[0] == key]
+        return self.cards[self._index[key]][1]
+
+    def __setitem__(self, key, value):
+        comment = ''
+        if isinstance(value, tuple):
+            value, comment = value
+        elif key.upper() in self._index:
+            comment = self.cards[self._index[key.upper()]][2]
+        self.append(key, value, comment)
+
+    def __delitem__(self, key):
+        key = key.upper()
+        if key in COMMENTARY:
+            self.cards = [c for c in self.cards if c[0] != key]
+        else:
+            del self.cards[self._index.pop(key)]
+        self._index = {c[0]: i for i, c in enumerate(self.cards) if c[0] not in COMMENTARY}
+
+    def __repr__(self):
+        return self.tobytes(pad=False).decode('ascii', 'replace')
+
+    def get(self, key, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def keys(self):
+        """The unique keywords in header order."""
+        return list(dict.fromkeys(c[0] for c in self.cards))
+
+    def items(self):
+        return [(k, self[k]) for k in self.keys()]
+
+    def values(self):
+        return [self[k] for k in self.keys()]
+
+    @property
+    def comments(self):
+        """keyword: comment of the valued cards."""
+        return {c[0]: c[2] for c in self.cards if c[0] not in COMMENTARY}
+
+    def copy(self):
+        return CardHeader([list(c) for c in self.cards])
+
+    def tobytes(self, pad: bool = True):
+        """The header image, with END and padded to 2880 bytes.
+
+        Long strings are split over CONTINUE cards and keywords longer
+        than 8 characters are written as HIERARCH cards.
+        """
+        out = [_format(*c) for c in self.cards]
+        out.append('END'.ljust(CARD))
+        raw = ''.join(out).encode('ascii', 'replace')
+        if pad and len(raw) % BLOCK:
+            raw += b' ' * (BLOCK - len(raw) % BLOCK)
+        return raw
+
+
+cdef str _fixed(value):
+    """The fixed format text of a non-string value."""
+    if value is None:
+        return ''
+    if type(value).__name__ in ('bool', 'bool_'):
+        return ('T' if value else 'F').rjust(VALUE_WIDTH)
+    if isinstance(value, complex):
+        return f'({_fixed(value.real).strip()}, {_fixed(value.imag).strip()})'.rjust(VALUE_WIDTH)
+    if isinstance(value, float) or hasattr(value, 'dtype') and value.dtype.kind == 'f':
+        text = repr(float(value)).upper()
+        if '.' not in text and 'E' not in text and 'N' not in text:
+            text += '.'
+        return text.rjust(VALUE_WIDTH)
+    return str(value).rjust(VALUE_WIDTH)
+
+
+def _format(key: str, value, comment: str = ''):
+    """The 80 character card(s) of a keyword."""
+    if key in COMMENTARY:
+        text = str(value)
+        return ''.join((key.ljust(8) + text[i:i + 72]).ljust(CARD)
+                       for i in range(0, max(len(text), 1), 72))
+    head = key.ljust(8) + '= ' if len(key) <= 8 and ' ' not in key else f'HIERARCH {key} = '
+    if not isinstance(value, str):
+        card = head + _fixed(value)
+        if comment:
+            card += ' / ' + comment
+        return card[:CARD].ljust(CARD)
+    text = value.replace("'", "''")
+    # room for the quotes, and the & of a continued string
+    width = CARD - len(head) - 3
+    if len(text) <= width + 1:
+        card = head + f"'{text.ljust(8)}'"
+        if comment:
+            card += ' / ' + comment
+        return card[:CARD].ljust(CARD)
+    cards, first = [], True
+    while text:
+        room = width if first else CARD - 13
+        chunk = text[:room]
+        # never split an escaped quote
+        if chunk.endswith("'") and not chunk.endswith("''") and text[room:room + 1] == "'":
+            chunk = chunk[:-1]
+        text = text[len(chunk):]
+        quoted = f"'{chunk}&'" if text else f"'{chunk}'"
+        cards.append(((head if first else 'CONTINUE  ') + quoted).ljust(CARD))
+        first = False
+    if comment:
+        cards[-1] = (cards[-1].rstrip() + ' / ' + comment)[:CARD].ljust(CARD)
+    return ''.join(cards)
+
+
+def _hdu_bytes(header):
+    """Size of the data of an HDU, padded to whole blocks."""
+    naxis = header.get('NAXIS', 0)
+    if not naxis:
+        return 0
+    size = 1
+    for i in range(1, naxis + 1):
+        size *= header.get(f'NAXIS{i}', 0)
+    size = abs(header.get('BITPIX', 8)) // 8 * header.get('GCOUNT', 1) * (header.get('PCOUNT', 0) + size)
+    return -(-size // BLOCK) * BLOCK
+
+
+@cython.boundscheck(False)
+@cython.wraparound(False)
+cdef bint _has_end(const unsigned char[:] block):
+    cdef Py_ssize_t o
+    for o in range(0, BLOCK, CARD):
+        if block[o] == 69 and block[o + 1] == 78 and block[o + 2] == 68 and block[o + 3] == 32:
+            return True
+    return False
+
+
+def read_header(fname: str, ext: int = 0, keywords=None):
+    """Read the header of an HDU without its data.
+
+    Parameters
+    ----------
+    fname: str
+        The FITS file, optionally gzipped (.gz).
+    ext: int
+        The HDU, the data of the HDUs before it are skipped, not read.
+    keywords: iterable[str]
+        Stop reading blocks once all of these keywords are found, the
+            header then holds the cards up to that block. Default reads
+            to END.
+
+    Returns
+    -------
+    CardHeader
+    """
+    wanted = None if keywords is None else {k.upper() for k in keywords}
+    with (gzip.open(fname, 'rb') if fname.endswith('.gz') else open(fname, 'rb')) as f:
+        for hdu in range(ext + 1):
+            blocks = []
+            while True:
+                block = f.read(BLOCK)
+                if len(block) < BLOCK:
+                    raise ArgumentError(f'{fname} has no complete header for HDU {hdu}')
+                if hdu == 0 and not blocks and not block.startswith(b'SIMPLE  ='):
+                    raise ArgumentError(f'{fname} is not a FITS file')
+                blocks.append(block)
+                if _has_end(block):
+                    break
+                if hdu == ext and wanted is not None and _complete(b''.join(blocks), wanted):
+                    break
+            header = parse_header(b''.join(blocks))
+            if hdu < ext:
+                f.seek(_hdu_bytes(header), 1)
+    return header
+
+
+def _complete(data: bytes, wanted: set):
+    """Whether the cards hold every wanted keyword, and no string continues."""
+    header = parse_header(data)
+    if not wanted.issubset(header._index):
+        return False
+    last = header.cards[-1][1] if header.cards else None
+    return not (isinstance(last, str) and last.endswith('&'))
+
+# end of code
+
+# end of file
@@ -0,0 +1,263 @@
+"""Header-only index of a tree of FITS files."""
+
+# internal modules
+import fnmatch
+import json
+import os
+import sqlite3
+from concurrent.futures import ThreadPoolExecutor
+
+# external modules
+
+# relative modules
+from ..misc.errors import ArgumentError
+from ._fitsheader import read_header
+
+# global attributes
+__all__ = ['FitsIndex', 'read_primary_header']
+__doc__ = """Catalog the primary headers of a directory of FITS files.
+
+Only the 2880 byte header blocks of each file are read (see
+_fitsheader.read_header), never the data, and reading stops once every
+indexed keyword is found. Selected keywords together with the mtime and
+size of every file are kept in a SQLite sidecar, so an update only
+re-reads the headers of new or modified files and drops deleted ones.
+Queries on the keywords return the matching paths, e.g. to feed the
+calibration of a night of frames without opening a single file.
+"""
+__filename__ = __file__.split('/')[-1].strip('.py')
+__path__ = __file__.strip('.py').strip(__filename__)
+
+INDEX_NAME = '.nkrpy_fitsindex.sqlite'
+DEFAULT_KEYWORDS = ('OBJECT', 'IMAGETYP', 'FILTER', 'EXPTIME', 'EXPOSURE',
+                    'DATE-OBS', 'NAXIS', 'NAXIS1', 'NAXIS2', 'NAXIS3', 'BITPIX')
+
+
+def read_primary_header(fname: str, keywords=None):
+    """Read the keywords of the primary header, block by block.
+
+    With keywords, blocks are read only until all of them are found.
+
+    Parameters
+    ----------
+    fname: str
+        The FITS file, optionally gzipped (.gz).
+    keywords: iterable[str]
+        The keywords to keep, default all.
+
+    Returns
+    -------
+    dict
+        keyword: value, missing keywords are not included.
+    """
+    if keywords is None:
+        return dict(read_header(fname).items())
+    keywords = [k.upper() for k in keywords]
+    # stops at the block holding the last wanted keyword
+    header = read_header(fname, keywords=keywords)
+    return {k: header[k] for k in keywords if k in header}
+
+
+class FitsIndex(object):
+    """Incrementally updated catalog of FITS primary headers.
+
+    Usage
+    -----
+    index = FitsIndex('night1', keywords=('IMAGETYP', 'FILTER', 'EXPTIME'))
+    index.update()  # only new or changed files are read
+    flats = index.query(IMAGETYP='FLAT', FILTER='r')
+    darks = index.groupby('EXPTIME', IMAGETYP='DARK')  # {exptime: [paths]}
+
+    Parameters
+    ----------
+    root: str
+        The directory to index.
+    keywords: iterable[str]
+        The primary header keywords to store.
+    pattern: str | iterable[str]
+        fnmatch pattern(s) of the file names to index.
+    recursive: bool
+        Descend into subdirectories.
+    index: str
+        The sidecar file, default `INDEX_NAME` within root.
+    num_threads: int
+        Threads reading headers during an update.
+    """
+
+    def __init__(self, root: str, keywords=DEFAULT_KEYWORDS,
+                 pattern=('*.fits', '*.fit', '*.fts', '*.fits.gz'),
+                 recursive: bool = True, index: str = None, num_threads: int = 4):
+        self.root = os.path.abspath(root)
+        if not os.path.isdir(self.root):
+            raise ArgumentError(f'{root} is not a directory')
+        self.keywords = tuple(k.upper() for k in keywords)
+        self.pattern = (pattern,) if isinstance(pattern, str) else tuple(pattern)
+        self.recursive = recursive
+        self.num_threads = max(int(num_threads), 1)
+        self.index = index or os.path.join(self.root, INDEX_NAME)
+        self._db = sqlite3.connect(self.index)
+        self._db.execute('CREATE TABLE IF NOT EXISTS files (path TEXT PRIMARY KEY, '
+                         'mtime INTEGER, size INTEGER, error TEXT)')
+        self._db.execute('CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)')
+        columns = self.__columns()
+        for k in self.keywords:
+            if k not in columns:
+                self._db.execute(f'ALTER TABLE files ADD COLUMN {self.__quote(k)}')
+        stored = self._db.execute("SELECT value FROM meta WHERE key = 'keywords'").fetchone()
+        if stored is None or not set(self.keywords).issubset(json.loads(stored[0])):
+            # new keywords, every header has to be read again
+            self._db.execute('UPDATE files SET mtime = -1')
+        self._db.execute("INSERT OR REPLACE INTO meta VALUES ('keywords', ?)",
+                         (json.dumps(sorted(set(self.keywords) | set(json.loads(stored[0]) if stored else ()))),))
+        self._db.commit()
+
+    @staticmethod
+    def __quote(key: str):
+        return '"' + key.replace('"', '""') + '"'
+
+    def __columns(self):
+        return [r[1] for r in self._db.execute('PRAGMA table_info(files)')]
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def __len__(self):
+        return self._db.execute('SELECT COUNT(*) FROM files WHERE error IS NULL').fetchone()[0]
+
+    def close(self):
+        """Close the sidecar database."""
+        if self._db is not None:
+            self._db.close()
+            self._db = None
+
+    def __walk(self, top: str):
+        with os.scandir(top) as it:
+            for entry in it:
+                if entry.is_dir(follow_symlinks=False):
+                    if self.recursive and not entry.name.startswith('.'):
+                        yield from self.__walk(entry.path)
+                elif any(fnmatch.fnmatch(entry.name, p) for p in self.pattern):
+                    st = entry.stat()
+                    yield os.path.relpath(entry.path, self.root), st.st_mtime_ns, st.st_size
+
+    def __read(self, path: str):
+        try:
+            return read_primary_header(os.path.join(self.root, path), self.keywords), None
+        except (OSError, ArgumentError, EOFError) as e:
+            return {}, str(e)
+
+    def update(self):
+        """Bring the index up to date with the files on disk.
+
+        Returns
+        -------
+        dict
+            The number of files added, updated, removed and unchanged.
+        """
+        known = {p: (m, s) for p, m, s in self._db.execute('SELECT path, mtime, size FROM files')}
+        stale, seen = [], set()
+        for path, mtime, size in self.__walk(self.root):
+            seen.add(path)
+            if known.get(path) != (mtime, size):
+                stale.append((path, mtime, size))
+        removed = [p for p in known if p not in seen]
+        with ThreadPoolExecutor(max_workers=self.num_threads) as pool:
+            headers = list(pool.map(self.__read, [s[0] for s in stale]))
+        cols = ', '.join(['path', 'mtime', 'size', 'error'] + [self.__quote(k) for k in self.keywords])
+        marks = ', '.join('?' * (4 + len(self.keywords)))
+        rows = [(path, mtime, size, error) + tuple(_sql(header.get(k)) for k in self.keywords)
+                for (path, mtime, size), (header, error) in zip(stale, headers)]
+        with self._db:
+            self._db.executemany('DELETE FROM files WHERE path = ?', [(p,) for p in removed])
+            self._db.executemany(f'INSERT OR REPLACE INTO files ({cols}) VALUES ({marks})', rows)
+        added = sum(1 for s in stale if s[0] not in known)
+        return {'added': added, 'updated': len(stale) - added, 'removed': len(removed),
+                'unchanged': len(seen) - len(stale)}
+
+    def __where(self, where: str = None, **equals):
+        clauses, params = ['error IS NULL'], []
+        for key, value in equals.items():
+            key = key.upper()
+            if key not in self.keywords:
+                raise ArgumentError(f'{key} is not indexed, indexed: {self.keywords}')
+            if isinstance(value, (list, tuple, set)):
+                clauses.append(f'{self.__quote(key)} IN ({", ".join("?" * len(value))})')
+                params.extend(_sql(v) for v in value)
+            elif value is None:
+                clauses.append(f'{self.__quote(key)} IS NULL')
+            else:
+                clauses.append(f'{self.__quote(key)} = ?')
+                params.append(_sql(value))
+        if where:
+            clauses.append(f'({where})')
+        return ' AND '.join(clauses), params
+
+    def records(self, where: str = None, order_by: str = 'path', **equals):
+        """Indexed keywords of the matching files.
+
+        Parameters
+        ----------
+        where: str
+            An extra SQL condition on the keyword columns, e.g.
+                '"EXPTIME" > 30'.
+        order_by: str
+            The sort column.
+        equals:
+            keyword=value (or a list of values) conditions.
+
+        Returns
+        -------
+        list[dict]
+            One dict per file, with the absolute 'path'.
+        """
+        clause, params = self.__where(where, **equals)
+        cols = ['path'] + list(self.keywords)
+        order = 'path' if order_by == 'path' else self.__quote(order_by.upper())
+        rows = self._db.execute(f'SELECT {", ".join(self.__quote(c) for c in cols)} FROM files '
+                                f'WHERE {clause} ORDER BY {order}', params)
+        out = []
+        for row in rows:
+            record = dict(zip(cols, row))
+            record['path'] = os.path.join(self.root, record['path'])
+            out.append(record)
+        return out
+
+    def query(self, where: str = None, order_by: str = 'path', **equals):
+        """Absolute paths of the matching files, see `records`."""
+        return [r['path'] for r in self.records(where, order_by, **equals)]
+
+    def groupby(self, keyword: str, where: str = None, **equals):
+        """Matching paths grouped by the value of keyword.
+
+        Returns
+        -------
+        dict
+            value: [paths]
+        """
+        keyword = keyword.upper()
+        groups = {}
+        for r in self.records(where, order_by='path', **equals):
+            groups.setdefault(r[keyword], []).append(r['path'])
+        return groups
+
+    def header(self, fname: str):
+        """Indexed keywords of one file, reading it if it is not indexed."""
+        path = os.path.relpath(os.path.abspath(fname), self.root)
+        cols = list(self.keywords)
+        row = self._db.execute(f'SELECT {", ".join(self.__quote(c) for c in cols)} FROM files '
+                               'WHERE path = ? AND error IS NULL', (path,)).fetchone()
+        if row is None:
+            return read_primary_header(fname, self.keywords)
+        return {k: v for k, v in zip(cols, row) if v is not None}
+
+
+def _sql(value):
+    """Store booleans as SQLite does, everything else as is."""
+    return int(value) if isinstance(value, bool) else value
+
+# end of code
+
+# end of file
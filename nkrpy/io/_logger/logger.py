@@ -1,5 +1,9 @@
 """."""
 # internal modules
+import os
+import sys
+import queue
+import threading
 from datetime import datetime as datetime__datetime
 from time import sleep as time__sleep
 from time import time as time__time
@@ -85,6 +89,16 @@ __doc__ = """Generalized logger.
     # .>.> Called <{function.__name}> with  params: {args}, {kwargs}. Result: {result}'  # noqa
     ```
 
+    Background writing
+    ------------------
+    With `setup(..., async_write=True)` messages are queued and a
+    dedicated thread writes them to the terminal and log files in batches
+    of up to `buffer_size`. `flush` blocks until the queue is drained and
+    `teardown` (also run at exit, so after a Ctrl+C) stops the thread
+    after writing everything queued. Messages above the verbosity are
+    dropped before they are formatted, and a callable msg is only called
+    when the message is emitted.
+
     Setting up the Logger
     ---------------------
     """
@@ -111,6 +125,9 @@ class Logger(LoggerClass):
         Need to separately call the __setup.
         """
         self.__setup_status = False
+        self.__queue = None
+        self.__thread = None
+        self.__time_cache = (None, '')
         pass
 
     def __call__(self, *args, **kwargs):
@@ -130,7 +147,9 @@ class Logger(LoggerClass):
 
     def setup(self, logfile: str = None, append: bool = False,
               verbosity: int = 2, use_colour: bool = True,
-              structure_string: str = "-", add_timestamp: bool = True, suppress_terminal: bool = False):
+              structure_string: str = "-", add_timestamp: bool = True, suppress_terminal: bool = False,
+              async_write: bool = False, buffer_size: int = 1024,
+              max_bytes: int = None, backup_count: int = 5):
         """Set the parameters for the Messenger class.
 
         Parameters
@@ -154,6 +173,15 @@ class Logger(LoggerClass):
                 output to the terminal.
         suppress_terminal: bool
             If toggled will suppress terminal output
+        async_write: bool
+            Write the messages from a background thread in batches.
+        buffer_size: int
+            The maximum number of messages written per batch.
+        max_bytes: int
+            Rotate a logfile once it would grow past this size. The
+                rotated files are suffixed .1 (newest) to .backup_count
+        backup_count: int
+            The number of rotated logfiles to keep
 
         """
         if self.__setup_status:
@@ -175,6 +203,9 @@ class Logger(LoggerClass):
         else:
             self.logs = {'basename': self.logfile}
         self.logfile = ''
+        self.__time_cache = (None, '')
+        if async_write:
+            self.__start_writer()
         msg = f'The logger has been setup with parameters ' +\
             f': {saved_args}'
         self.success(msg)
@@ -197,11 +228,14 @@ class Logger(LoggerClass):
         return string
 
     def _get_time_string(self):
-        """Return detailed timedate."""
-        string = ''
-        if self.add_timestamp:
-            string = '[{}] '.format(datetime__datetime.now().strftime("%y-%m-%d %H:%M:%S"))
-        return string
+        """Return detailed timedate, formatted once per second."""
+        if not self.add_timestamp:
+            return ''
+        now = int(time__time())
+        if now != self.__time_cache[0]:
+            string = '[{}] '.format(datetime__datetime.fromtimestamp(now).strftime("%y-%m-%d %H:%M:%S"))
+            self.__time_cache = (now, string)
+        return self.__time_cache[1]
 
     def _make_full_msg(self, msg: str, verb_level: int):
         """Construct the full string that carries the message.
@@ -214,29 +248,63 @@ class Logger(LoggerClass):
             msg = str(msg)
         return time_string + struct_string + msg
 
+    def __start_writer(self):
+        """Start the background writer thread."""
+        if self.__thread is not None:
+            return
+        self.__queue = queue.Queue()
+        self.__thread = threading.Thread(target=self.__writer, name='nkrpy-logger', daemon=True)
+        self.__thread.start()
+
+    def __stop_writer(self):
+        """Write everything queued and stop the writer thread."""
+        if self.__thread is None:
+            return
+        self.__queue.put(None)
+        self.__thread.join()
+        self.__queue = None
+        self.__thread = None
+
+    def __writer(self):
+        """Drain the queue in batches until the None sentinel."""
+        q = self.__queue
+        while True:
+            batch = [q.get()]
+            while len(batch) < self.buffer_size:
+                try:
+                    batch.append(q.get_nowait())
+                except queue.Empty:
+                    break
+            records = [b for b in batch if b is not None]
+            try:
+                if records:
+                    self.__emit(records)
+                    self.__flush_files()
+            except Exception as e:
+                print(f'Logger failed to write: {e}', file=sys.stderr)
+            for _ in batch:
+                q.task_done()
+            if len(records) != len(batch):
+                return
+
     def __teardown(self):
-        """Close all opened files."""
+        """Flush the queue and close all opened files."""
         if not hasattr(self, 'logs'):
             return
+        self.__stop_writer()
         for key in self.logs:
             if key == 'basename':
                 continue
             if not self.logs[key].closed:
                 self.logs[key].close()
 
-    def __sigHandler(self):
+    def __sigHandler(self, *args):
         """Handle Ctl-C or sigints."""
         self.__teardown()
         sys__exit(0)
 
-    def _write(self, cmod: str, msg: str, logfile: str = None):
-        """Handle terminal/file writing.
-
-        Write the message to the file and print
-        it to the terminal if it is wanted.
-        """
-        if not self.suppress_terminal:
-            print("{}{}{}".format(cmod, msg, self.RESET))
+    def __resolve_logfile(self, logfile):
+        """Return the path of the logfile to write to, None for no file."""
         if logfile == -1:
             return
         if self.logs['basename'] is None:
@@ -245,13 +313,66 @@ class Logger(LoggerClass):
             self.logfile = '-'.join((self.logs['basename'], logfile)) + '.log'
         elif self.logfile == '':
             self.logfile = '-'.join((self.logs['basename'], '1')) + '.log'
+        return self.logfile
 
-        if self.logfile in self.logs:
-            if self.logs[self.logfile].closed:
-                self.logs[self.logfile] = open(self.logfile, self.__write_status)
-        else:
-            self.logs[self.logfile] = open(self.logfile, self.__write_status)
-        self.logs[self.logfile].write(msg + '\n')
+    def __open(self, path: str, mode: str = None):
+        handle = self.logs.get(path)
+        if handle is None or handle.closed:
+            handle = open(path, mode or self.__write_status)
+            self.logs[path] = handle
+        return handle
+
+    def __rotate(self, path: str):
+        """Shift path -> path.1 -> ... -> path.backup_count."""
+        self.logs[path].close()
+        if self.backup_count > 0:
+            for i in range(self.backup_count - 1, 0, -1):
+                if os.path.exists(f'{path}.{i}'):
+                    os.replace(f'{path}.{i}', f'{path}.{i + 1}')
+            os.replace(path, f'{path}.1')
+        return self.__open(path, 'w')
+
+    def __emit(self, records):
+        """Write (colour, msg, path) records to the terminal and files."""
+        if not self.suppress_terminal:
+            print(''.join(f'{cmod}{msg}{self.RESET}\n' for cmod, msg, _ in records), end='')
+        byfile = {}
+        for _, msg, path in records:
+            if path is not None:
+                byfile.setdefault(path, []).append(msg + '\n')
+        for path, lines in byfile.items():
+            handle = self.__open(path)
+            if not self.max_bytes:
+                handle.write(''.join(lines))
+                continue
+            size = handle.tell()
+            pending = []
+            for line in lines:
+                if size > 0 and size + len(line) > self.max_bytes:
+                    handle.write(''.join(pending))
+                    handle = self.__rotate(path)
+                    pending, size = [], 0
+                pending.append(line)
+                size += len(line)
+            handle.write(''.join(pending))
+
+    def __flush_files(self):
+        for fname, logfile in self.logs.items():
+            if fname != 'basename' and not logfile.closed:
+                logfile.flush()
+
+    def _write(self, cmod: str, msg: str, logfile: str = None):
+        """Handle terminal/file writing.
+
+        Write the message to the file and print
+        it to the terminal if it is wanted. Queued to the writer thread
+        when setup with async_write.
+        """
+        record = (cmod, msg, self.__resolve_logfile(logfile))
+        if self.__queue is not None:
+            self.__queue.put(record)
+            return
+        self.__emit([record])
 
     def __resolve_style(self, style: str):
         if hasattr(self, style):
@@ -280,6 +401,8 @@ class Logger(LoggerClass):
         """
         def real_decorator(function):
             def wrapper(*args, **kwargs):
+                if verbosity > self.get_verbosity():
+                    return function(*args, **kwargs)
                 msg = f'Calling <{function.__name__}> with ' +\
                     f'params: {args}, {kwargs}'
                 (self.__resolve_style(style))(msg, verbosity)
@@ -293,9 +416,10 @@ class Logger(LoggerClass):
 
     @__guarantee_setup
     def flush(self):
-        for fname, logfile in self.logs.items():
-            if not self.logs[fname].closed:
-                logfile.flush()
+        """Wait for queued messages and flush the logfiles."""
+        if self.__queue is not None:
+            self.__queue.join()
+        self.__flush_files()
 
     @__guarantee_setup
     def clear(self):
@@ -303,6 +427,8 @@ class Logger(LoggerClass):
         if self.__write_status not in truncatable:
             return
         for fname, logfile in self.logs.items():
+            if fname == 'basename':
+                continue
             if self.logs[fname].closed:
                 self.logs[fname] = open(fname, self.__write_status)
             if self.__write_status in truncatable:
@@ -376,9 +502,11 @@ class Logger(LoggerClass):
         self.linebreak('#', logfile=-1)
 
     @__guarantee_setup
-    def __general_messager(self, colour: str, msg: str, verb_level: int, logfile=None):
+    def __general_messager(self, colour: str, prefix: str, msg, verb_level: int, logfile=None):
         if verb_level <= self.verbosity:
-            full_msg = self._make_full_msg(msg, verb_level)
+            if callable(msg):
+                msg = msg()
+            full_msg = self._make_full_msg(f'{prefix}{msg}', verb_level)
             self._write(colour, full_msg, logfile=logfile)
 
     @__guarantee_setup
@@ -386,49 +514,42 @@ class Logger(LoggerClass):
         """Warn level."""
         width -= len('YYYY-MM-DD HH:MM:SS ')
         msg = f'{breakstr}' * width
-        self.__general_messager(self.HEADER, msg, 2, logfile=logfile)
+        self.__general_messager(self.HEADER, '', msg, 2, logfile=logfile)
 
     @__guarantee_setup
     def warn(self, msg: str, verb_level: int = 2, logfile=None):
         """Warn level."""
-        msg = f'(WARN) {msg}'
-        self.__general_messager(self.WARNING, msg, verb_level, logfile=logfile)
+        self.__general_messager(self.WARNING, '(WARN) ', msg, verb_level, logfile=logfile)
 
     @__guarantee_setup
     def header1(self, msg: str, verb_level: int = 0, logfile=None):
         """Highest Header level."""
-        msg = f'(HEADER) {msg}'
-        self.__general_messager(self.HEADER, msg, verb_level, logfile=logfile)
+        self.__general_messager(self.HEADER, '(HEADER) ', msg, verb_level, logfile=logfile)
 
     @__guarantee_setup
     def header2(self, msg: str, verb_level: int = 1, logfile=None):
         """Lower Header level."""
-        msg = f'(header) {msg}'
-        self.__general_messager(self.CYAN_TEXT, msg, verb_level, logfile=logfile)
+        self.__general_messager(self.CYAN_TEXT, '(header) ', msg, verb_level, logfile=logfile)
 
     @__guarantee_setup
     def success(self, msg: str, verb_level: int = 1, logfile=None):
         """Success level (highest)."""
-        msg = f'(SUCCESS) {msg}'
-        self.__general_messager(self.OKGREEN, msg, verb_level, logfile=logfile)
+        self.__general_messager(self.OKGREEN, '(SUCCESS) ', msg, verb_level, logfile=logfile)
 
     @__guarantee_setup
     def failure(self, msg: str, verb_level: int = 0, logfile=None):
         """Failure level (highest)."""
-        msg = f'(FAILURE) {msg}'
-        self.__general_messager(self.FAIL, msg, verb_level, logfile=logfile)
+        self.__general_messager(self.FAIL, '(FAILURE) ', msg, verb_level, logfile=logfile)
 
     @__guarantee_setup
     def message(self, msg: str, verb_level: int = 2, logfile=None):
         """Message level (lowest)."""
-        msg = f'(GENERAL) {msg}'
-        self.__general_messager(self.OKBLUE, msg, verb_level, logfile=logfile)
+        self.__general_messager(self.OKBLUE, '(GENERAL) ', msg, verb_level, logfile=logfile)
 
     @__guarantee_setup
     def debug(self, msg: str, verb_level: int = 4, logfile=None):
         """Debug level."""
-        msg = f'(DEBUG) {msg}'
-        self.__general_messager(self.WARNING, msg, verb_level, logfile=logfile)
+        self.__general_messager(self.WARNING, '(DEBUG) ', msg, verb_level, logfile=logfile)
 
     @__guarantee_setup
     def pyinput(self, message: str = '', verb_level: int = 0, logfile=None):
@@ -453,9 +574,9 @@ class Logger(LoggerClass):
         """Clean teardown call."""
         self.__teardown()
 
-    def sigHandler(self):
+    def sigHandler(self, *args):
         """Gather sigint thrown."""
-        self.__sigHandler()
+        self.__sigHandler(*args)
 
 
 # Yielding singleton to module
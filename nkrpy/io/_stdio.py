@@ -1,6 +1,14 @@
 """."""
 # internal modules
+import os
 import sys
+import mmap
+import time
+from array import array
+from itertools import islice
+import queue
+import threading
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
 from os import getcwd
 import importlib
 from datetime import datetime
@@ -9,17 +17,26 @@ import warnings
 exit = sys.exit
 
 # external modules
+import numpy as np
 
 # relative modules
-from nkrpy.io import _fits as fits
+from . import fits
 
 # global attributes
-__all__ = ['File' ]
+__all__ = ['File', 'LineIndex', 'follow', 'LineProcessor', 'chunkify_file',
+           'parallel_apply_line_by_line']
 __doc__ = """."""
 __filename__ = __file__.split('/')[-1].strip('.py')
 __path__ = __file__.strip('.py').strip(__filename__)
 __version__ = float(sys.version[:3])
 __cwd__ = getcwd()
+# sidecar of the line offsets of a text file
+INDEX_SUFFIX = '.nkrpy_lineidx'
+# bytes split at once reading backwards, and scanned at once for newlines
+BACKWARD_BYTES = 1 << 20
+INDEX_BYTES = 64 << 20
+# most bytes read by follow per poll
+FOLLOW_BYTES = 1 << 20
 example_typedict = {
     '__CFG_keys': {'type': str, 'opt': True, 'requires': '', 'default': None, 'doc': ''},
 }
@@ -33,7 +50,12 @@ class File(object):
          print f.head(5)
          print f.tail(5)
          for row in f.backward():
-             print row """
+             print row
+
+      tail and backward read the file backwards through an mmap, line k
+      is read through a `LineIndex` (kept in a sidecar file with
+      index(persist=True)) and follow yields the lines
+      appended to a growing file. """
   __files = {}
   SUPPORTED_FILES = ('fits', 'txt')
 
@@ -55,7 +77,9 @@ class File(object):
     self.filename = filename
     super(File, self).__init__(*args, **kwargs)
     self.BLOCKSIZE = 4096
-    if ext == 'fits':
+    self.encoding = 'utf-8'
+    self._index = None
+    if self.ext == 'fits':
       # shadow functions with fits
       self.head = None
       self.tail = None
@@ -64,7 +88,7 @@ class File(object):
       self.functions = fits
 
   def open(self, action: str = 'r'):
-    self.file = open(fname, action)
+    self.file = open(self.filename, action)
 
   def close(self, flush: bool = True):
     if flush:
@@ -92,49 +116,244 @@ class File(object):
         yield line
 
   def head(self, lines_2find=1):
-    self.seek(0)              #Rewind file
-    return [super(File, self).next() for x in xrange(lines_2find)]
-
-  def tail(self, lines_2find=1):  
-    self.seek(0, 2)             #Go to end of file
-    bytes_in_file = self.tell()
-    lines_found, total_bytes_scanned = 0, 0
-    while (lines_2find + 1 > lines_found and
-         bytes_in_file > total_bytes_scanned): 
-      byte_block = min(
-        self.BLOCKSIZE,
-        bytes_in_file - total_bytes_scanned)
-      self.seek( -(byte_block + total_bytes_scanned), 2)
-      total_bytes_scanned += byte_block
-      lines_found += self.read(self.BLOCKSIZE).count('\n')
-    self.seek(-total_bytes_scanned, 2)
-    line_list = list(self.readlines())
-    return line_list[-lines_2find:]
+    with open(self.filename, 'r', encoding=self.encoding) as f:
+      return [line.rstrip('\n') for line in islice(f, lines_2find)]
+
+  def tail(self, lines_2find=1):
+    """The last lines, in file order, without their newline."""
+    return list(islice(self.backward(), lines_2find))[::-1]
 
   def backward(self):
-    self.seek(0, 2)             #Go to end of file
-    blocksize = self.BLOCKSIZE
-    last_row = ''
-    while self.tell() != 0:
-      try:
-        self.seek(-blocksize, 1)
-      except IOError:
-        blocksize = self.tell()
-        self.seek(-blocksize, 1)
-      block = self.read(blocksize)
-      self.seek(-blocksize, 1)
-      rows = block.split('\n')
-      rows[-1] = rows[-1] + last_row
-      while rows:
-        last_row = rows.pop(-1)
-        if rows and last_row:
-          yield last_row
-    yield last_row
+    """Yield the lines from the last one to the first.
 
-import os
-import numpy as np
-import gc
-import multiprocessing as mp
+    Only the bytes of the yielded lines are read, through an mmap.
+    """
+    mm = _mapped(self.filename)
+    if mm is None:
+      return
+    with mm:
+      for line in _lines_backward(mm):
+        yield line.decode(self.encoding)
+
+  def index(self, persist: bool = False):
+    """The `LineIndex` of the file, brought up to date.
+
+    The offsets stay in memory unless persist writes the sidecar file.
+    """
+    if self._index is None:
+      self._index = LineIndex(self.filename, persist=persist, encoding=self.encoding)
+    else:
+      self._index.update()
+    return self._index
+
+  def line(self, k: int):
+    """Line k, in O(1) through the line index."""
+    return self.index()[k]
+
+  def follow(self, **kwargs):
+    """Yield the lines appended to the file, see `follow`."""
+    return follow(self.filename, encoding=self.encoding, **kwargs)
+
+
+def _mapped(fname: str):
+    """Read only mmap of a file, None when the file is empty."""
+    with open(fname, 'rb') as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return None
+        return mmap.mmap(f.fileno(), length=0, access=mmap.ACCESS_READ)
+
+
+def _lines_backward(mm, block: int = BACKWARD_BYTES):
+    """Yield the raw lines of a buffer from the last one to the first.
+
+    The buffer is split by blocks from its end, each byte is read once.
+    A final newline does not start an empty last line.
+    """
+    end = len(mm)
+    if end and mm[end - 1] == 10:
+        end -= 1
+    carry = b''
+    while True:
+        start = max(end - block, 0)
+        lines = (mm[start:end] + carry).split(b'\n')
+        if start:
+            # the first piece may continue in the previous block
+            carry = lines.pop(0)
+        yield from reversed(lines)
+        if not start:
+            return
+        end = start
+
+
+class LineIndex(object):
+    """Byte offsets of the lines of a text file, for O(1) line access.
+
+    The offsets are kept as int64 in memory and, with persist, in a sidecar
+    file (`INDEX_SUFFIX`) with the size and mtime of the text file, unless
+    the sidecar cannot be written. The sidecar is reused while the file is
+    unchanged and only the new bytes are scanned when it grew, as a log
+    or catalog being appended to does.
+
+    Usage
+    -----
+    index = LineIndex('catalog.txt', persist=True)
+    len(index), index[10_000_000], index.lines(5, 8)
+
+    Parameters
+    ----------
+    fname: str
+        The text file.
+    persist: bool
+        Keep the offsets in the sidecar file next to fname, off by
+            default so that reading never writes to the data directory.
+    encoding: str
+        Decode lines with this encoding, None returns the raw bytes.
+    """
+
+    def __init__(self, fname: str, persist: bool = False, encoding: str = 'utf-8'):
+        self.fname = fname
+        self.encoding = encoding
+        self.index = fname + INDEX_SUFFIX if persist else None
+        # offsets[k] is the start of line k, offsets[-1] the end of the file
+        self.offsets = array('q', [0])
+        self._stat = (0, 0)
+        self.__load()
+        self.update()
+
+    def __load(self):
+        if self.index is None or not os.path.isfile(self.index):
+            return
+        head, offsets = array('q'), array('q')
+        try:
+            with open(self.index, 'rb') as f:
+                head.fromfile(f, 2)
+                offsets.frombytes(f.read())
+        except (OSError, EOFError):
+            return
+        if len(offsets) and offsets[-1] == head[0]:
+            self.offsets, self._stat = offsets, (head[0], head[1])
+
+    def __save(self):
+        if self.index is None:
+            return
+        tmp = self.index + '.tmp'
+        try:
+            with open(tmp, 'wb') as f:
+                array('q', self._stat).tofile(f)
+                self.offsets.tofile(f)
+            os.replace(tmp, self.index)
+        except OSError:
+            # e.g. a read only directory, keep the index in memory only
+            if os.path.exists(tmp):
+                os.remove(tmp)
+            self.index = None
+
+    def update(self):
+        """Index the lines added since the last update.
+
+        Returns
+        -------
+        int
+            The number of new lines, the index is rebuilt if the file
+            shrank or changed without growing.
+        """
+        st = os.stat(self.fname)
+        if (st.st_size, st.st_mtime_ns) == self._stat:
+            return 0
+        if st.st_size <= self._stat[0]:
+            self.offsets = array('q', [0])
+        before = len(self)
+        offsets = self.offsets
+        # the last line may have been unterminated, scan it again
+        pos = offsets[-2] if len(offsets) > 1 else 0
+        del offsets[-2 if len(offsets) > 1 else -1:]
+        mm = _mapped(self.fname)
+        if mm is not None:
+            with mm:
+                offsets.append(pos)
+                size = st.st_size
+                buf = np.frombuffer(mm, dtype=np.uint8)
+                for start in range(pos, size, INDEX_BYTES):
+                    nl = np.flatnonzero(buf[start:start + INDEX_BYTES] == 10) + (start + 1)
+                    offsets.frombytes(nl[nl < size].astype(np.int64).tobytes())
+                del buf
+        offsets.append(st.st_size)
+        self._stat = (st.st_size, st.st_mtime_ns)
+        self.__save()
+        return len(self) - before
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, k: int):
+        n = len(self)
+        if not -n <= k < n:
+            raise IndexError(f'line {k} out of range for {n} lines')
+        k %= n
+        return self.lines(k, k + 1)[0]
+
+    def lines(self, start: int, stop: int = None):
+        """Lines start to stop (exclusive), read with a single pread."""
+        start, stop, _ = slice(start, stop).indices(len(self))
+        if start >= stop:
+            return []
+        base = self.offsets[start]
+        with open(self.fname, 'rb') as f:
+            raw = os.pread(f.fileno(), self.offsets[stop] - base, base)
+        out = []
+        for k in range(start, stop):
+            line = raw[self.offsets[k] - base:self.offsets[k + 1] - base]
+            line = line[:-1] if line.endswith(b'\n') else line
+            out.append(line if self.encoding is None else line.decode(self.encoding))
+        return out
+
+
+def follow(fname: str, from_end: bool = True, interval: float = 0.1,
+           max_interval: float = 2., timeout: float = None, encoding: str = 'utf-8'):
+    """Yield the lines appended to a growing file, as tail -f.
+
+    The file is polled with one fstat per interval, no inotify. The
+    interval doubles up to max_interval while the file is idle and drops
+    back to interval once it grows. New bytes are read with pread, only
+    complete lines are yielded and a truncated file is followed from its
+    start.
+
+    Parameters
+    ----------
+    fname: str
+        The file.
+    from_end: bool
+        Skip the lines already in the file.
+    interval: float
+        The shortest wait between polls, in seconds.
+    max_interval: float
+        The longest wait between polls, in seconds.
+    timeout: float
+        Stop after this many idle seconds, None follows forever.
+    encoding: str
+        Decode lines with this encoding, None yields the raw bytes.
+    """
+    with open(fname, 'rb') as f:
+        fd = f.fileno()
+        pos = os.fstat(fd).st_size if from_end else 0
+        partial, wait, idle = b'', interval, 0.
+        while True:
+            size = os.fstat(fd).st_size
+            if size < pos:
+                pos, partial = 0, b''
+            if size > pos:
+                chunk = os.pread(fd, min(size - pos, FOLLOW_BYTES), pos)
+                pos += len(chunk)
+                *lines, partial = (partial + chunk).split(b'\n')
+                for line in lines:
+                    yield line if encoding is None else line.decode(encoding)
+                wait, idle = interval, 0.
+                continue
+            if timeout is not None and idle >= timeout:
+                return
+            time.sleep(wait)
+            idle += wait
+            wait = min(wait * 2, max_interval)
 
 
 def chunkify_file(fname, size=1024*1024*1000, skiplines=-1):
@@ -156,43 +375,206 @@ def chunkify_file(fname, size=1024*1024*1000, skiplines=-1):
                 f.readline()
 
         chunkEnd = f.tell()
-        count = 0
-        while True:
+        while chunkEnd < fileEnd:
             chunkStart = chunkEnd
-            f.seek(f.tell() + size, os.SEEK_SET)
+            f.seek(chunkStart + size, os.SEEK_SET)
             f.readline()  # make this chunk line aligned
-            chunkEnd = f.tell()
+            chunkEnd = min(f.tell(), fileEnd)
             chunks.append((chunkStart, chunkEnd - chunkStart, fname))
-            count+=1
-
-            if chunkEnd > fileEnd:
-                break
     return chunks
 
+
+def _read_chunk(file_path, chunk_start, chunk_size, use_mmap=False):
+    """Read the raw bytes of a chunk."""
+    with open(file_path, "rb") as f:
+        if use_mmap:
+            with mmap.mmap(f.fileno(), length=0, access=mmap.ACCESS_READ) as mm:
+                return mm[chunk_start:chunk_start + chunk_size]
+        f.seek(chunk_start)
+        return f.read(chunk_size)
+
+
 def parallel_apply_line_by_line_chunk(chunk_data):
     """
     function to apply a function to each line in a chunk
 
     Params :
-        chunk_data : the data for this chunk 
+        chunk_data : (index, chunk_start, chunk_size, file_path, func_apply,
+                      func_args, encoding, use_mmap)
     Returns :
-        list of the non-None results for this chunk
+        the chunk index and the list of the non-None results for this chunk
     """
-    chunk_start, chunk_size, file_path, func_apply = chunk_data[:4]
-    func_args = chunk_data[4:]
-
-    t1 = time.time()
+    index, chunk_start, chunk_size, file_path, func_apply, func_args, encoding, use_mmap = chunk_data
+    cont = _read_chunk(file_path, chunk_start, chunk_size, use_mmap)
     chunk_res = []
-    with open(file_path, "rb") as f:
-        f.seek(chunk_start)
-        cont = f.read(chunk_size).decode(encoding='utf-8')
-        lines = cont.splitlines()
+    for line in cont.splitlines():
+        if encoding is not None:
+            line = line.decode(encoding)
+        ret = func_apply(line, *func_args)
+        if ret is not None:
+            chunk_res.append(ret)
+    return index, chunk_res
+
+
+class LineProcessor(object):
+    """Stream a function over the lines of large text files in parallel.
+
+    Files are split into line aligned byte chunks which are dispatched to
+    a pool of worker processes, kept alive across files. At most
+    `max_pending` chunks are in flight, so memory is bounded by the chunk
+    size regardless of the file size, and results are yielded as soon as
+    the chunks preceding them are done.
+
+    Usage
+    -----
+    with LineProcessor(parse, num_procs=8, chunk_size=64) as lp:
+        for row in lp.imap('catalog.txt', skiplines=1):
+            ...
+        with open('out.txt', 'w') as fout:
+            lp.apply('catalog2.txt', fout=fout)
+
+    Parameters
+    ----------
+    func_apply: callable
+        Picklable function called as func_apply(line, *func_args), lines
+        returning None are dropped.
+    func_args: iterable
+        Extra arguments of func_apply.
+    num_procs: int
+        The number of worker processes, <= 1 runs in the calling process.
+    chunk_size: float
+        Size of one chunk in MB.
+    encoding: str
+        Decode lines with this encoding, None passes the raw bytes.
+    use_mmap: bool
+        Read chunks through an mmap of the file instead of seek + read.
+    max_pending: int
+        Maximum number of chunks in flight, defaults to 2 * num_procs.
+    """
+
+    def __init__(self, func_apply, func_args=(), num_procs: int = None,
+                 chunk_size: float = 64, encoding: str = 'utf-8',
+                 use_mmap: bool = False, max_pending: int = None):
+        self.func_apply = func_apply
+        self.func_args = tuple(func_args)
+        self.num_procs = num_procs if num_procs is not None else os.cpu_count() or 1
+        self.chunk_size = int(chunk_size * 1024 * 1024)
+        self.encoding = encoding
+        self.use_mmap = use_mmap
+        self.max_pending = max_pending or 2 * max(self.num_procs, 1)
+        self.__pool = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def close(self):
+        """Shut down the worker processes."""
+        if self.__pool is not None:
+            self.__pool.shutdown(wait=True)
+            self.__pool = None
+
+    def __jobs(self, file_path, skiplines):
+        for index, (start, size, fname) in enumerate(chunkify_file(file_path, self.chunk_size, skiplines)):
+            yield (index, start, size, fname, self.func_apply, self.func_args,
+                   self.encoding, self.use_mmap)
+
+    def __chunks(self, file_path, skiplines, ordered):
+        """Yield the result list of each chunk."""
+        jobs = self.__jobs(file_path, skiplines)
+        if self.num_procs <= 1:
+            for job in jobs:
+                yield parallel_apply_line_by_line_chunk(job)[1]
+            return
+        if self.__pool is None:
+            self.__pool = ProcessPoolExecutor(max_workers=self.num_procs)
+        pending = set()
+        done_buffer = {}
+        nextidx = 0
+        exhausted = False
+        while True:
+            while not exhausted and len(pending) + len(done_buffer) < self.max_pending:
+                job = next(jobs, None)
+                if job is None:
+                    exhausted = True
+                    break
+                pending.add(self.__pool.submit(parallel_apply_line_by_line_chunk, job))
+            if not pending:
+                break
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for fut in done:
+                index, res = fut.result()
+                if not ordered:
+                    yield res
+                    continue
+                done_buffer[index] = res
+            while nextidx in done_buffer:
+                yield done_buffer.pop(nextidx)
+                nextidx += 1
+
+    def imap(self, file_path, skiplines: int = -1, ordered: bool = True):
+        """Yield the non-None results of every line.
+
+        Parameters
+        ----------
+        file_path: str
+            The text file.
+        skiplines: int
+            Number of header lines to skip.
+        ordered: bool
+            Yield in file order, otherwise in chunk completion order.
+        """
+        for res in self.__chunks(file_path, skiplines, ordered):
+            yield from res
+
+    def apply(self, file_path, skiplines: int = -1, fout=None, ordered: bool = True):
+        """Process a file, collecting the results or writing them to fout.
+
+        Results are written one per line by a writer thread fed through a
+        bounded queue, so processing continues while the output is flushed.
+
+        Returns
+        -------
+        list | int
+            The results, or the number of lines written if fout is given.
+        """
+        if fout is None:
+            return list(self.imap(file_path, skiplines, ordered))
+        binary = 'b' in getattr(fout, 'mode', '')
+        q = queue.Queue(maxsize=self.max_pending)
+        errors = []
+
+        def writer():
+            while True:
+                res = q.get()
+                if res is None:
+                    return
+                try:
+                    if binary:
+                        fout.write(b''.join(x + b'\n' for x in res))
+                    else:
+                        fout.write(''.join(f'{x}\n' for x in res))
+                except Exception as e:
+                    errors.append(e)
+
+        thread = threading.Thread(target=writer, daemon=True)
+        thread.start()
+        count = 0
+        try:
+            for res in self.__chunks(file_path, skiplines, ordered):
+                if errors:
+                    break
+                q.put(res)
+                count += len(res)
+        finally:
+            q.put(None)
+            thread.join()
+        if errors:
+            raise errors[0]
+        return count
 
-        for i,line in enumerate(lines):
-            ret = func_apply(line, *func_args)
-            if(ret != None):
-                chunk_res.append(ret)
-    return chunk_res
 
 def parallel_apply_line_by_line(input_file_path, chunk_size_factor, num_procs, skiplines, func_apply, func_args, fout=None):
     """
@@ -201,45 +583,19 @@ def parallel_apply_line_by_line(input_file_path, chunk_size_factor, num_procs, s
     Params :
         input_file_path : path to input file
         chunk_size_factor : size of 1 chunk in MB
-        num_procs : number of parallel processes to spawn, max used is num of available cores - 1
+        num_procs : number of parallel processes to spawn
         skiplines : number of top lines to skip while processing
         func_apply : a function which expects a line and outputs None for lines we don't want processed
         func_args : arguments to function func_apply
         fout : do we want to output the processed lines to a file
     Returns :
-        list of the non-None results obtained be processing each line
+        list of the non-None results obtained be processing each line,
+        the number of lines written if fout is given
     """
-    num_parallel = min(num_procs, mp.cpu_count()) - 1
-
-    jobs = chunkify_file(input_file_path, 1024 * 1024 * chunk_size_factor, skiplines)
-
-    jobs = [list(x) + [func_apply] + func_args for x in jobs]
-
-    print("Starting the parallel pool for {} jobs ".format(len(jobs)))
-
-    lines_counter = 0
-
-    pool = mp.Pool(num_parallel, maxtasksperchild=1000)  # maxtaskperchild - if not supplied some weird happend and memory blows as the processes keep on lingering
-
-    outputs = []
-    for i in range(0, len(jobs), num_parallel):
-        print("Chunk start = ", i)
-        t1 = time.time()
-        chunk_outputs = pool.map(parallel_apply_line_by_line_chunk, jobs[i : i + num_parallel])
-
-        for i, subl in enumerate(chunk_outputs):
-            for x in subl:
-                if(fout != None):
-                    print(x, file=fout)
-                else:
-                    outputs.append(x)
-                lines_counter += 1
-        del(chunk_outputs)
-        gc.collect()
-        print("All Done in time ", time.time() - t1)
+    with LineProcessor(func_apply, func_args, num_procs=num_procs,
+                       chunk_size=chunk_size_factor) as lp:
+        return lp.apply(input_file_path, skiplines=skiplines, fout=fout)
 
-    print("Total lines we have = {}".format(lines_counter))
+# end of code
 
-    pool.close()
-    pool.terminate()
-    return outputs
+# end of file
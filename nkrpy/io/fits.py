@@ -1,6 +1,7 @@
 """Module loads/manipulates/saves its files."""
 
 # internal modules
+from contextlib import contextmanager
 import os
 import re
 
@@ -11,16 +12,28 @@ import numpy as np
 
 # relative modules
 from ..misc.functions import typecheck
+from ._fitsheader import CardHeader, parse_header, read_header
 
 # global attributes
-__all__ = ['read', 'write', 'make_nan', 'make_zero', 'get_resolving_power',
-           'header_radec', 'create_header', 'reference', 'get_wcs_from_header']
+__all__ = ['read', 'read_lazy', 'read_header', 'LazyCube', 'write', 'make_nan', 'make_zero',
+           'get_resolving_power', 'header_radec', 'create_header',
+           'reference', 'get_wcs_from_header']
 __doc__ = """."""
 __filename__ = __file__.split('/')[-1].strip('.py')
 __path__ = __file__.strip('.py').strip(__filename__)
+SPECTRAL_CTYPES = ('FREQ', 'VEL', 'VRAD', 'VOPT', 'FELO', 'WAVE', 'AWAV',
+                   'WAVN', 'ZOPT', 'ENER', 'BETA')
+# arrays above this many bytes are streamed to disk in sections this big
+STREAM_BYTES = 64 << 20
+# dtypes StreamingHDU writes without scaling
+STREAM_DTYPES = ('uint8', 'int16', 'int32', 'int64', 'float32', 'float64')
 
 
 def __resolve_header(h, key: str):
+    # astropy and CardHeader lookups are case-insensitive and O(1)
+    for k in (key, key.upper(), key.lower()):
+        if k in h:
+            return h[k]
     key = key.lower()
     for k in h.keys():
         if key == k.lower():
@@ -53,6 +66,11 @@ def get_wcs_from_header(h: dict, axis=1):
     return reference(crval, crpix, crdel, numvals)
 
 
+def _is_card_image(h: str):
+    """Whether h is fixed-width 80 character cards rather than free text."""
+    return len(h) >= 80 and len(h) % 80 == 0 and (h[8:10] == '= ' or h.startswith('END '))
+
+
 def create_header(h):
     """Creater a header.
 
@@ -65,6 +83,8 @@ def create_header(h):
     h = (('KEY', 'VALUE'), ...)
     h = {KEY: VALUE, ...}
     h = 'KEY= VALUE KEY= VALUE'
+    h = b'KEY     = VALUE ...'  (80 character cards, as in a file)
+    h = CardHeader
 
     Parameters
     ----------
@@ -79,6 +99,10 @@ def create_header(h):
     CARD_MX_LEN = 22
     if isinstance(h, astropy__fits.header.Header):
         return h
+    if isinstance(h, (bytes, bytearray)) or (isinstance(h, str) and _is_card_image(h)):
+        h = parse_header(h)
+    if isinstance(h, CardHeader):
+        return astropy__fits.header.Header([tuple(c) if c[0] else ('', c[1]) for c in h.cards])
     if isinstance(h, tuple) or isinstance(h, list) or isinstance(h, set):
         if typecheck(h[0]):
             h = dict(h)
@@ -119,33 +143,381 @@ def open(fname: str):
     return read(fname)
 
 
-def read(fname: str, squeeze: bool=True):
+def read(fname: str, squeeze: bool=True, lazy: bool = False, ext: int = None):
     """Read in the file and neatly close.
 
     Parameters
     ----------
     fname: str
         filename
+    squeeze: bool
+        Drop the degenerate (length 1) axes of the data
+    lazy: bool
+        If set, return a memory-mapped `LazyCube` instead of loading the
+            data. See `read_lazy`.
+    ext: int
+        The HDU to read when lazy. Default is the first HDU with data.
 
     """
+    if lazy:
+        return read_lazy(fname, ext=ext, squeeze=squeeze)
     header, data = [], []
     ho, do = [], []
     with astropy__fits.open(fname) as hdul:
         for h in hdul:
             header.append(h.header)
             data.append(h.data)
+        if len(hdul) == 2 and data[0] is None and \
+           isinstance(hdul[1], astropy__fits.CompImageHDU):
+            # a tile compressed image as written by `write`
+            header, data = header[1:], data[1:]
     if len(header) == 1:
         header, data = header[0], data[0]
         data = np.squeeze(data)
     return header, data
 
 
-def write(f, fname=None, header=None, data=None, overwrite: bool = True):
+def read_lazy(fname: str, ext: int = None, squeeze: bool = True):
+    """Open the file memory-mapped without reading the data.
+
+    Parameters
+    ----------
+    fname: str
+        filename
+    ext: int
+        The HDU to use. Default is the first HDU with data.
+    squeeze: bool
+        Drop the degenerate (length 1) axes of the cube
+
+    Returns
+    -------
+    header: astropy.io.fits.header.Header
+    cube: LazyCube
+        Only the bytes of a requested slice are ever read from disk.
+
+    """
+    hdul = astropy__fits.open(fname, memmap=True, mode='readonly',
+                              do_not_scale_image_data=True)
+    if ext is None:
+        ext = 0
+        for i, h in enumerate(hdul):
+            if h.header.get('NAXIS', 0) > 0:
+                ext = i
+                break
+    header = hdul[ext].header
+    cube = LazyCube(hdul[ext].data, header=header, hdul=hdul)
+    if squeeze:
+        cube = cube.squeeze()
+    return header, cube
+
+
+class LazyCube(object):
+    """Memory-mapped view of a FITS image.
+
+    Slicing returns a scaled `np.ndarray` and only touches the bytes of the
+    slice on disk. BZERO/BSCALE (and BLANK for integer images) are applied
+    to each slice as it is read. The axes are in numpy order, so a typical
+    radio cube is (stokes, freq, dec, ra), or (freq, dec, ra) when squeezed.
+
+    Usage
+    -----
+    header, cube = fits.read_lazy('cube.fits')
+    chan = cube.channel(30)  # single 2D plane
+    cut = cube.select(x=slice(100, 150), y=slice(100, 150))  # spatial cutout
+    spec = cube.select(x=125, y=125)  # single spectrum
+    """
+
+    def __init__(self, raw, header, hdul=None, fitsaxes=None):
+        """Dunder.
+
+        Parameters
+        ----------
+        raw: np.memmap
+            The unscaled data as stored on disk.
+        header: astropy.io.fits.header.Header
+        hdul: astropy.io.fits.HDUList
+            The open file, kept alive for the memmap and closed by `close`.
+        fitsaxes: list[int]
+            The FITS axis number (NAXISn) of each numpy axis of raw.
+        """
+        self._raw = raw
+        self.header = header
+        self._hdul = hdul
+        if fitsaxes is None:
+            fitsaxes = list(range(raw.ndim, 0, -1))
+        self._fitsaxes = list(fitsaxes)
+        self.bscale = header.get('BSCALE', 1.)
+        self.bzero = header.get('BZERO', 0.)
+        self.blank = header.get('BLANK', None)
+        self.scaled = (self.bscale != 1) or (self.bzero != 0)
+
+    def __view(self, raw, fitsaxes):
+        new = self.__class__.__new__(self.__class__)
+        new.__dict__.update(self.__dict__)
+        new._raw = raw
+        new._fitsaxes = list(fitsaxes)
+        return new
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def close(self):
+        """Close the underlying file."""
+        if self._hdul is not None:
+            self._hdul.close()
+            self._hdul = None
+
+    def __repr__(self):
+        return f'LazyCube(shape={self.shape}, dtype={self.dtype})'
+
+    def __len__(self):
+        return self.shape[0]
+
+    @property
+    def shape(self):
+        return self._raw.shape
+
+    @property
+    def ndim(self):
+        return self._raw.ndim
+
+    @property
+    def size(self):
+        return self._raw.size
+
+    @property
+    def dtype(self):
+        """The dtype of the returned (scaled) slices."""
+        if not self.scaled and self.blank is None:
+            return self._raw.dtype
+        if self._raw.dtype.kind == 'f':
+            return self._raw.dtype
+        return np.dtype(np.float32 if self._raw.dtype.itemsize <= 2
+                        else np.float64)
+
+    @property
+    def nbytes(self):
+        return self.size * self.dtype.itemsize
+
+    @property
+    def T(self):
+        return self.transpose()
+
+    def transpose(self, *axes):
+        """Return a transposed view, no data is read."""
+        if len(axes) == 1 and not isinstance(axes[0], int):
+            axes = axes[0]
+        if not axes:
+            axes = list(range(self.ndim))[::-1]
+        return self.__view(self._raw.transpose(axes),
+                           [self._fitsaxes[a] for a in axes])
+
+    def squeeze(self):
+        """Return a view without the degenerate axes, no data is read."""
+        keep = [i for i, s in enumerate(self.shape) if s != 1]
+        idx = tuple(slice(None) if s != 1 else 0 for s in self.shape)
+        return self.__view(self._raw[idx], [self._fitsaxes[i] for i in keep])
+
+    def _scale(self, raw):
+        """Convert raw stored values into physical values."""
+        if not self.scaled and self.blank is None:
+            return np.array(raw)
+        out = np.array(raw, dtype=self.dtype)
+        if self.blank is not None and raw.dtype.kind in 'iu':
+            blanks = np.asarray(raw) == self.blank
+        else:
+            blanks = None
+        if self.bscale != 1:
+            out *= self.bscale
+        if self.bzero != 0:
+            out += self.bzero
+        if blanks is not None and blanks.any():
+            out[blanks] = np.nan
+        return out
+
+    def __getitem__(self, key):
+        return self._scale(self._raw[key])
+
+    def __array__(self, dtype=None):
+        """Load the full cube. Avoid on large files."""
+        data = self[...]
+        return data if dtype is None else data.astype(dtype)
+
+    def __iter__(self):
+        for i in range(self.shape[0]):
+            yield self[i]
+
+    def _ctype(self, fitsaxis: int):
+        return str(self.header.get(f'CTYPE{fitsaxis}', '')).upper()
+
+    def get_axis(self, kind: str):
+        """Return the numpy axis index of an axis type.
+
+        Parameters
+        ----------
+        kind: str
+            One of 'x' (ra), 'y' (dec), 'channel' (spectral) or 'stokes'.
+            Returns None if the axis is not present (e.g. squeezed).
+        """
+        kind = kind.lower()
+        for i, n in enumerate(self._fitsaxes):
+            ctype = self._ctype(n)
+            if kind in ('channel', 'spectral', 'freq', 'v'):
+                if ctype.startswith(SPECTRAL_CTYPES):
+                    return i
+            elif kind == 'stokes':
+                if ctype.startswith('STOKES'):
+                    return i
+            elif kind in ('x', 'ra'):
+                if ctype.startswith(('RA', 'GLON', 'ELON')) or \
+                   (ctype == '' and n == 1):
+                    return i
+            elif kind in ('y', 'dec'):
+                if ctype.startswith(('DEC', 'GLAT', 'ELAT')) or \
+                   (ctype == '' and n == 2):
+                    return i
+        return None
+
+    @property
+    def spectral_axis(self):
+        return self.get_axis('channel')
+
+    @property
+    def stokes_axis(self):
+        return self.get_axis('stokes')
+
+    @property
+    def nchan(self):
+        axis = self.spectral_axis
+        return 1 if axis is None else self.shape[axis]
+
+    def _key(self, **selection):
+        """Construct the numpy index for a named-axis selection."""
+        key = [slice(None)] * self.ndim
+        for kind, sel in selection.items():
+            if sel is None:
+                continue
+            axis = self.get_axis(kind)
+            if axis is None:
+                if isinstance(sel, (int, np.integer)) and sel == 0:
+                    continue
+                raise IndexError(f'Axis <{kind}> not found in cube.')
+            key[axis] = sel
+        return tuple(key)
+
+    def select(self, x=None, y=None, channel=None, stokes=None):
+        """Select a region by axis type.
+
+        Each of x, y, channel, stokes can be an int, a slice or None (all).
+        Only the selected bytes are read from disk.
+        """
+        return self[self._key(x=x, y=y, channel=channel, stokes=stokes)]
+
+    def channel(self, i: int, stokes: int = 0):
+        """Read a single channel (2D image)."""
+        stokes = stokes if self.stokes_axis is not None else None
+        return self.select(channel=i, stokes=stokes)
+
+    def stokes(self, i: int):
+        """Read a single stokes cube."""
+        return self.select(stokes=i)
+
+    def cutout(self, xlo: int, xhi: int, ylo: int, yhi: int,
+               channel=None, stokes=None):
+        """Read a spatial cutout, optionally restricted in channel/stokes."""
+        return self.select(x=slice(xlo, xhi), y=slice(ylo, yhi),
+                           channel=channel, stokes=stokes)
+
+    def iter_channels(self, start: int = 0, stop: int = None,
+                      stokes: int = 0):
+        """Yield each channel in turn, only one is held in memory."""
+        stop = self.nchan if stop is None else stop
+        for i in range(start, stop):
+            yield self.channel(i, stokes=stokes)
+
+
+def _update_header(hdr, header):
+    """Copy the cards of header into hdr, uppercasing keys and strings."""
+    if header is None:
+        return hdr
+    for h, v in header.items():
+        if isinstance(v, str):
+            v = v.upper()
+        try:
+            hdr[h.upper()] = v
+        except Exception as e:
+            print(e)
+            print('Skipping header: ', h)
+            continue
+    return hdr
+
+
+def _tempfile(fname: str):
+    """Create an empty, unique file next to fname.
+
+    Unlike mkstemp (always 0600) the file is created 0666 minus the
+    process umask, the mode a plain open gives.
+    """
+    prefix = os.path.join(os.path.dirname(fname), f'.{os.path.basename(fname)}.')
+    while True:
+        tmp = f'{prefix}{os.urandom(6).hex()}.tmp'
+        try:
+            os.close(os.open(tmp, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o666))
+        except FileExistsError:
+            continue
+        return tmp
+
+
+@contextmanager
+def _atomic(fname: str, overwrite: bool = True):
+    """Yield a temporary path that replaces fname on success.
+
+    The temporary file lives next to fname so os.replace is a rename on
+    the same filesystem; readers never see a partially written file and
+    a failed write leaves any existing file untouched.
+    """
+    fname = os.path.abspath(fname)
+    if not overwrite and os.path.exists(fname):
+        raise OSError(f'File {fname} already exists.')
+    tmp = _tempfile(fname)
+    try:
+        if os.path.exists(fname):
+            # keep the mode of the file being replaced
+            os.chmod(tmp, os.stat(fname).st_mode & 0o777)
+        yield tmp
+        os.replace(tmp, fname)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+
+
+def _stream(fname: str, header, data, section_bytes: int = None):
+    """Write data through a StreamingHDU a leading-axis section at a time.
+
+    Only a section is ever byteswapped for the big endian FITS layout,
+    instead of a copy of the whole array.
+    """
+    hdu = astropy__fits.StreamingHDU(fname, header)
+    try:
+        step = max(1, (section_bytes or STREAM_BYTES) // max(data[:1].nbytes, 1))
+        for i in range(0, data.shape[0], step):
+            hdu.write(np.ascontiguousarray(data[i:i + step]))
+    finally:
+        hdu.close()
+
+
+def write(f, fname=None, header=None, data=None, overwrite: bool = True,
+          compression: str = None, quantize_level: float = 16., stream: bool = None):
     """Open and read from the file.
 
     If the file exists, will attempt to update either
     and or both the header and data. Otherwise creates
-    the file.
+    the file. Files are written to a temporary file and renamed over the
+    destination, so an interrupted write never leaves a truncated file.
 
     Parameters
     ----------
@@ -158,49 +530,60 @@ def write(f, fname=None, header=None, data=None, overwrite: bool = True):
         hduheader
     data: numpy.array
         Data to write
+    overwrite: bool
+        Replace an existing file, otherwise raise OSError.
+    compression: str
+        Write a tile compressed image extension, e.g. 'RICE_1' or
+            'GZIP_1' (see astropy.io.fits.CompImageHDU). `read` returns
+            its header and data as for an uncompressed file.
+    quantize_level: float
+        The quantization of floating point data with RICE_1, see
+            CompImageHDU. Use 0 for lossless (GZIP_2 is preferred then).
+    stream: bool
+        Stream the data in sections of STREAM_BYTES. Default is to
+            stream arrays larger than a section.
 
     """
     if isinstance(f, str):
         # if string
-        #print('Found string')
         if isinstance(fname, str):
             f = fname
-        if os.path.isfile(f):
-            # open and update
-            os.system(f'rm -f {f}')
-        hdu = astropy__fits.PrimaryHDU(data)
-        if header is not None:
-            hdr = hdu.header
-            for h, v in header.items():
-                if isinstance(v, str):
-                    v = v.upper()
-                try:
-                    hdr[h.upper()] = v
-                except Exception as e:
-                    print(e)
-                    print('Skipping header: ', h)
-                    continue
-
-        hdu.writeto(f)
+        data = None if data is None else np.asarray(data)
+        with _atomic(f, overwrite=overwrite) as tmp:
+            if compression is not None:
+                hdu = astropy__fits.CompImageHDU(data, compression_type=compression.upper(),
+                                                 quantize_level=quantize_level)
+                _update_header(hdu.header, header)
+                astropy__fits.HDUList([astropy__fits.PrimaryHDU(), hdu]).writeto(tmp, overwrite=True)
+                return True
+            hdu = astropy__fits.PrimaryHDU(data)
+            _update_header(hdu.header, header)
+            if stream is None:
+                stream = data is not None and data.nbytes > STREAM_BYTES
+            if stream and data is not None and data.ndim > 0 and \
+               data.dtype.name in STREAM_DTYPES and 'BZERO' not in hdu.header:
+                _stream(tmp, hdu.header, data)
+            else:
+                hdu.writeto(tmp, overwrite=True)
 
     elif isinstance(f, astropy__fits.hdu.hdulist.HDUList):
-        #print('Found HDUList')
         if header is not None:
             f[0].header = header
         if data is not None:
             f[0].data = data
         if fname is not None:
-            f.writeto(fname)
+            with _atomic(fname, overwrite=overwrite) as tmp:
+                f.writeto(tmp, overwrite=True)
         else:
             f.flush()
     elif isinstance(f, astropy__fits.hdu.image.PrimaryHDU):
-        #print('Found PrimaryHDU')
         if header is not None:
             f.header = header
         if data is not None:
             f.data = data
         if fname is not None:
-            f.writeto(fname)
+            with _atomic(fname, overwrite=overwrite) as tmp:
+                f.writeto(tmp, overwrite=True)
         else:
             f.flush()
     return True
@@ -287,7 +670,7 @@ def reference(crval: float, crpix: int, cdelt: float, num: int):
         The number of pixels.
 
     """
-    a = np.arange(0, num, dtype=np.float)
+    a = np.arange(0, num, dtype=float)
     a *= cdelt
     a += crval - crpix
     return a
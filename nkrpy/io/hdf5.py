@@ -0,0 +1,521 @@
+"""Module loads/saves its products in HDF5."""
+
+# internal modules
+import os
+
+# external modules
+from astropy.io import fits as astropy__fits
+import numpy as np
+try:
+    import h5py
+except ImportError:  # optional, see requirements.txt
+    h5py = None
+
+# relative modules
+from .fits import LazyCube, create_header
+from ..misc.errors import ArgumentError
+
+# global attributes
+__all__ = ['read', 'read_lazy', 'write', 'write_slab', 'append',
+           'AppendWriter', 'list_datasets']
+__doc__ = """HDF5 counterpart of nkrpy.io.fits.
+
+read, read_lazy and write take and return the same (header, data) as
+their fits equivalents, so products can move between the two formats by
+swapping the module. Every dataset is chunked (one chunk per ~1 MiB of
+leading planes, so a channel is a single chunk read) and compressed, and
+its FITS header, WCS keywords included, is kept in the dataset attributes.
+A file may hold many named datasets, e.g. 'mom0', 'pv' and 'model/grid'.
+
+Partial reads go through the hyperslab selection of h5py
+(read(..., key=...) or read_lazy) and partial writes through write_slab.
+AppendWriter streams rows (model grids, MCMC chains) into a dataset that
+grows along its first axis.
+
+Compression is 'gzip' (default), 'lzf' or None with h5py alone, 'lz4'
+and 'blosc' need the hdf5plugin package.
+"""
+__filename__ = __file__.split('/')[-1].strip('.py')
+__path__ = __file__.strip('.py').strip(__filename__)
+
+DEFAULT_DATASET = 'data'
+CHUNK_BYTES = 1 << 20
+# cards rebuilt from the data rather than stored
+STRUCTURAL = ('SIMPLE', 'EXTEND', 'BITPIX', 'NAXIS', 'BSCALE', 'BZERO', 'BLANK')
+LIST_CARDS = ('COMMENT', 'HISTORY')
+BITPIX = {'u1': 8, 'i2': 16, 'i4': 32, 'i8': 64, 'f4': -32, 'f8': -64}
+
+
+def _h5py():
+    if h5py is None:
+        raise ImportError('nkrpy.io.hdf5 needs h5py, pip install h5py')
+    return h5py
+
+
+def _compression(compression, compression_opts=None):
+    """create_dataset keywords of a compression name."""
+    if compression is None:
+        return {}
+    compression = compression.lower()
+    if compression == 'gzip':
+        return {'compression': 'gzip', 'compression_opts': compression_opts or 4, 'shuffle': True}
+    if compression == 'lzf':
+        return {'compression': 'lzf', 'shuffle': True}
+    if compression in ('lz4', 'blosc'):
+        try:
+            import hdf5plugin
+        except ImportError:
+            raise ImportError(f'{compression} compression needs hdf5plugin, pip install hdf5plugin')
+        if compression == 'lz4':
+            return dict(hdf5plugin.LZ4())
+        return dict(hdf5plugin.Blosc(cname='lz4', clevel=compression_opts or 5,
+                                     shuffle=hdf5plugin.Blosc.SHUFFLE))
+    raise ArgumentError(f'Unknown compression <{compression}>, use gzip, lzf, lz4, blosc or None')
+
+
+def _chunks(shape, itemsize: int, target: int = CHUNK_BYTES):
+    """Chunk whole trailing planes, splitting leading axes to ~target bytes."""
+    if not shape or 0 in shape:
+        return True
+    chunks = list(shape)
+    for axis in range(len(shape) - 2 if len(shape) > 2 else 0):
+        nbytes = itemsize * int(np.prod(chunks))
+        if nbytes <= target:
+            break
+        chunks[axis] = max(1, shape[axis] * target // nbytes)
+    if itemsize * int(np.prod(chunks)) > 4 * target:
+        # a single plane is too large, let h5py pick
+        return True
+    return tuple(int(c) for c in chunks)
+
+
+def _attr(value):
+    """Python value of an attribute."""
+    if isinstance(value, bytes):
+        return value.decode()
+    if isinstance(value, np.ndarray):
+        return [_attr(v) for v in value.tolist()]
+    return value.item() if hasattr(value, 'item') else value
+
+
+def _structural(header, shape, dtype):
+    """Set the NAXIS/BITPIX cards of data of shape and dtype."""
+    bitpix = BITPIX.get(np.dtype(dtype).str[1:])
+    if bitpix is not None:
+        header['BITPIX'] = bitpix
+    header['NAXIS'] = len(shape)
+    for i, n in enumerate(shape[::-1], start=1):
+        header[f'NAXIS{i}'] = n
+    return header
+
+
+def _write_header(dset, header):
+    """Store header cards as attributes of dset."""
+    if header is None:
+        return
+    header = create_header(header) if not isinstance(header, astropy__fits.Header) else header
+    strtype = h5py.string_dtype()
+    cards, comments, lists = [], [], {k: [] for k in LIST_CARDS}
+    for card in header.cards:
+        key = card.keyword.upper()
+        if key in LIST_CARDS or key == '':
+            lists.get(key, lists['COMMENT']).append(str(card.value))
+            continue
+        if key in STRUCTURAL or key.startswith('NAXIS'):
+            continue
+        value = card.value
+        if isinstance(value, astropy__fits.card.Undefined) or value is None:
+            value = ''
+        dset.attrs[key] = value
+        cards.append(key)
+        comments.append(card.comment or '')
+    for key, lines in lists.items():
+        if lines:
+            dset.attrs[key] = np.array(lines, dtype=strtype)
+    dset.attrs['_cards'] = np.array(cards, dtype=strtype)
+    dset.attrs['_comments'] = np.array(comments, dtype=strtype)
+
+
+def _read_header(dset):
+    """astropy Header of dset, with the cards of its shape and dtype."""
+    header = astropy__fits.Header()
+    header['SIMPLE'] = True
+    _structural(header, dset.shape, dset.dtype)
+    header['EXTEND'] = True
+    attrs = dset.attrs
+    cards = _attr(attrs['_cards']) if '_cards' in attrs else [k for k in attrs if not k.startswith('_')]
+    comments = _attr(attrs['_comments']) if '_comments' in attrs else [''] * len(cards)
+    for key, comment in zip(cards, comments):
+        if key in LIST_CARDS or key not in attrs:
+            continue
+        header[key] = (_attr(attrs[key]), comment)
+    for key in LIST_CARDS:
+        for line in _attr(attrs[key]) if key in attrs else []:
+            header[key] = line
+    return header
+
+
+def list_datasets(fname):
+    """Names of the datasets in a file, in the order they were written.
+
+    Parameters
+    ----------
+    fname: str | h5py.Group
+        filename or an open file
+    """
+    def walk(group, prefix=''):
+        # visititems orders by name, items keeps the creation order
+        for name, obj in group.items():
+            if isinstance(obj, h5py.Dataset):
+                yield prefix + name
+            elif isinstance(obj, h5py.Group):
+                yield from walk(obj, f'{prefix}{name}/')
+    if isinstance(fname, str):
+        with _h5py().File(fname, 'r') as f:
+            return list(walk(f))
+    return list(walk(fname))
+
+
+def _resolve(f, ext):
+    """Dataset name of ext (name, index or None for every dataset)."""
+    names = list_datasets(f)
+    if ext is None:
+        return names
+    if isinstance(ext, (int, np.integer)):
+        return [names[ext]]
+    if ext not in f:
+        raise KeyError(f'No dataset <{ext}>, found {names}')
+    return [ext]
+
+
+def read(fname: str, squeeze: bool = True, lazy: bool = False, ext=None, key=None):
+    """Read in the file and neatly close.
+
+    Parameters
+    ----------
+    fname: str
+        filename
+    squeeze: bool
+        Drop the degenerate (length 1) axes of the data
+    lazy: bool
+        If set, return a `LazyCube` reading hyperslabs on demand. See
+            `read_lazy`.
+    ext: str | int
+        The dataset name or index. Default is every dataset.
+    key: tuple
+        Only read this hyperslab (ints and slices) of the dataset(s).
+
+    Returns
+    -------
+    header, data
+        The astropy Header and array, or lists of them when the file
+            holds several datasets, as in `nkrpy.io.fits.read`.
+    """
+    if lazy:
+        return read_lazy(fname, ext=ext, squeeze=squeeze)
+    header, data = [], []
+    with _h5py().File(fname, 'r') as f:
+        for name in _resolve(f, ext):
+            dset = f[name]
+            header.append(_read_header(dset))
+            data.append(dset[()] if key is None else dset[key])
+    if squeeze:
+        data = [np.squeeze(d) for d in data]
+    if len(header) == 1:
+        header, data = header[0], data[0]
+    return header, data
+
+
+def read_lazy(fname: str, ext=None, squeeze: bool = True):
+    """Open a dataset without reading the data.
+
+    Parameters
+    ----------
+    fname: str
+        filename
+    ext: str | int
+        The dataset. Default is the first dataset.
+    squeeze: bool
+        Drop the degenerate (length 1) axes of the cube
+
+    Returns
+    -------
+    header: astropy.io.fits.header.Header
+    cube: nkrpy.io.fits.LazyCube
+        Slicing reads only the chunks of the requested hyperslab. Close
+            it (or use it as a context manager) to close the file.
+    """
+    f = _h5py().File(fname, 'r')
+    try:
+        dset = f[_resolve(f, 0 if ext is None else ext)[0]]
+        header = _read_header(dset)
+    except Exception:
+        f.close()
+        raise
+    cube = LazyCube(_Hyperslab(dset), header=header, hdul=f)
+    if squeeze:
+        cube = cube.squeeze()
+    return header, cube
+
+
+class _Hyperslab(object):
+    """Lazy ints/slices/transpose view of an h5py Dataset.
+
+    Indexing composes the selection without reading, the data are read
+    as one hyperslab when the view is converted with np.asarray. This is
+    the raw array `LazyCube` expects of a memmap.
+    """
+
+    def __init__(self, dset, select=None, axes=None):
+        self.dset = dset
+        self.select = select or [range(n) for n in dset.shape]
+        # the dataset axis of each visible axis
+        self.axes = axes if axes is not None else [i for i, s in enumerate(self.select)
+                                                   if isinstance(s, range)]
+
+    @property
+    def shape(self):
+        return tuple(len(self.select[a]) for a in self.axes)
+
+    @property
+    def ndim(self):
+        return len(self.axes)
+
+    @property
+    def size(self):
+        return int(np.prod(self.shape))
+
+    @property
+    def dtype(self):
+        return self.dset.dtype
+
+    def transpose(self, *axes):
+        if len(axes) == 1 and not isinstance(axes[0], int):
+            axes = axes[0]
+        if not axes:
+            axes = list(range(self.ndim))[::-1]
+        return _Hyperslab(self.dset, self.select, [self.axes[a] for a in axes])
+
+    def __getitem__(self, key):
+        if not isinstance(key, tuple):
+            key = (key,)
+        if any(k is Ellipsis for k in key):
+            i = [k is Ellipsis for k in key].index(True)
+            key = key[:i] + (slice(None),) * (self.ndim - len(key) + 1) + key[i + 1:]
+        if len(key) > self.ndim:
+            raise IndexError(f'too many indices for a {self.ndim}D cube')
+        select = list(self.select)
+        for axis, k in zip(self.axes, key):
+            if not isinstance(k, (slice, int, np.integer)):
+                raise IndexError('Only ints, slices and ... can index a lazy HDF5 cube')
+            select[axis] = select[axis][k]
+        return _Hyperslab(self.dset, select, [a for a in self.axes if isinstance(select[a], range)])
+
+    def __array__(self, dtype=None):
+        key, flip = [], []
+        for i, s in enumerate(self.select):
+            if isinstance(s, range) and s.step < 0:
+                s = s[::-1]
+                flip.append(len(key))
+            key.append(s if not isinstance(s, range) else slice(s.start, s.start + len(s) * s.step if len(s) else s.start, s.step))
+        data = self.dset[tuple(key)]
+        if flip:
+            data = np.flip(data, axis=[sum(isinstance(s, range) for s in self.select[:i]) for i in flip])
+        ranges = [a for a, s in enumerate(self.select) if isinstance(s, range)]
+        data = np.transpose(data, [ranges.index(a) for a in self.axes])
+        return data if dtype is None else data.astype(dtype)
+
+
+def _open(f, mode: str = 'a'):
+    """File of a filename or the open file/group, and whether we own it."""
+    if isinstance(f, str):
+        return _h5py().File(f, mode, track_order=True), True
+    return f, False
+
+
+def _create(f, dataset: str, data, compression, compression_opts, chunks, maxshape=None):
+    if dataset in f:
+        del f[dataset]
+    data = np.asarray(data)
+    if chunks is None:
+        shape = data.shape
+        if maxshape is not None:
+            # appendable, chunk as many rows as fit in CHUNK_BYTES
+            row_nbytes = data.dtype.itemsize * int(np.prod(shape[1:]))
+            shape = (max(1, CHUNK_BYTES // max(row_nbytes, 1)),) + shape[1:]
+        chunks = _chunks(shape, data.dtype.itemsize)
+    kwargs = _compression(compression, compression_opts) if data.ndim else {}
+    if not data.ndim:
+        chunks = None
+    return f.create_dataset(dataset, data=data, chunks=chunks, maxshape=maxshape, **kwargs)
+
+
+def write(f, fname=None, header=None, data=None, overwrite: bool = True,
+          dataset: str = DEFAULT_DATASET, compression: str = 'gzip',
+          compression_opts=None, chunks=None):
+    """Write a dataset and its header.
+
+    Parameters
+    ----------
+    f: str | h5py.Group
+        file. Can be a filename or an open h5py File/Group. If it is a
+            string, will set fname = f unless fname is set.
+    fname: str
+        filename
+    header: dict | astropy.io.fits.Header
+        The header, stored in the dataset attributes.
+    data: numpy.array
+        Data to write
+    overwrite: bool
+        Replace an existing file. If False, the dataset is added to (or
+            replaced in) the existing file.
+    dataset: str
+        The dataset name, '/' creates groups.
+    compression: str
+        'gzip', 'lzf', 'lz4', 'blosc' or None.
+    compression_opts: int
+        The compression level.
+    chunks: tuple | bool
+        The chunk shape, default whole planes of ~1 MiB.
+
+    """
+    if isinstance(f, str) and isinstance(fname, str):
+        f = fname
+    if isinstance(f, str) and overwrite and os.path.isfile(f):
+        os.remove(f)
+    f, owned = _open(f)
+    try:
+        dset = _create(f, dataset, np.empty(0) if data is None else data,
+                       compression, compression_opts, chunks)
+        _write_header(dset, header)
+    finally:
+        if owned:
+            f.close()
+    return True
+
+
+def write_slab(fname, data, key, ext=DEFAULT_DATASET):
+    """Write data into the hyperslab key of an existing dataset.
+
+    Parameters
+    ----------
+    fname: str | h5py.Group
+        filename or an open file
+    data: np.ndarray
+        The values, broadcastable to the selection.
+    key: tuple
+        The selection, e.g. (slice(10, 20), ...) for channels 10-19.
+    ext: str | int
+        The dataset.
+    """
+    f, owned = _open(fname, 'r+')
+    try:
+        f[_resolve(f, ext)[0]][key] = data
+    finally:
+        if owned:
+            f.close()
+    return True
+
+
+class AppendWriter(object):
+    """Stream rows into a dataset growing along its first axis.
+
+    Usage
+    -----
+    with hdf5.AppendWriter('chain.h5', 'chain', header=header) as w:
+        for step in sampler.sample(p0, iterations=1000):
+            w.append(step.coords)  # (nwalkers, ndim) per step
+    header, chain = hdf5.read('chain.h5', ext='chain')
+
+    Parameters
+    ----------
+    fname: str | h5py.Group
+        filename or an open file
+    dataset: str
+        The dataset, appended to if it exists.
+    header: dict | astropy.io.fits.Header
+        The header, stored when the dataset is created.
+    compression, compression_opts, chunks:
+        See `write`. chunks default to ~1 MiB of rows.
+    flush_every: int
+        Flush the file to disk every this many appends.
+    """
+
+    def __init__(self, fname, dataset: str = DEFAULT_DATASET, header=None,
+                 compression: str = 'gzip', compression_opts=None, chunks=None,
+                 flush_every: int = 1):
+        self._file, self._owned = _open(fname)
+        self.dataset = dataset
+        self.header = header
+        self.compression = compression
+        self.compression_opts = compression_opts
+        self.chunks = chunks
+        self.flush_every = max(int(flush_every), 1)
+        self._pending = 0
+        self.dset = self._file[dataset] if dataset in self._file else None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def __len__(self):
+        return 0 if self.dset is None else self.dset.shape[0]
+
+    def append(self, rows, single: bool = None):
+        """Append rows.
+
+        Parameters
+        ----------
+        rows: np.ndarray
+            One row, or a (n, *row shape) block of rows.
+        single: bool
+            Whether rows is a single row. Default is a single row for
+                the append creating the dataset, afterwards when rows has
+                one axis less than the dataset.
+        """
+        rows = np.asarray(rows)
+        if self.dset is None:
+            rows = rows[np.newaxis] if single or single is None else rows
+            self.dset = _create(self._file, self.dataset, rows, self.compression,
+                                self.compression_opts, self.chunks,
+                                maxshape=(None,) + rows.shape[1:])
+            _write_header(self.dset, self.header)
+        else:
+            if single or (single is None and rows.ndim == self.dset.ndim - 1):
+                rows = rows[np.newaxis]
+            if rows.shape[1:] != self.dset.shape[1:]:
+                raise ArgumentError(f'Rows of shape {rows.shape[1:]} do not match {self.dset.shape[1:]}')
+            n = self.dset.shape[0]
+            self.dset.resize(n + rows.shape[0], axis=0)
+            self.dset[n:] = rows
+        self._pending += 1
+        if self._pending >= self.flush_every:
+            self.flush()
+        return self
+
+    def flush(self):
+        """Flush the rows written so far to disk."""
+        self._pending = 0
+        self._file.flush()
+
+    def close(self):
+        """Flush and close the file if it was opened here."""
+        if self._file is None:
+            return
+        self.flush()
+        if self._owned:
+            self._file.close()
+        self._file = None
+
+
+def append(fname, data, dataset: str = DEFAULT_DATASET, header=None, **kwargs):
+    """Append rows of data to a dataset, see `AppendWriter.append`."""
+    with AppendWriter(fname, dataset, header=header, **kwargs) as w:
+        w.append(data)
+    return True
+
+# end of code
+
+# end of file
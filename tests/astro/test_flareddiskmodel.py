@@ -0,0 +1,54 @@
+"""."""
+# flake8: noqa
+
+# internal modules
+import unittest
+
+# external modules
+import numpy as np
+
+# relative modules
+from nkrpy.astro import WCS
+from nkrpy.astro.models import FlaredDiskModel
+
+# global attributes
+__doc__ = """."""
+__filename__ = __file__.split('/')[-1].strip('.py')
+__path__ = __file__.strip('.py').strip(__filename__)
+
+
+def _model(**kwargs):
+    header = {'CTYPE1': 'RA---SIN', 'CRVAL1': 52., 'CRPIX1': 16., 'CDELT1': -4e-5, 'NAXIS1': 32, 'CUNIT1': 'deg',
+              'CTYPE2': 'DEC--SIN', 'CRVAL2': 31., 'CRPIX2': 16., 'CDELT2': 4e-5, 'NAXIS2': 32, 'CUNIT2': 'deg',
+              'CTYPE3': 'FREQ', 'CRVAL3': 2.2e11, 'CRPIX3': 8., 'CDELT3': 2e5, 'NAXIS3': 16, 'CUNIT3': 'Hz',
+              'RESTFREQ': 2.2e11, 'BMAJ': 1.2e-4, 'BMIN': 1e-4, 'BPA': 10.}
+    params = dict(wcs=WCS(header), ra=52., dec=31., distance_pc=140, inclination=45, position_angle=30,
+                  vsys=0., fwhm_linewidth=0.5, peakint=1., radial_intensity_gaussian_fwhm=3e-4,
+                  disk_to_envelope_velocity_profile_rc=2e-4, noise=0.01, seed=1)
+    params.update(kwargs)
+    return FlaredDiskModel(**params)
+
+
+class TestFlaredDiskModel(unittest.TestCase):
+
+    def test_only_stale_products_rebuilt(self):
+        model = _model()
+        model(mstar=0.5)
+        self.assertEqual(model.rebuilt, ['velproj', 'cube', 'scaled_cube', 'convolved_cube'])
+        model(vsys=1.)
+        self.assertEqual(model.rebuilt, ['cube', 'scaled_cube', 'convolved_cube'])
+        model(vsys=1.)
+        self.assertEqual(model.rebuilt, [])
+        np.testing.assert_allclose(model.convolved_cube, _model(mstar=0.5, vsys=1.).convolved_cube)
+
+    def test_render_batch(self):
+        model = _model()
+        params = np.array([[0.5, 0.2], [1.5, -0.2], [0.8, 0.]])
+        stack = model.render_batch(params, names=['mstar', 'vsys'])
+        self.assertEqual(stack.shape, (3, 16, 32, 32))
+        for row, cube in zip(params, stack):
+            np.testing.assert_allclose(cube, _model(mstar=row[0], vsys=row[1]).convolved_cube)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,49 @@
+"""."""
+# flake8: noqa
+
+# internal modules
+import unittest
+
+# external modules
+import numpy as np
+
+# relative modules
+from nkrpy import astro
+
+# global attributes
+__doc__ = """."""
+__filename__ = __file__.split('/')[-1].strip('.py')
+__path__ = __file__.strip('.py').strip(__filename__)
+
+
+class TestMoments(unittest.TestCase):
+
+    def setUp(self):
+        rng = np.random.default_rng(0)
+        self.vel = np.linspace(-5, 5, 24)
+        self.cube = rng.normal(size=(24, 10, 12)) + 3.
+
+    def test_tilings_agree(self):
+        ref = astro.moments(self.cube, moments=(0, 1, 2, 8, 9), freq_axis=self.vel, nthreads=1)
+        np.testing.assert_allclose(ref[0], np.trapz(self.cube, x=self.vel, axis=0))
+        np.testing.assert_allclose(ref[8], self.cube.max(axis=0))
+        np.testing.assert_allclose(ref[9], self.vel[self.cube.argmax(axis=0)])
+        for tile in ('spectral', 'spatial'):
+            # a tiny budget forces one channel/row per tile
+            ret = astro.moments(self.cube, moments=(0, 1, 2, 8, 9), freq_axis=self.vel,
+                                tile=tile, max_memory=1, nthreads=4)
+            for m in ref:
+                np.testing.assert_allclose(ret[m], ref[m])
+
+    def test_momentmap_mask_clip(self):
+        mask = np.ones(self.cube.shape[1:], dtype=bool)
+        mask[0] = False
+        mom0, count = astro.momentmap(self.cube.T, freq_axis=self.vel, clip=3., mask=mask.T)
+        expected = np.trapz(np.where(self.cube >= 3., self.cube, 0), x=self.vel, axis=0)
+        self.assertTrue(np.all(np.isnan(mom0.T[0])))
+        np.testing.assert_allclose(mom0.T[1:], expected[1:])
+        np.testing.assert_array_equal(count.T[1:], (self.cube >= 3.).sum(axis=0)[1:])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,77 @@
+"""."""
+# flake8: noqa
+
+# internal modules
+import os
+import tempfile
+import unittest
+
+# external modules
+import numpy as np
+
+# relative modules
+from nkrpy.io import fits
+from nkrpy.astro.radialprofile import Profiler, ProfileCache
+
+# global attributes
+__doc__ = """."""
+__filename__ = __file__.split('/')[-1].strip('.py')
+__path__ = __file__.strip('.py').strip(__filename__)
+
+
+class TestProfileCache(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.cache = ProfileCache(os.path.join(self.tmp, 'cache'), quota=2 ** 20)
+
+    def test_roundtrip(self):
+        key = ProfileCache.key('cube.fits', 0.5, 30)
+        self.assertEqual(key, ProfileCache.key('cube.fits', 0.5, 30))
+        self.assertIsNone(self.cache.load(key))
+        self.cache.save(key, r=np.arange(5.), prof=np.ones((2, 5)))
+        loaded = ProfileCache(self.cache.path).load(key)
+        np.testing.assert_array_equal(loaded['r'], np.arange(5.))
+        np.testing.assert_array_equal(loaded['prof'], np.ones((2, 5)))
+        self.assertIsNone(self.cache.load(ProfileCache.key('cube.fits', 0.5, 31)))
+
+    def test_file_hash(self):
+        fname = os.path.join(self.tmp, 'cube.bin')
+        with open(fname, 'wb') as f:
+            f.write(b'data')
+        first = self.cache.file_hash(fname)
+        self.assertEqual(ProfileCache(self.cache.path).file_hash(fname), first)
+        with open(fname, 'wb') as f:
+            f.write(b'other data')
+        self.assertNotEqual(self.cache.file_hash(fname), first)
+
+    def test_eviction(self):
+        rng = np.random.default_rng(0)
+        keys = [ProfileCache.key(i) for i in range(3)]
+        for i, key in enumerate(keys):
+            self.cache.save(key, a=rng.normal(size=40000))
+            os.utime(self.cache._file(key), (i, i))
+        self.cache.load(keys[0])
+        self.cache.save(ProfileCache.key(3), a=rng.normal(size=40000))
+        # ~300 kB per entry, three fit in the quota
+        self.assertIsNotNone(self.cache.load(keys[0]))
+        self.assertIsNone(self.cache.load(keys[1]))
+        total = sum(e.stat().st_size for e in os.scandir(self.cache.path) if e.name.endswith('.npz'))
+        self.assertLessEqual(total, self.cache.quota)
+
+    def test_profiler_options(self):
+        fname = os.path.join(self.tmp, 'cube.fits')
+        header = {'CTYPE1': 'RA---SIN', 'CRPIX1': 5., 'CDELT1': -1e-5, 'CRVAL1': 60.,
+                  'CTYPE2': 'DEC--SIN', 'CRPIX2': 5., 'CDELT2': 1e-5, 'CRVAL2': 20.,
+                  'CTYPE3': 'FREQ', 'CRPIX3': 1., 'CDELT3': 1e5, 'CRVAL3': 2.3e11,
+                  'BMAJ': 3e-5, 'BMIN': 2e-5, 'BPA': 0.}
+        fits.write(fname, header=header, data=np.ones((4, 8, 8), dtype=np.float32))
+        mom0 = Profiler(fname, cache=self.cache, dvel=1.)._get_mom0()
+        self.assertGreater(mom0.min(), 0)
+        # the cube file is unchanged, the channel width is not
+        np.testing.assert_allclose(Profiler(fname, cache=self.cache, dvel=2.)._get_mom0(), 2 * mom0)
+        np.testing.assert_allclose(Profiler(fname, cache=self.cache, dvel=1.)._get_mom0(), mom0)
+
+
+if __name__ == '__main__':
+    unittest.main()
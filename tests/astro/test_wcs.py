@@ -0,0 +1,50 @@
+"""."""
+# flake8: noqa
+
+# internal modules
+import unittest
+
+# external modules
+import numpy as np
+
+# relative modules
+from nkrpy.astro import WCS
+
+# global attributes
+__doc__ = """."""
+__filename__ = __file__.split('/')[-1].strip('.py')
+__path__ = __file__.strip('.py').strip(__filename__)
+
+
+def _header():
+    return {'CTYPE1': 'RA---SIN', 'CRVAL1': 52., 'CRPIX1': 50., 'CDELT1': -1e-4, 'NAXIS1': 100, 'CUNIT1': 'deg',
+            'CTYPE2': 'DEC--SIN', 'CRVAL2': 31., 'CRPIX2': 50., 'CDELT2': 1e-4, 'NAXIS2': 100, 'CUNIT2': 'deg',
+            'CTYPE3': 'FREQ', 'CRVAL3': 2.2e11, 'CRPIX3': 1., 'CDELT3': 1e5, 'NAXIS3': 20, 'CUNIT3': 'Hz'}
+
+
+class TestWCS(unittest.TestCase):
+
+    def test_batch_matches_scalar(self):
+        wcs = WCS(_header())
+        axes = ['ra---sin', 'dec--sin', 'freq']
+        grid = np.moveaxis(np.indices((4, 5, 3)), 0, -1).astype(float)
+        world = wcs.pix2world(grid, axes, declination_degrees=31.)
+        np.testing.assert_allclose(world[..., 0], wcs(grid[..., 0], 'wcs', 'ra---sin', declination_degrees=31.))
+        np.testing.assert_allclose(world[..., 1], wcs(grid[..., 1], 'wcs', 'dec--sin'))
+        np.testing.assert_allclose(world[..., 2], wcs(grid[..., 2], 'wcs', 'freq'))
+        np.testing.assert_allclose(wcs.world2pix(world, axes, declination_degrees=31.), grid, atol=1e-5)
+
+    def test_array_memoized(self):
+        wcs = WCS(_header())
+        first = wcs.array(axis='freq', return_type='wcs')
+        self.assertIs(first, wcs.array(axis='freq', return_type='wcs'))
+        self.assertFalse(first.flags.writeable)
+        wcs.shift_axis(val=1e6, axis='freq', unit='wcs')
+        shifted = wcs.array(axis='freq', return_type='wcs')
+        np.testing.assert_allclose(shifted - first, 1e6)
+        wcs.center_axis_pix(10, 30, axis='freq')
+        self.assertEqual(wcs.array(axis='freq').shape, (30,))
+
+
+if __name__ == '__main__':
+    unittest.main()
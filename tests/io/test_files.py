@@ -0,0 +1,71 @@
+"""."""
+# flake8: noqa
+
+# internal modules
+import os
+import tempfile
+import threading
+import time
+import unittest
+
+# external modules
+import numpy as np
+
+# relative modules
+from nkrpy.io import fits
+from nkrpy.io._files import Files, Prefetcher, prefetch
+
+# global attributes
+__doc__ = """."""
+__filename__ = __file__.split('/')[-1].strip('.py')
+__path__ = __file__.strip('.py').strip(__filename__)
+
+
+class TestPrefetch(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.files = []
+        for i in range(6):
+            fname = os.path.join(self.tmp, f'frame_{i}.fits')
+            fits.write(fname, data=np.full((4, 4), i, dtype=np.float32))
+            self.files.append(fname)
+
+    def test_ordered(self):
+        out = [(f, d[0, 0]) for f, (_, d) in prefetch(self.files, ahead=3)]
+        self.assertEqual(out, [(f, i) for i, f in enumerate(self.files)])
+        self.assertEqual([f for f, _ in Files().prefetch(self.files[:2])], self.files[:2])
+
+    def test_budget(self):
+        lock, active, peak = threading.Lock(), [0], [0]
+
+        def loader(fname):
+            with lock:
+                active[0] += 1
+                peak[0] = max(peak[0], active[0])
+            time.sleep(0.02)
+            with lock:
+                active[0] -= 1
+            return fname
+
+        size = os.path.getsize(self.files[0])
+        out = list(prefetch(self.files, loader=loader, ahead=4, max_bytes=size))
+        self.assertEqual([f for f, _ in out], self.files)
+        self.assertEqual(peak[0], 1)
+
+    def test_error(self):
+        def loader(fname):
+            if fname == self.files[2]:
+                raise OSError(fname)
+            return fname
+
+        seen = []
+        with self.assertRaises(OSError):
+            with Prefetcher(self.files, loader=loader) as frames:
+                for fname, _ in frames:
+                    seen.append(fname)
+        self.assertEqual(seen, self.files[:2])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,106 @@
+"""."""
+# flake8: noqa
+
+# internal modules
+import os
+import tempfile
+import unittest
+
+# external modules
+import numpy as np
+from astropy.io import fits as astropy__fits
+
+# relative modules
+from nkrpy.io import fits
+
+# global attributes
+__doc__ = """."""
+__filename__ = __file__.split('/')[-1].strip('.py')
+__path__ = __file__.strip('.py').strip(__filename__)
+
+
+def _make_cube(fname, bscale=0.5, bzero=10.):
+    raw = np.arange(1 * 5 * 6 * 7, dtype=np.int16).reshape(1, 5, 6, 7)
+    hdu = astropy__fits.PrimaryHDU(raw)
+    hdu.header['CTYPE1'] = 'RA---SIN'
+    hdu.header['CTYPE2'] = 'DEC--SIN'
+    hdu.header['CTYPE3'] = 'FREQ'
+    hdu.header['CTYPE4'] = 'STOKES'
+    hdu.header['BSCALE'] = bscale
+    hdu.header['BZERO'] = bzero
+    hdu.writeto(fname, overwrite=True)
+    return raw.astype(float) * bscale + bzero
+
+
+class TestLazyCube(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.fname = os.path.join(self.tmp, 'cube.fits')
+        self.expected = _make_cube(self.fname)
+
+    def test_squeezed_slices(self):
+        header, cube = fits.read(self.fname, lazy=True)
+        with cube:
+            self.assertEqual(cube.shape, (5, 6, 7))
+            self.assertEqual(cube.spectral_axis, 0)
+            self.assertIsNone(cube.stokes_axis)
+            np.testing.assert_allclose(cube.channel(3), self.expected[0, 3])
+            np.testing.assert_allclose(cube.cutout(1, 4, 2, 5, channel=slice(1, 3)),
+                                       self.expected[0, 1:3, 2:5, 1:4])
+            np.testing.assert_allclose(cube.select(x=2, y=3), self.expected[0, :, 3, 2])
+            np.testing.assert_allclose(np.asarray(cube), self.expected[0])
+
+    def test_unsqueezed_and_transposed(self):
+        _, cube = fits.read_lazy(self.fname, squeeze=False)
+        with cube:
+            self.assertEqual(cube.stokes_axis, 0)
+            np.testing.assert_allclose(cube.stokes(0), self.expected[0])
+            cubet = cube.squeeze().T
+            self.assertEqual(cubet.spectral_axis, 2)
+            np.testing.assert_allclose(cubet.channel(1), self.expected[0, 1].T)
+
+
+class TestWrite(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.fname = os.path.join(self.tmp, 'out.fits')
+        self.data = np.random.default_rng(0).normal(size=(9, 16, 16))
+
+    def test_streamed_replace(self):
+        fits.write(self.fname, data=np.zeros(3))
+        stream_bytes, fits.STREAM_BYTES = fits.STREAM_BYTES, 5000
+        try:
+            fits.write(self.fname, header={'object': 'disk'}, data=self.data)
+        finally:
+            fits.STREAM_BYTES = stream_bytes
+        header, data = fits.read(self.fname)
+        np.testing.assert_array_equal(data, self.data)
+        self.assertEqual(header['OBJECT'], 'DISK')
+        self.assertEqual(os.listdir(self.tmp), ['out.fits'])
+        with self.assertRaises(OSError):
+            fits.write(self.fname, data=self.data, overwrite=False)
+
+    def test_mode(self):
+        umask = os.umask(0o022)
+        try:
+            fits.write(self.fname, data=np.zeros(3))
+            self.assertEqual(os.stat(self.fname).st_mode & 0o777, 0o644)
+            os.chmod(self.fname, 0o600)
+            fits.write(self.fname, data=np.ones(3))
+            self.assertEqual(os.stat(self.fname).st_mode & 0o777, 0o600)
+        finally:
+            os.umask(umask)
+
+    def test_compressed(self):
+        fits.write(self.fname, data=self.data, compression='GZIP_2', quantize_level=0)
+        _, data = fits.read(self.fname)
+        np.testing.assert_array_equal(data, self.data)
+        fits.write(self.fname, data=self.data, compression='RICE_1')
+        _, data = fits.read(self.fname)
+        np.testing.assert_allclose(data, self.data, atol=0.1)
+
+
+if __name__ == '__main__':
+    unittest.main()
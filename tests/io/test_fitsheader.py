@@ -0,0 +1,79 @@
+"""."""
+# flake8: noqa
+
+# internal modules
+import os
+import tempfile
+import unittest
+import warnings
+
+# external modules
+import numpy as np
+from astropy.io import fits as astropy__fits
+
+# relative modules
+from nkrpy.io import fits, parse_header, read_header
+from nkrpy.misc.errors import ArgumentError
+
+# global attributes
+__doc__ = """."""
+__filename__ = __file__.split('/')[-1].strip('.py')
+__path__ = __file__.strip('.py').strip(__filename__)
+
+
+class TestCardHeader(unittest.TestCase):
+
+    def setUp(self):
+        h = astropy__fits.Header()
+        h['SIMPLE'] = True
+        h['BITPIX'] = -32
+        h['NAXIS'] = 1
+        h['NAXIS1'] = 10
+        h['CTYPE1'] = ('FREQ', 'spectral')
+        h['CDELT1'] = -1.5e-5
+        h['CRVAL1'] = 2.3e11
+        h['OBJECT'] = "it's a disk"
+        h['LONGSTR'] = 'x' * 150 + 'end'
+        h['FLAG'] = False
+        h['HISTORY'] = 'first'
+        h['HISTORY'] = 'second'
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore')
+            h['HIERARCH ESO DET CHIP'] = 3.5
+        self.astropy = h
+
+    def test_parse(self):
+        header = parse_header(self.astropy.tostring())
+        for k in ('NAXIS1', 'CDELT1', 'CRVAL1', 'OBJECT', 'LONGSTR', 'FLAG'):
+            self.assertEqual(header[k], self.astropy[k])
+        self.assertEqual(header['eso det chip'], 3.5)
+        self.assertEqual(header['HISTORY'], ['first', 'second'])
+        self.assertEqual(header.comments['CTYPE1'], 'spectral')
+        self.assertEqual(fits.get_wcs_from_header(header)[1], 2.3e11 - 1.5e-5)
+
+    def test_roundtrip(self):
+        raw = parse_header(self.astropy.tostring()).tobytes()
+        self.assertEqual(len(raw) % 2880, 0)
+        back = astropy__fits.Header.fromstring(raw.decode())
+        for k in ('CDELT1', 'OBJECT', 'LONGSTR', 'FLAG', 'ESO DET CHIP'):
+            self.assertEqual(back[k], self.astropy[k])
+        self.assertEqual(fits.create_header(raw)['LONGSTR'], self.astropy['LONGSTR'])
+
+    def test_read_header(self):
+        fname = os.path.join(tempfile.mkdtemp(), 'two.fits')
+        astropy__fits.HDUList([astropy__fits.PrimaryHDU(np.zeros((5, 7), np.float32), header=self.astropy),
+                               astropy__fits.ImageHDU(np.ones(3), name='SCI')]).writeto(fname)
+        self.assertEqual(read_header(fname)['NAXIS2'], 5)
+        self.assertEqual(read_header(fname, ext=1)['EXTNAME'], 'SCI')
+
+    def test_early_exit(self):
+        h = self.astropy.copy()
+        for i in range(60):
+            h[f'PAD{i}'] = i
+        fname = os.path.join(tempfile.mkdtemp(), 'cut.fits')
+        with open(fname, 'wb') as f:
+            # only the first block, with no END card
+            f.write(h.tostring().encode()[:2880])
+        self.assertEqual(read_header(fname, keywords=['naxis1', 'OBJECT'])['OBJECT'], "it's a disk")
+        with self.assertRaises(ArgumentError):
+            read_header(fname)
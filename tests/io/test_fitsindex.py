@@ -0,0 +1,66 @@
+"""."""
+# flake8: noqa
+
+# internal modules
+import os
+import tempfile
+import unittest
+
+# external modules
+import numpy as np
+from astropy.io import fits as astropy__fits
+
+# relative modules
+from nkrpy.io import FitsIndex, read_primary_header
+
+# global attributes
+__doc__ = """."""
+__filename__ = __file__.split('/')[-1].strip('.py')
+__path__ = __file__.strip('.py').strip(__filename__)
+
+
+def _frame(fname, **cards):
+    hdu = astropy__fits.PrimaryHDU(np.zeros((4, 5), dtype=np.float32))
+    for k, v in cards.items():
+        hdu.header[k] = v
+    hdu.writeto(fname, overwrite=True)
+
+
+class TestFitsIndex(unittest.TestCase):
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        os.mkdir(os.path.join(self.root, 'darks'))
+        self.frames = {
+            'bias_1.fits': dict(IMAGETYP='BIAS', EXPTIME=0.),
+            'darks/dark_1.fits': dict(IMAGETYP='DARK', EXPTIME=30.),
+            'darks/dark_2.fits': dict(IMAGETYP='DARK', EXPTIME=60.),
+            'flat_r.fits': dict(IMAGETYP='FLAT', FILTER="r'", EXPTIME=5),
+        }
+        for name, cards in self.frames.items():
+            _frame(os.path.join(self.root, name), **cards)
+
+    def test_read_primary_header(self):
+        header = read_primary_header(os.path.join(self.root, 'flat_r.fits'))
+        self.assertEqual(header['FILTER'], "r'")
+        self.assertEqual((header['NAXIS1'], header['EXPTIME'], header['SIMPLE']), (5, 5, True))
+        self.assertEqual(read_primary_header(os.path.join(self.root, 'flat_r.fits'), ['BITPIX']),
+                         {'BITPIX': -32})
+
+    def test_incremental(self):
+        keywords = ('IMAGETYP', 'FILTER', 'EXPTIME')
+        with FitsIndex(self.root, keywords=keywords) as index:
+            self.assertEqual(index.update()['added'], 4)
+            self.assertEqual(index.groupby('EXPTIME', IMAGETYP='DARK'),
+                             {30.: [os.path.join(self.root, 'darks/dark_1.fits')],
+                              60.: [os.path.join(self.root, 'darks/dark_2.fits')]})
+            self.assertEqual(len(index.query(where='"EXPTIME" > 1')), 3)
+        _frame(os.path.join(self.root, 'flat_r.fits'), IMAGETYP='FLAT', FILTER='g', EXPTIME=5)
+        os.remove(os.path.join(self.root, 'bias_1.fits'))
+        with FitsIndex(self.root, keywords=keywords) as index:
+            self.assertEqual(index.update(), {'added': 0, 'updated': 1, 'removed': 1, 'unchanged': 2})
+            self.assertEqual(index.query(FILTER=['g', 'i']), [os.path.join(self.root, 'flat_r.fits')])
+            self.assertEqual(index.update()['unchanged'], 3)
+        with FitsIndex(self.root, keywords=keywords + ('NAXIS1',)) as index:
+            self.assertEqual(index.update()['updated'], 3)
+            self.assertEqual(index.header(os.path.join(self.root, 'flat_r.fits'))['NAXIS1'], 5)
@@ -0,0 +1,73 @@
+"""."""
+# flake8: noqa
+
+# internal modules
+import os
+import tempfile
+import unittest
+
+# external modules
+import numpy as np
+from astropy.io import fits as astropy__fits
+
+# relative modules
+from nkrpy.io import fits, hdf5
+
+# global attributes
+__doc__ = """."""
+__filename__ = __file__.split('/')[-1].strip('.py')
+__path__ = __file__.strip('.py').strip(__filename__)
+
+
+@unittest.skipIf(hdf5.h5py is None, 'h5py is not installed')
+class TestHdf5(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.fname = os.path.join(self.tmp, 'cube.h5')
+        self.data = np.arange(1 * 5 * 6 * 7, dtype=np.float32).reshape(1, 5, 6, 7)
+        self.header = astropy__fits.Header()
+        self.header['CTYPE1'] = ('RA---SIN', 'right ascension')
+        self.header['CTYPE3'] = 'FREQ'
+        self.header['CRVAL1'] = 1.5
+        self.header['HISTORY'] = 'MADE'
+
+    def test_fits_parity(self):
+        hdf5.write(self.fname, header=self.header, data=self.data)
+        fname = os.path.join(self.tmp, 'cube.fits')
+        fits.write(fname, header=self.header, data=self.data)
+        header, data = hdf5.read(self.fname)
+        fheader, fdata = fits.read(fname)
+        np.testing.assert_array_equal(data, fdata)
+        self.assertEqual(dict(header), dict(fheader))
+        self.assertEqual(header.comments['CTYPE1'], 'right ascension')
+
+    def test_hyperslabs(self):
+        hdf5.write(self.fname, header=self.header, data=self.data)
+        header, cube = hdf5.read(self.fname, lazy=True)
+        with cube:
+            self.assertEqual(cube.spectral_axis, 0)
+            np.testing.assert_array_equal(cube.channel(3), self.data[0, 3])
+            np.testing.assert_array_equal(cube.cutout(1, 4, 2, 5, channel=slice(4, 0, -2)),
+                                          self.data[0, 4:0:-2, 2:5, 1:4])
+            np.testing.assert_array_equal(cube.T[::2, 3], self.data[0].T[::2, 3])
+        hdf5.write_slab(self.fname, -1., (0, slice(1, 3)))
+        _, spec = hdf5.read(self.fname, key=(0, slice(None), 0, 0))
+        np.testing.assert_array_equal(spec, [0, -1, -1, 3 * 42, 4 * 42])
+
+    def test_append(self):
+        hdf5.write(self.fname, data=self.data)
+        with hdf5.AppendWriter(self.fname, 'chain', header={'NWALKERS': 4}) as w:
+            for i in range(3):
+                w.append(np.full((4, 2), i))
+        hdf5.append(self.fname, np.zeros((2, 4, 2)), 'chain')
+        self.assertEqual(hdf5.list_datasets(self.fname), ['data', 'chain'])
+        header, chain = hdf5.read(self.fname, ext='chain')
+        self.assertEqual(chain.shape, (5, 4, 2))
+        self.assertEqual((header['NAXIS3'], header['NWALKERS']), (5, 4))
+        np.testing.assert_array_equal(chain[:, 0, 0], [0, 1, 2, 0, 0])
+
+    def test_append_chunks(self):
+        with hdf5.AppendWriter(self.fname, 'chain') as w:
+            w.append(np.zeros((32, 5)))
+            self.assertEqual(w.dset.chunks, (hdf5.CHUNK_BYTES // (32 * 5 * 8), 32, 5))
@@ -0,0 +1,67 @@
+"""."""
+# flake8: noqa
+
+# internal modules
+import os
+import tempfile
+import unittest
+
+# external modules
+
+# relative modules
+from nkrpy.io._logger import logger as logger__module
+
+# global attributes
+__doc__ = """."""
+__filename__ = __file__.split('/')[-1].strip('.py')
+__path__ = __file__.strip('.py').strip(__filename__)
+
+
+def _logger(**kwargs):
+    """A fresh logger, not the module singleton."""
+    log = object.__new__(logger__module.Logger)
+    log.__init__()
+    log.setup(append=True, suppress_terminal=True, add_timestamp=False, **kwargs)
+    return log
+
+
+class TestLogger(unittest.TestCase):
+
+    def setUp(self):
+        self.base = os.path.join(tempfile.mkdtemp(), 'run')
+        self.fname = self.base + '-1.log'
+
+    def test_async_lazy(self):
+        log = _logger(logfile=self.base, verbosity=2, async_write=True, buffer_size=4)
+        calls = []
+
+        def lazy():
+            calls.append(1)
+            return 'expensive'
+
+        for i in range(10):
+            log.message(f'line {i}')
+        log.debug(lazy)
+        log.warn(lazy)
+        log.flush()
+        with open(self.fname) as f:
+            lines = f.read().splitlines()
+        self.assertEqual(lines[-11:-1], [f'--(GENERAL) line {i}' for i in range(10)])
+        self.assertEqual(lines[-1], '--(WARN) expensive')
+        self.assertEqual(calls, [1])
+        log.teardown()
+
+    def test_rotation(self):
+        log = _logger(logfile=self.base, verbosity=2, max_bytes=200, backup_count=2)
+        for i in range(40):
+            log.message(f'line {i:02d}')
+        log.teardown()
+        for suffix in ('', '.1', '.2'):
+            self.assertLessEqual(os.path.getsize(self.fname + suffix), 200)
+        self.assertFalse(os.path.exists(self.fname + '.3'))
+        with open(self.fname) as f:
+            self.assertEqual(f.read().splitlines()[-1], '--(GENERAL) line 39')
+
+
+if __name__ == '__main__':
+    unittest.main()
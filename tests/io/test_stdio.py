@@ -0,0 +1,106 @@
+"""."""
+# flake8: noqa
+
+# internal modules
+import io
+import os
+import tempfile
+import threading
+import time
+import unittest
+
+# external modules
+
+# relative modules
+from nkrpy.io import _stdio
+from nkrpy.io._stdio import File, LineIndex, LineProcessor, chunkify_file, follow
+
+# global attributes
+__doc__ = """."""
+__filename__ = __file__.split('/')[-1].strip('.py')
+__path__ = __file__.strip('.py').strip(__filename__)
+
+
+def _odd_squared(line):
+    val = int(line)
+    return None if val % 2 == 0 else str(val ** 2)
+
+
+class TestLineProcessor(unittest.TestCase):
+
+    def setUp(self):
+        fd, self.path = tempfile.mkstemp(suffix='.txt')
+        with os.fdopen(fd, 'w') as f:
+            f.write('header\n' + ''.join(f'{i}\n' for i in range(5000)))
+
+    def tearDown(self):
+        os.remove(self.path)
+
+    def test_chunks_cover_file(self):
+        chunks = chunkify_file(self.path, size=1000, skiplines=1)
+        self.assertEqual(chunks[0][0], len('header\n'))
+        self.assertEqual(sum(c[1] for c in chunks) + chunks[0][0], os.path.getsize(self.path))
+
+    def test_ordered_streaming(self):
+        expected = [str(i ** 2) for i in range(1, 5000, 2)]
+        with LineProcessor(_odd_squared, num_procs=2, chunk_size=1e-3, use_mmap=True) as lp:
+            self.assertEqual(list(lp.imap(self.path, skiplines=1)), expected)
+            self.assertEqual(sorted(lp.imap(self.path, skiplines=1, ordered=False), key=int), expected)
+            fout = io.StringIO()
+            self.assertEqual(lp.apply(self.path, skiplines=1, fout=fout), len(expected))
+            self.assertEqual(fout.getvalue().split(), expected)
+
+
+class TestReverse(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmp, 'log.txt')
+        self.lines = [f'line {i}' + 'x' * (i % 7) for i in range(1000)] + ['', 'last']
+        with open(self.path, 'w') as f:
+            f.write('\n'.join(self.lines) + '\n')
+
+    def test_backward(self):
+        self.assertEqual(File(self.path).tail(3), self.lines[-3:])
+        self.assertEqual(list(_stdio._lines_backward(b'a\n\nbc\nd', block=2)), [b'd', b'bc', b'', b'a'])
+        self.assertEqual([x.decode() for x in _stdio._lines_backward(open(self.path, 'rb').read(), block=64)],
+                         self.lines[::-1])
+
+    def test_index(self):
+        index = LineIndex(self.path)
+        self.assertIsNone(index.index)
+        self.assertEqual((len(index), index[500], index[-1]), (len(self.lines), self.lines[500], 'last'))
+        self.assertFalse(os.path.exists(self.path + _stdio.INDEX_SUFFIX))
+        index = LineIndex(self.path, persist=True)
+        self.assertTrue(os.path.exists(self.path + _stdio.INDEX_SUFFIX))
+        with open(self.path, 'a') as f:
+            f.write('more\nunterminated')
+        self.assertEqual(File(self.path).line(-2), 'more')
+        index = LineIndex(self.path, persist=True)
+        self.assertEqual(index.update(), 0)
+        self.assertEqual(index.lines(-3), ['last', 'more', 'unterminated'])
+
+    def test_unwritable_sidecar(self):
+        # a directory in the way of the sidecar fails the save as a read only directory would
+        os.mkdir(self.path + _stdio.INDEX_SUFFIX)
+        index = LineIndex(self.path, persist=True)
+        self.assertIsNone(index.index)
+        self.assertEqual(index[-1], 'last')
+        self.assertFalse(os.path.exists(self.path + _stdio.INDEX_SUFFIX + '.tmp'))
+
+    def test_follow(self):
+        def writer():
+            for chunk in ('one\ntw', 'o\n', 'three\n'):
+                time.sleep(0.05)
+                with open(self.path, 'a') as f:
+                    f.write(chunk)
+
+        thread = threading.Thread(target=writer)
+        thread.start()
+        lines = list(follow(self.path, interval=0.01, max_interval=0.05, timeout=0.5))
+        thread.join()
+        self.assertEqual(lines, ['one', 'two', 'three'])
+
+
+if __name__ == '__main__':
+    unittest.main()
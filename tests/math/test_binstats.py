@@ -0,0 +1,45 @@
+"""."""
+# flake8: noqa
+
+# internal modules
+import unittest
+
+# external modules
+import numpy as np
+
+# relative modules
+from nkrpy import math
+
+# global attributes
+__all__ = ('TestBinStats',)
+__doc__ = """."""
+__filename__ = __file__.split('/')[-1].strip('.py')
+__path__ = __file__.strip('.py').strip(__filename__)
+
+
+class TestBinStats(unittest.TestCase):
+
+    def test_statistics(self):
+        rng = np.random.default_rng(0)
+        x = np.round(rng.random(2000) * 10, 2)
+        values = rng.normal(size=x.size)
+        edges = np.linspace(0, 10, 21)
+        idx = math.digitize(x, edges)
+        stats = math.binned_statistics(values, idx, 20, statistics=('mean', 'std', 'count', 'max'))
+        for i in range(20):
+            sel = values[(x > edges[i]) & (x <= edges[i + 1])]
+            self.assertEqual(stats['count'][i], sel.size)
+            self.assertAlmostEqual(stats['mean'][i], sel.mean())
+            self.assertAlmostEqual(stats['std'][i], sel.std())
+            self.assertAlmostEqual(stats['max'][i], sel.max())
+
+    def test_empty_and_outside(self):
+        idx = math.digitize(np.array([-1., 0.5, 2.5, 9.]), [0, 1, 2, 3])
+        np.testing.assert_array_equal(idx, [-1, 0, 2, -1])
+        stats = math.binned_statistics([1., 2., 3., 4.], idx, 3, statistics=('mean', 'count'))
+        np.testing.assert_array_equal(stats['count'], [1, 0, 1])
+        self.assertTrue(np.isnan(stats['mean'][1]))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,36 @@
+"""."""
+# flake8: noqa
+
+# internal modules
+import unittest
+
+# external modules
+import numpy as np
+from scipy.signal import convolve
+
+# relative modules
+from nkrpy import math
+
+# global attributes
+__all__ = ('TestFFTConvolver',)
+__doc__ = """."""
+__filename__ = __file__.split('/')[-1].strip('.py')
+__path__ = __file__.strip('.py').strip(__filename__)
+
+
+class TestFFTConvolver(unittest.TestCase):
+
+    def test_matches_scipy_same(self):
+        rng = np.random.default_rng(0)
+        cube = rng.random((7, 31, 40))
+        kernel = rng.random((6, 9))
+        expected = convolve(cube, kernel[np.newaxis], mode='same', method='direct')
+        conv = math.FFTConvolver(kernel, cube.shape[-2:], nthreads=3, chunk=2)
+        out = np.empty_like(cube)
+        self.assertIs(conv(cube, out=out), out)
+        np.testing.assert_allclose(out, expected, atol=1e-10)
+        np.testing.assert_allclose(conv(cube[0]), expected[0], atol=1e-10)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,52 @@
+"""."""
+# flake8: noqa
+
+# internal modules
+import unittest
+
+# external modules
+import numpy as np
+
+# relative modules
+from nkrpy import math
+
+# global attributes
+__all__ = ('TestFitService',)
+__doc__ = """."""
+__filename__ = __file__.split('/')[-1].strip('.py')
+__path__ = __file__.strip('.py').strip(__filename__)
+
+
+def line(x, a, b):
+    return a * x + b
+
+
+class TestFitService(unittest.TestCase):
+
+    def setUp(self):
+        rng = np.random.default_rng(0)
+        self.x = np.linspace(0, 10, 200)
+        self.y = 2. * self.x + 4. + rng.normal(scale=0.5, size=self.x.shape)
+
+    def test_bootstrap_deterministic(self):
+        serial = math.bootstrap_fit(line, self.x, self.y, (1., 1.), nboot=40,
+                                    seed=3, num_procs=1)
+        pooled = math.bootstrap_fit(line, self.x, self.y, (1., 1.), nboot=40,
+                                    seed=3, num_procs=2)
+        self.assertEqual(serial['params'].shape, (40, 2))
+        self.assertTrue(serial['success'].all())
+        np.testing.assert_array_equal(serial['indices'], pooled['indices'])
+        np.testing.assert_allclose(serial['params'], pooled['params'])
+        np.testing.assert_allclose(serial['params'].mean(axis=0), [2., 4.], atol=0.2)
+
+    def test_sigma_clip_rows(self):
+        y = np.stack([self.y, 2 * self.y])
+        y[:, 50] += 100
+        res = math.FitService(line, self.x, y, num_procs=2, chunk=1).sigma_clip((1., 1.))
+        self.assertEqual(res['mask'].shape, y.shape)
+        self.assertTrue(res['mask'][:, 50].all())
+        np.testing.assert_allclose(res['params'][1], 2 * res['params'][0], rtol=0.05)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,49 @@
+"""."""
+# flake8: noqa
+
+# internal modules
+import unittest
+
+# external modules
+import numpy as np
+from scipy import ndimage
+
+# relative modules
+from nkrpy._math._image import shift
+
+# global attributes
+__all__ = ('TestShift',)
+__doc__ = """."""
+__filename__ = __file__.split('/')[-1].strip('.py')
+__path__ = __file__.strip('.py').strip(__filename__)
+
+
+class TestShift(unittest.TestCase):
+
+    def setUp(self):
+        self.data = np.random.default_rng(0).normal(size=(6, 20, 24))
+
+    def test_integer(self):
+        for s in ([2, -3, 5], [-1, 4, -7]):
+            expected = ndimage.shift(self.data, s, order=0, cval=0.)
+            np.testing.assert_array_equal(shift(self.data, s, cval=0.), expected)
+            inplace = self.data.copy()
+            self.assertIs(shift(inplace, s, cval=0., out=inplace), inplace)
+            np.testing.assert_array_equal(inplace, expected)
+
+    def test_subpixel(self):
+        s = [0, 1.3, -2.25]
+        expected = ndimage.shift(self.data, s, order=1, cval=np.nan)
+        np.testing.assert_allclose(shift(self.data, s, order=1), expected, atol=1e-12)
+        single = shift(self.data[0].astype(np.float32), s[1:], order=3)
+        self.assertEqual(single.dtype, np.float32)
+        self.assertEqual(np.isnan(single).sum(), 20 * 24 - 17 * 20)
+
+    def test_window(self):
+        window = shift(self.data[0], [3, -5], shape=(10, 12))
+        self.assertTrue(np.isnan(window[:3]).all())
+        np.testing.assert_array_equal(window[3:], self.data[0, :7, 5:17])
+
+
+if __name__ == '__main__':
+    unittest.main()
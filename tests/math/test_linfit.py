@@ -0,0 +1,48 @@
+"""."""
+# flake8: noqa
+
+# internal modules
+import unittest
+
+# external modules
+import numpy as np
+
+# relative modules
+from nkrpy import math
+
+# global attributes
+__all__ = ('TestLinfit',)
+__doc__ = """."""
+__filename__ = __file__.split('/')[-1].strip('.py')
+__path__ = __file__.strip('.py').strip(__filename__)
+
+
+class TestLinfit(unittest.TestCase):
+
+    def setUp(self):
+        rng = np.random.default_rng(1)
+        self.x = np.sort(rng.uniform(1, 3, 500))
+        self.y = np.sin(2 * self.x) + rng.normal(scale=0.01, size=self.x.shape)
+        self.w = rng.uniform(0.5, 2, self.x.shape)
+
+    def test_matches_polyfit(self):
+        coefs = math.polyfit_degrees(self.x, self.y, range(0, 7), w=self.w)
+        for d, coef in enumerate(coefs):
+            np.testing.assert_allclose(coef, np.polyfit(self.x, self.y, d, w=self.w), rtol=1e-6, atol=1e-9)
+
+    def test_batched(self):
+        y = np.stack([self.y, 2 * self.y + 1], axis=-1)
+        coef = math.polyfit(self.x, y, 3)
+        self.assertEqual(coef.shape, (4, 2))
+        np.testing.assert_allclose(coef[:, 1], np.polyfit(self.x, y[:, 1], 3), rtol=1e-8)
+
+    def test_linear_models(self):
+        np.testing.assert_allclose(math.linear_model_fit(math.quad, self.x, self.y),
+                                   np.polyfit(self.x, self.y, 2), rtol=1e-8)
+        params = math.linear_model_fit(math.polynomial, self.x, self.y, p0=[1, 1, 1])
+        np.testing.assert_allclose(math.polynomial(self.x, *params), math.quad(self.x, *params[::-1]))
+        self.assertIsNone(math.linear_model_fit(math.gauss, self.x, self.y))
+
+
+if __name__ == '__main__':
+    unittest.main()
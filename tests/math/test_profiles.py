@@ -0,0 +1,62 @@
+"""."""
+# flake8: noqa
+
+# internal modules
+import unittest
+
+# external modules
+import numpy as np
+from scipy.special import wofz
+
+# relative modules
+from nkrpy import math
+
+# global attributes
+__all__ = ('TestProfiles',)
+__doc__ = """."""
+__filename__ = __file__.split('/')[-1].strip('.py')
+__path__ = __file__.strip('.py').strip(__filename__)
+
+
+def central_difference(func, x, params, eps=1e-6):
+    params = np.asarray(params, dtype=float)
+    cols = []
+    for k in range(params.size):
+        hi, lo = params.copy(), params.copy()
+        hi[k] += eps
+        lo[k] -= eps
+        cols.append((func(x, *hi) - func(x, *lo)) / (2 * eps))
+    return np.stack(cols, axis=-1)
+
+
+class TestProfiles(unittest.TestCase):
+
+    def setUp(self):
+        self.x = np.linspace(-5, 5, 501)
+
+    def test_voigt(self):
+        sigma = 1.2 / np.sqrt(2. * np.log(2))
+        expected = np.real(wofz((self.x - 0.3 + 0.5j) / sigma / np.sqrt(2.))) / sigma / np.sqrt(2. * np.pi)
+        np.testing.assert_allclose(math.voigt(self.x, 0.3, 1.2, 0.5), expected, atol=1e-14)
+        np.testing.assert_allclose(math.voigt_jac(self.x, 0.3, 1.2, 0.5),
+                                   central_difference(math.voigt, self.x, [0.3, 1.2, 0.5]), atol=1e-8)
+
+    def test_gauss_jacobians(self):
+        np.testing.assert_allclose(math.gauss_jac(self.x, 0.3, 1.2, 2.),
+                                   central_difference(math.gauss, self.x, [0.3, 1.2, 2.]), atol=1e-8)
+        params = [0., 1., 1., 1., .5, 2.]
+        flat = lambda x, *p: math.ndgauss(x, p)
+        np.testing.assert_allclose(math.ndgauss_jac(self.x, params),
+                                   central_difference(flat, self.x, params), atol=1e-8)
+
+    def test_emissive_buffer(self):
+        x = np.linspace(1.99, 2.01, 101)
+        out = np.empty_like(x)
+        ret = math.emissivegaussian_into(x, 2., 1e9, 2., 1.7, out=out)
+        self.assertIs(ret, out)
+        np.testing.assert_allclose(out, math.emissivegaussian(x, 2., 1e9, 2., 1.7))
+        self.assertEqual(math.emissivegaussian_jac(x, 2., 1e9, 2.).shape, (101, 3))
+
+
+if __name__ == '__main__':
+    unittest.main()
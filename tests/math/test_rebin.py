@@ -0,0 +1,47 @@
+"""."""
+# flake8: noqa
+
+# internal modules
+import unittest
+
+# external modules
+import numpy as np
+
+# relative modules
+from nkrpy import math
+
+# global attributes
+__all__ = ('TestRebin',)
+__doc__ = """."""
+__filename__ = __file__.split('/')[-1].strip('.py')
+__path__ = __file__.strip('.py').strip(__filename__)
+
+
+class TestRebin(unittest.TestCase):
+
+    def test_block_mean(self):
+        data = np.arange(60.).reshape(10, 6)
+        data[0, 0] = np.nan
+        expected = np.nanmean(data[:9].reshape(3, 3, 2, 3), axis=(1, 3))
+        np.testing.assert_allclose(math.rebin(data, (3, 3), axis=(0, 1)), expected)
+        np.testing.assert_allclose(math.rebin(data, 2, axis=-1, statistic='sum'),
+                                   np.nansum(data.reshape(10, 3, 2), axis=-1))
+
+    def test_irregular_window(self):
+        rng = np.random.default_rng(0)
+        x = np.sort(rng.uniform(0, 10, 100))
+        y = rng.normal(size=100)
+        newx, newy = [], []
+        for xi in x:
+            mask = np.abs(x - xi) < 0.5
+            if np.median(x[mask]) in newx:
+                continue
+            newx.append(np.median(x[mask]))
+            newy.append(np.median(y[mask]))
+        bx, by = math.rebin_irregular(x, y, window=0.5, statistic='median')
+        np.testing.assert_allclose(bx, newx)
+        np.testing.assert_allclose(by, newy)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,45 @@
+"""."""
+# flake8: noqa
+
+# internal modules
+import unittest
+
+# external modules
+import numpy as np
+from skimage.transform import rotate
+
+# relative modules
+from nkrpy._math._resample import AffineResampler, rotation, rotate_cube
+
+# global attributes
+__all__ = ('TestResample',)
+__doc__ = """."""
+__filename__ = __file__.split('/')[-1].strip('.py')
+__path__ = __file__.strip('.py').strip(__filename__)
+
+
+class TestResample(unittest.TestCase):
+
+    def setUp(self):
+        self.cube = np.random.default_rng(0).normal(size=(5, 31, 40))
+
+    def test_matches_skimage(self):
+        for angle, resize in ((17, False), (-33.3, True), (145, True)):
+            expected = rotate(self.cube[2], angle, resize=resize, order=1,
+                              mode='constant', cval=np.nan)
+            result = rotation(angle, self.cube.shape[1:], resize=resize)(self.cube)
+            self.assertEqual(result.shape[1:], expected.shape)
+            np.testing.assert_allclose(result[2], expected, atol=1e-12)
+
+    def test_cached_and_axis(self):
+        self.assertIs(rotation(30, (31, 40)), rotation(30., [31, 40]))
+        self.assertIs(rotation(30, (31, 40), cval=np.float64('nan')), rotation(30, (31, 40)))
+        self.assertIsNone(rotation(30, (31, 40)).coords)
+        moved = rotate_cube(np.moveaxis(self.cube, 0, -1), 30, axis=-1)
+        np.testing.assert_allclose(np.moveaxis(moved, -1, 0), rotate_cube(self.cube, 30))
+
+    def test_nan_does_not_leak(self):
+        data = self.cube.copy()
+        data[:, :, 0] = np.nan
+        shifted = AffineResampler(np.eye(2), [0, 1], data.shape[1:], (31, 39))(data)
+        np.testing.assert_array_equal(shifted, data[:, :, 1:])
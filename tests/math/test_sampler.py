@@ -0,0 +1,64 @@
+"""."""
+# flake8: noqa
+
+# internal modules
+import unittest
+
+# external modules
+import numpy as np
+from scipy.stats import truncnorm
+
+# relative modules
+from nkrpy import math
+
+# global attributes
+__all__ = ('TestSampler',)
+__doc__ = """."""
+__filename__ = __file__.split('/')[-1].strip('.py')
+__path__ = __file__.strip('.py').strip(__filename__)
+
+
+class TestSampler(unittest.TestCase):
+
+    def test_truncated_normal_moments(self):
+        x = math.truncated_normal(1., 2., -1., 5., size=200000, rng=0)
+        self.assertTrue(((x >= -1) & (x <= 5)).all())
+        a, b = (-1. - 1.) / 2., (5. - 1.) / 2.
+        self.assertAlmostEqual(x.mean(), truncnorm.mean(a, b, loc=1, scale=2), places=2)
+
+    def test_far_tail_and_batch(self):
+        x = math.truncated_normal(0., 1., [10., -40.], [np.inf, -39.], size=(1000, 2), rng=1)
+        self.assertEqual(x.shape, (1000, 2))
+        self.assertTrue((x[:, 0] >= 10).all())
+        self.assertTrue(((x[:, 1] >= -40) & (x[:, 1] <= -39)).all())
+
+    def test_seeded_sampler(self):
+        a = math.sampler(0, 10, 50, sample='gaussian', resample=True, lim=3, logic='<', rng=4)
+        b = math.sampler(0, 10, 50, sample='gaussian', resample=True, lim=3, logic='<', rng=4)
+        self.assertEqual(a.shape, (50,))
+        self.assertTrue((a < 3).all() and (a >= 0).all())
+        np.testing.assert_array_equal(a, b)
+
+    def test_global_seed(self):
+        np.random.seed(7)
+        a = math.truncated_normal(0, 1, lower=0, size=20)
+        b = math.sampler(0, 1, 20, sample='uniform')
+        np.random.seed(7)
+        np.testing.assert_array_equal(a, math.truncated_normal(0, 1, lower=0, size=20))
+        np.testing.assert_array_equal(b, math.sampler(0, 1, 20, sample='uniform'))
+
+    def test_global_seed_bounded(self):
+        draws = []
+        for _ in range(2):
+            np.random.seed(3)
+            draws.append(np.concatenate([
+                math.bounded_sample('gaussian', 0, 1, size=3),
+                math.bounded_sample('lognormal', 0.5, 2, size=3),
+                math.sampler(0, 1, 5, resample=True, lim=.5, logic='>')]))
+        self.assertEqual(draws[0].shape, (11,))
+        np.testing.assert_array_equal(draws[0], draws[1])
+        self.assertTrue((draws[0][-5:] >= .5).all())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,54 @@
+"""."""
+# flake8: noqa
+
+# internal modules
+import unittest
+
+# external modules
+import numpy as np
+
+# relative modules
+from nkrpy import math
+
+# global attributes
+__all__ = ('TestSliding',)
+__doc__ = """."""
+__filename__ = __file__.split('/')[-1].strip('.py')
+__path__ = __file__.strip('.py').strip(__filename__)
+
+
+class TestSliding(unittest.TestCase):
+
+    def test_matches_brute_force(self):
+        rng = np.random.default_rng(1)
+        x = rng.normal(5, 2, (40, 2))
+        x[[3, 17], 0] = np.nan
+        funcs = {'mean': np.nanmean, 'std': np.nanstd, 'median': np.nanmedian}
+        for end in ('stretch', 'cyclic', 'pad', 'bounded'):
+            for width in (1, 4, 7):
+                ext, lo, hi = math.sliding_bounds(x, width, end=end, fill_value=0.5)
+                for stat, func in funcs.items():
+                    expected = np.array([func(ext[l:h], axis=0) for l, h in zip(lo, hi)])
+                    result = math.sliding_stat(x, width, stat=stat, end=end, fill_value=0.5)
+                    np.testing.assert_allclose(result, expected, atol=1e-6, err_msg=f'{end} {width} {stat}')
+
+    def test_rolling_average_points_cyclic(self):
+        x = np.arange(20.)
+        result = math.rolling_average_points(x, 3, end='cyclic')
+        self.assertEqual(result.shape, (20,))
+        self.assertAlmostEqual(result[0], (19 + 0 + 1) / 3)
+        self.assertAlmostEqual(result[-1], (18 + 19 + 0) / 3)
+
+    def test_window_is_view(self):
+        x = np.arange(12.).reshape(6, 2)
+        view = math.window(x, 3)
+        self.assertEqual(view.shape, (4, 3, 2))
+        self.assertTrue(np.shares_memory(view, x))
+        self.assertFalse(view.flags.writeable)
+        np.testing.assert_array_equal(view[1], x[1:4])
+        self.assertEqual(list(math.window([1, 2, 3, 4], 3)), [(1, 2, 3), (2, 3, 4)])
+        self.assertEqual(list(math.pairwise([1, 2, 3, 4, 5], 4)), [(1, 4), (2, 5)])
+
+
+if __name__ == '__main__':
+    unittest.main()
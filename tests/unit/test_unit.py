@@ -0,0 +1,42 @@
+"""."""
+# flake8: noqa
+
+# internal modules
+import unittest
+
+# external modules
+import numpy as np
+
+# relative modules
+from nkrpy import Unit
+
+# global attributes
+__all__ = ('TestUnit',)
+__doc__ = """."""
+__filename__ = __file__.split('/')[-1].strip('.py')
+__path__ = __file__.strip('.py').strip(__filename__)
+
+
+class TestUnit(unittest.TestCase):
+
+    def test_resolve_alias(self):
+        self.assertIs(Unit.resolve_unit('electronvolts'), Unit.resolve_unit('ev'))
+        self.assertIsNone(Unit.resolve_unit('notaunit'))
+
+    def test_convert_array_matches_unit(self):
+        for base, conv, vals in [('km', 'cm', np.array([1., 5.])),
+                                 ('hz', 'angstroms', np.array([1e9, 2e9])),
+                                 ('angstroms', 'ev', np.array([5000.]))]:
+            np.testing.assert_allclose(Unit.convert_array(vals, base, conv),
+                                       Unit(vals=vals, baseunit=base, convunit=conv).get_vals())
+        self.assertAlmostEqual(Unit.convert_array(1e9, 'hz', 'angstroms'), 2.99792458e9)
+
+    def test_convert_array_inplace(self):
+        arr = np.ones(4)
+        ret = Unit.convert_array(arr, 'km', 'cm', out=arr)
+        self.assertIs(ret, arr)
+        np.testing.assert_allclose(arr, 1e5)
+
+
+if __name__ == '__main__':
+    unittest.main()